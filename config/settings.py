@@ -13,6 +13,93 @@ X_API_KEY = os.getenv("X_API_KEY")
 X_API_KEY_SECRET = os.getenv("X_API_KEY_SECRET")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Configuración de almacenamiento ("json" o "sqlite")
+DB_BACKEND = os.getenv("DB_BACKEND", "json")
+
+# Archivado del historial: días que los tweets permanecen "calientes" antes de
+# comprimirse en segmentos, días que se conservan los segmentos (vacío para
+# conservarlos siempre), compresión ("gzip" o "lzma") y periodo ("day" o "week")
+DB_HOT_DAYS = int(os.getenv("DB_HOT_DAYS", "7"))
+DB_RETENTION_DAYS = int(os.getenv("DB_RETENTION_DAYS")) if os.getenv("DB_RETENTION_DAYS") else None
+DB_ARCHIVE_FORMAT = os.getenv("DB_ARCHIVE_FORMAT", "gzip")
+DB_SEGMENT_PERIOD = os.getenv("DB_SEGMENT_PERIOD", "day")
+
+# Búsqueda de tweets: consulta, tweets por página (10-100) y páginas como
+# máximo por ciclo. Cada ciclo solo pide tweets posteriores al último visto
+TWITTER_QUERY = os.getenv("TWITTER_QUERY", "crypto -is:retweet lang:en OR lang:es")
+TWITTER_MAX_RESULTS = int(os.getenv("TWITTER_MAX_RESULTS", "100"))
+TWITTER_MAX_PAGES = int(os.getenv("TWITTER_MAX_PAGES", "3"))
+
+# Frecuencia de búsqueda: minutos entre ciclos al arrancar y límites del
+# intervalo adaptativo (se acorta si los ciclos llenan páginas de tweets
+# nuevos y se alarga si no traen ninguno)
+POLL_INTERVAL_MINUTES = float(os.getenv("POLL_INTERVAL_MINUTES", "15"))
+POLL_MIN_INTERVAL_MINUTES = float(os.getenv("POLL_MIN_INTERVAL_MINUTES", "2"))
+POLL_MAX_INTERVAL_MINUTES = float(os.getenv("POLL_MAX_INTERVAL_MINUTES", "60"))
+
+# Procesamiento concurrente: tweets procesados a la vez en cada ciclo y
+# llamadas simultáneas como máximo a OpenAI y a la API de X para publicar
+TWEET_WORKERS = int(os.getenv("TWEET_WORKERS", "5"))
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "3"))
+TWITTER_CONCURRENCY = int(os.getenv("TWITTER_CONCURRENCY", "2"))
+
+# Modo streaming (python main.py --stream): tweets que caben en la cola antes
+# de frenar la lectura del stream y host de la API (para pruebas en local)
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "100"))
+X_API_HOST = os.getenv("X_API_HOST", "https://api.twitter.com")
+
+# Conexión con OpenAI: URL base de la API (vacío para la de OpenAI; útil para
+# pruebas con un servidor local) y segundos máximos de cada petición
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE") or None
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+
+# Circuitos de OpenAI y de la API de X: proporción de fallos en la ventana
+# que abre el circuito, llamadas mínimas en la ventana, segundos de la
+# ventana y segundos que el circuito permanece abierto antes de probar de nuevo
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "60"))
+
+# Relevancia mínima para responder
+RELEVANCE_THRESHOLD = float(os.getenv("RELEVANCE_THRESHOLD", "0.7"))
+
+# Puntuación de relevancia en lote (varios tweets por petición) y tweets como
+# máximo a los que se responde en cada ciclo de búsqueda
+OPENAI_BATCH_RELEVANCE = os.getenv("OPENAI_BATCH_RELEVANCE", "true").lower() == "true"
+RESPONSES_PER_CYCLE = int(os.getenv("RESPONSES_PER_CYCLE", "5"))
+
+# Sin puntuación en lote, si relevancia y respuesta se piden a OpenAI en una
+# sola llamada ("true", por defecto) o en dos ("false"). Es incompatible con
+# OPENAI_BATCH_RELEVANCE: en lote la relevancia ya está calculada y solo se
+# pide la respuesta de los tweets relevantes
+OPENAI_COMBINED = os.getenv("OPENAI_COMBINED", "false" if OPENAI_BATCH_RELEVANCE else "true").lower() == "true"
+
+# Prefiltro local de spam: puntuación (0-1) a partir de la que un tweet se
+# descarta sin llamar a OpenAI (vacío para desactivarlo)
+SPAM_THRESHOLD = float(os.getenv("SPAM_THRESHOLD", "0.8")) if os.getenv("SPAM_THRESHOLD", "0.8") else None
+
+# Casi duplicados: distancia máxima entre firmas SimHash (0-63, vacío para
+# desactivarlo) y horas durante las que un tweet procesado sirve de referencia
+NEAR_DUPLICATE_DISTANCE = int(os.getenv("NEAR_DUPLICATE_DISTANCE", "6")) if os.getenv("NEAR_DUPLICATE_DISTANCE", "6") else None
+NEAR_DUPLICATE_WINDOW_HOURS = float(os.getenv("NEAR_DUPLICATE_WINDOW_HOURS", "24"))
+
+# Presupuesto de tokens de OpenAI por ciclo y por día (vacío para no
+# limitarlo), fracción del presupuesto a partir de la que se usa el modelo de
+# respaldo y se responde a menos tweets, y modelo de respaldo (vacío para no
+# cambiar de modelo). Al agotarse, los tweets se aplazan al siguiente ciclo
+LLM_CYCLE_TOKEN_BUDGET = int(os.getenv("LLM_CYCLE_TOKEN_BUDGET")) if os.getenv("LLM_CYCLE_TOKEN_BUDGET") else None
+LLM_DAILY_TOKEN_BUDGET = int(os.getenv("LLM_DAILY_TOKEN_BUDGET")) if os.getenv("LLM_DAILY_TOKEN_BUDGET") else None
+LLM_DOWNGRADE_AT = float(os.getenv("LLM_DOWNGRADE_AT", "0.8"))
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "gpt-3.5-turbo") or None
+
+# Caché persistida de relevancias y respuestas de OpenAI por texto normalizado
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "5000"))
+LLM_CACHE_TTL_DAYS = float(os.getenv("LLM_CACHE_TTL_DAYS", "7"))
+
 # Verificar que todas las credenciales sean correctas
 if not all([X_API_PROJECT_ID, X_API_KEY_CONSUMER, X_API_KEY_SECRET_CONSUMER, X_API_BEARER, X_API_KEY, X_API_KEY_SECRET, OPENAI_API_KEY]):
-    raise ValueError("❌ ERROR: Faltan credenciales en el archivo .env")
\ No newline at end of file
+    raise ValueError("❌ ERROR: Faltan credenciales en el archivo .env")
+
+if OPENAI_COMBINED and OPENAI_BATCH_RELEVANCE:
+    raise ValueError("❌ ERROR: OPENAI_COMBINED y OPENAI_BATCH_RELEVANCE no se pueden activar a la vez")
@@ -1,14 +1,31 @@
 import os
 import sys
 import time
+import threading
 import gradio as gr
 from datetime import datetime, timedelta
 
 # Agregar el directorio raíz del proyecto al path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-# Importar la clase Database
-from utils.database import Database
+# Importar la base de datos
+from utils.database import open_database
+
+# Lector compartido por todas las peticiones: abrirlo en modo solo lectura
+# evita bloquear o corromper las escrituras del bot, y refresh() solo lee
+# los cambios nuevos, por lo que se puede consultar con mucha frecuencia
+_db = None
+_db_lock = threading.Lock()
+
+def get_db():
+    """Devuelve el lector de la base de datos con los últimos cambios confirmados"""
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = open_database(read_only=True)
+        else:
+            _db.refresh()
+        return _db
 
 def format_date(iso_date):
     """Formatea una fecha ISO a un formato más legible"""
@@ -80,7 +97,7 @@ def calculate_reset_time(iso_date, seconds):
 
 def get_stats_html():
     """Obtiene estadísticas formateadas en HTML"""
-    db = Database()
+    db = get_db()
     stats = db.get_stats()
     processed = stats.get('total_processed', 0)
     responded = stats.get('total_responded', 0)
@@ -95,6 +112,9 @@ def get_stats_html():
             <li><b>Total de tweets procesados:</b> {processed}</li>
             <li><b>Total de tweets con respuestas:</b> {responded}</li>
             <li><b>Tasa de respuesta:</b> {response_rate:.1f}%</li>
+            <li><b>Ignorados:</b> {stats.get('ignored', 0)}</li>
+            <li><b>Respuestas sin publicar:</b> {stats.get('generated', 0)}</li>
+            <li><b>Respuestas publicadas:</b> {stats.get('posted', 0)}</li>
             <li><b>Última actualización:</b> {datetime.now().strftime("%d/%m/%Y %H:%M:%S")}</li>
         </ul>
     </div>
@@ -103,7 +123,7 @@ def get_stats_html():
 
 def get_rate_limit_html():
     """Obtiene información de rate limits formateada en HTML"""
-    db = Database()
+    db = get_db()
     rate_limits = db.get_rate_limit_info()
     
     last_encounter = rate_limits.get('last_encounter')
@@ -176,7 +196,7 @@ def get_rate_limit_html():
 
 def get_tweets_html():
     """Obtiene los tweets más recientes formateados en HTML"""
-    db = Database()
+    db = get_db()
     tweets = db.get_last_processed_tweets(limit=10)
     
     if not tweets:
@@ -1,56 +1,41 @@
-import json
-import os
+from utils.database import open_database
 
-# Ruta al archivo de base de datos
-db_file = "data/processed_tweets.json"
+def format_value(value):
+    """Resume un contador para mostrarlo (los mapas se muestran por número de entradas)"""
+    if isinstance(value, dict):
+        return f"{len(value)} entradas"
+    return value
 
 def fix_stats():
-    print(f"Corrigiendo estadísticas en {db_file}...")
-    
-    # Cargar el archivo JSON
-    if not os.path.exists(db_file):
-        print(f"Error: El archivo {db_file} no existe.")
-        return
-    
+    # Solo puede haber un escritor: si el bot está en marcha hay que detenerlo antes
     try:
-        with open(db_file, 'r') as f:
-            db = json.load(f)
-    except json.JSONDecodeError:
-        print(f"Error: El archivo {db_file} no contiene JSON válido.")
+        db = open_database()
+    except RuntimeError as e:
+        print(e)
+        print("Detén el bot antes de corregir las estadísticas.")
         return
-    except Exception as e:
-        print(f"Error al leer el archivo: {e}")
-        return
-    
-    # Contar tweets procesados y respondidos
-    processed_tweets = db.get("processed_tweets", {})
-    total_processed = len(processed_tweets)
-    total_responded = sum(1 for t in processed_tweets.values() if t.get("responded", False))
-    
-    # Imprimir estadísticas actuales vs. calculadas
-    current_stats = db.get("stats", {})
-    print(f"Estadísticas actuales:")
-    print(f"  - Total procesados: {current_stats.get('total_processed', 0)}")
-    print(f"  - Total respondidos: {current_stats.get('total_responded', 0)}")
-    
-    print(f"\nEstadísticas calculadas:")
-    print(f"  - Total procesados: {total_processed}")
-    print(f"  - Total respondidos: {total_responded}")
-    
-    # Actualizar estadísticas
-    if "stats" not in db:
-        db["stats"] = {}
-    
-    db["stats"]["total_processed"] = total_processed
-    db["stats"]["total_responded"] = total_responded
+    print(f"Corrigiendo estadísticas en {db.db_file}...")
     
-    # Guardar archivo actualizado
+    # Comprobar primero en streaming y cargar el documento solo si hay que corregirlo
     try:
-        with open(db_file, 'w') as f:
-            json.dump(db, f, indent=2)
-        print("\n✅ Estadísticas actualizadas correctamente.")
-    except Exception as e:
-        print(f"\nError al guardar el archivo: {e}")
+        differences = db.verify()
+        if differences:
+            differences = db.rebuild()
+        stats = db.get_stats()
+    finally:
+        db.close()
+    
+    if differences:
+        print(f"Contadores corregidos:")
+        for key, (stored, computed) in differences.items():
+            print(f"  - {key}: {format_value(stored)} -> {format_value(computed)}")
+    else:
+        print("Las estadísticas ya coincidían con los registros.")
+    
+    print(f"\nEstadísticas actuales:")
+    print(f"  - Total procesados: {stats['total_processed']}")
+    print(f"  - Total respondidos: {stats['total_responded']}")
+    print("\n✅ Estadísticas actualizadas correctamente.")
 
 if __name__ == "__main__":
-    fix_stats()
\ No newline at end of file
+    fix_stats()
@@ -1,60 +1,40 @@
 #!/usr/bin/env python
 """
-Script para actualizar las estadísticas para reflejar respuestas generadas
+Script para comprobar que las estadísticas almacenadas coinciden con los
+tweets procesados, sin modificar la base de datos.
+Para corregirlas, ejecutar fix_stats.py
 """
 
-import json
-import os
+from utils.database import open_database
 
-# Ruta al archivo de base de datos
-db_file = "data/processed_tweets.json"
-
-def update_stats():
-    print(f"Actualizando estadísticas en {db_file}...")
-    
-    # Cargar el archivo JSON
-    if not os.path.exists(db_file):
-        print(f"Error: El archivo {db_file} no existe.")
-        return
+def inspect_stats():
+    db = open_database(read_only=True)
+    print(f"Inspeccionando estadísticas en {db.db_file}...")
     
     try:
-        with open(db_file, 'r') as f:
-            db = json.load(f)
-    except Exception as e:
-        print(f"Error al leer el archivo: {e}")
-        return
-    
-    # Obtener todos los tweets
-    processed_tweets = db.get("processed_tweets", {})
-    if not processed_tweets:
-        print("No hay tweets procesados en la base de datos.")
+        differences = db.verify()
+        stats = db.get_stats()
+    finally:
+        db.close()
+    
+    print(f"Estadísticas almacenadas:")
+    print(f"  - Total tweets procesados: {stats['total_processed']}")
+    print(f"  - Total tweets con respuestas: {stats['total_responded']}")
+    print(f"  - Ignorados: {stats['ignored']}")
+    print(f"  - Respuestas generadas sin publicar: {stats['generated']}")
+    print(f"  - Respuestas publicadas: {stats['posted']}")
+    
+    if not differences:
+        print("\n✅ Las estadísticas coinciden con los registros.")
         return
     
-    # Contar tweets con respuestas generadas
-    tweets_with_response = [
-        tweet_id for tweet_id, tweet_data in processed_tweets.items() 
-        if tweet_data.get("response_text") is not None
-    ]
-    
-    # Actualizar estadísticas
-    if "stats" not in db:
-        db["stats"] = {}
-    
-    old_responded = db["stats"].get("total_responded", 0)
-    db["stats"]["total_processed"] = len(processed_tweets)
-    db["stats"]["total_responded"] = len(tweets_with_response)
-    
-    print(f"Estadísticas actualizadas:")
-    print(f"  - Total tweets procesados: {len(processed_tweets)}")
-    print(f"  - Total tweets con respuestas: {len(tweets_with_response)} (antes: {old_responded})")
-    
-    # Guardar archivo actualizado
-    try:
-        with open(db_file, 'w') as f:
-            json.dump(db, f, indent=2)
-        print("\n✅ Estadísticas actualizadas correctamente.")
-    except Exception as e:
-        print(f"\nError al guardar el archivo: {e}")
+    print(f"\n⚠️ Contadores desajustados:")
+    for key, (stored, computed) in differences.items():
+        if isinstance(computed, dict):
+            print(f"  - {key}: {len(stored)} entradas almacenadas, {len(computed)} calculadas")
+        else:
+            print(f"  - {key}: {stored} almacenado, {computed} calculado")
+    print("\nEjecuta fix_stats.py para corregirlos.")
 
 if __name__ == "__main__":
-    update_stats()
\ No newline at end of file
+    inspect_stats()
@@ -1,9 +1,49 @@
-import schedule
-import time
+import argparse
 import logging
 from services.twitter_service import TwitterService
+from services.stream_service import TweetStream
 from services.openai_service import OpenAIService
-from utils.database import Database
+from utils.database import open_database
+from utils.circuit_breaker import CircuitBreaker
+from utils.scheduler import AdaptiveScheduler
+from config.settings import (
+    DB_BACKEND,
+    DB_HOT_DAYS,
+    DB_RETENTION_DAYS,
+    DB_ARCHIVE_FORMAT,
+    DB_SEGMENT_PERIOD,
+    TWITTER_QUERY,
+    TWITTER_MAX_RESULTS,
+    TWITTER_MAX_PAGES,
+    POLL_INTERVAL_MINUTES,
+    POLL_MIN_INTERVAL_MINUTES,
+    POLL_MAX_INTERVAL_MINUTES,
+    TWEET_WORKERS,
+    OPENAI_CONCURRENCY,
+    OPENAI_API_BASE,
+    OPENAI_TIMEOUT,
+    TWITTER_CONCURRENCY,
+    STREAM_QUEUE_SIZE,
+    X_API_BEARER,
+    X_API_HOST,
+    RELEVANCE_THRESHOLD,
+    OPENAI_COMBINED,
+    OPENAI_BATCH_RELEVANCE,
+    RESPONSES_PER_CYCLE,
+    LLM_CACHE_SIZE,
+    LLM_CACHE_TTL_DAYS,
+    LLM_CYCLE_TOKEN_BUDGET,
+    LLM_DAILY_TOKEN_BUDGET,
+    LLM_DOWNGRADE_AT,
+    LLM_FALLBACK_MODEL,
+    SPAM_THRESHOLD,
+    NEAR_DUPLICATE_DISTANCE,
+    NEAR_DUPLICATE_WINDOW_HOURS,
+    CIRCUIT_FAILURE_RATE,
+    CIRCUIT_MIN_CALLS,
+    CIRCUIT_WINDOW_SECONDS,
+    CIRCUIT_OPEN_SECONDS
+)
 
 # Configuración de logging
 logging.basicConfig(
@@ -16,31 +56,112 @@ logging.basicConfig(
 )
 logger = logging.getLogger("crypto_bot")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bot de X que responde a tweets sobre criptomonedas")
+    parser.add_argument("--stream", action="store_true",
+                        help="Recibir los tweets en tiempo real con el filtered stream en lugar de buscarlos periódicamente")
+    return parser.parse_args()
+
+def circuit_breaker(name):
+    """Circuito de un servicio externo con la configuración de settings"""
+    return CircuitBreaker(
+        name,
+        failure_rate=CIRCUIT_FAILURE_RATE,
+        min_calls=CIRCUIT_MIN_CALLS,
+        window=CIRCUIT_WINDOW_SECONDS,
+        open_seconds=CIRCUIT_OPEN_SECONDS
+    )
+
 def main():
     """Función principal del bot de X que maneja criptomonedas"""
+    args = parse_args()
+    db = None
+    stream = None
+    openai_service = None
     try:
         # Inicializar servicios
-        db = Database()
-        openai_service = OpenAIService()
-        twitter_service = TwitterService(openai_service, db)
+        db = open_database(
+            DB_BACKEND,
+            hot_days=DB_HOT_DAYS,
+            retention_days=DB_RETENTION_DAYS,
+            archive_format=DB_ARCHIVE_FORMAT,
+            segment_period=DB_SEGMENT_PERIOD
+        )
+        openai_service = OpenAIService(
+            db=db,
+            cache_size=LLM_CACHE_SIZE,
+            cache_ttl=LLM_CACHE_TTL_DAYS * 24 * 3600,
+            max_in_flight=OPENAI_CONCURRENCY,
+            api_base=OPENAI_API_BASE,
+            timeout=OPENAI_TIMEOUT,
+            cycle_token_budget=LLM_CYCLE_TOKEN_BUDGET,
+            daily_token_budget=LLM_DAILY_TOKEN_BUDGET,
+            downgrade_at=LLM_DOWNGRADE_AT,
+            fallback_model=LLM_FALLBACK_MODEL,
+            circuit_breaker=circuit_breaker("OpenAI")
+        )
+        twitter_service = TwitterService(
+            openai_service,
+            db,
+            max_results=TWITTER_MAX_RESULTS,
+            query=TWITTER_QUERY,
+            max_pages=TWITTER_MAX_PAGES,
+            workers=TWEET_WORKERS,
+            twitter_concurrency=TWITTER_CONCURRENCY,
+            relevance_threshold=RELEVANCE_THRESHOLD,
+            combined_llm=OPENAI_COMBINED,
+            batch_relevance=OPENAI_BATCH_RELEVANCE,
+            responses_per_cycle=RESPONSES_PER_CYCLE,
+            spam_threshold=SPAM_THRESHOLD,
+            near_duplicate_distance=NEAR_DUPLICATE_DISTANCE,
+            near_duplicate_window=NEAR_DUPLICATE_WINDOW_HOURS * 3600,
+            circuit_breaker=circuit_breaker("X")
+        )
         
-        # Ejecutar una vez al inicio
-        twitter_service.process_tweets()
+        scheduler = AdaptiveScheduler(
+            interval=POLL_INTERVAL_MINUTES * 60,
+            min_interval=POLL_MIN_INTERVAL_MINUTES * 60,
+            max_interval=POLL_MAX_INTERVAL_MINUTES * 60,
+            page_size=twitter_service.max_results
+        )
+        
+        # Archivar una vez al día el historial antiguo en segmentos comprimidos
+        scheduler.daily("04:00", db.archive)
+        
+        if args.stream:
+            stream = TweetStream(X_API_BEARER, TWITTER_QUERY, queue_size=STREAM_QUEUE_SIZE, host=X_API_HOST)
+            stream.start()
+            
+            # Bucle principal del programa: procesar los tweets según llegan
+            logger.info("🚀 Bot iniciado correctamente en modo streaming.")
+            while True:
+                scheduler.run_pending()
+                twitter_service.process_stream(stream, timeout=1)
+                # Volcar a disco los cambios pendientes de la base de datos
+                db.flush_if_due()
         
-        # Programar ejecuciones periódicas
-        schedule.every(15).minutes.do(twitter_service.process_tweets)
+        # Volcar a disco los cambios pendientes de la base de datos
+        scheduler.every(30, db.flush_if_due)
         
-        # Bucle principal del programa
-        logger.info("🚀 Bot iniciado correctamente. Ejecutándose cada 15 minutos.")
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        # Bucle principal del programa: un ciclo al inicio y los siguientes
+        # según el intervalo adaptativo y los límites de la API
+        logger.info(f"🚀 Bot iniciado correctamente. Intervalo entre ciclos de {POLL_MIN_INTERVAL_MINUTES:g} "
+                    f"a {POLL_MAX_INTERVAL_MINUTES:g} minutos (inicial: {POLL_INTERVAL_MINUTES:g}).")
+        scheduler.run(twitter_service.process_tweets, ready_in=twitter_service.search_ready_in)
             
     except KeyboardInterrupt:
         logger.info("👋 Bot detenido manualmente.")
     except Exception as e:
         logger.error(f"❌ Error fatal: {e}")
         raise
+    finally:
+        if stream is not None:
+            stream.stop(timeout=5)
+        if openai_service is not None:
+            openai_service.close()
+        # Asegurar que no se pierden cambios pendientes al salir
+        if db is not None:
+            db.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
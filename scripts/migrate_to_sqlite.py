@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+Script para importar la base de datos JSON al backend SQLite.
+Ejecutar desde la raíz del proyecto: python scripts/migrate_to_sqlite.py
+"""
+
+import os
+import sys
+
+# Agregar el directorio raíz del proyecto al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import DEFAULT_JSON_FILE, DEFAULT_SQLITE_FILE
+from utils.sqlite_database import SQLiteDatabase
+
+def main():
+    """Función principal"""
+    if not os.path.exists(DEFAULT_JSON_FILE):
+        print(f"Error: El archivo {DEFAULT_JSON_FILE} no existe.")
+        return
+    
+    print(f"Importando {DEFAULT_JSON_FILE} en {DEFAULT_SQLITE_FILE}...")
+    db = SQLiteDatabase(DEFAULT_SQLITE_FILE)
+    try:
+        imported = db.import_json(DEFAULT_JSON_FILE)
+        stats = db.get_stats()
+    finally:
+        db.close()
+    
+    print(f"Tweets importados: {imported}")
+    print(f"Total de tweets procesados: {stats['total_processed']}")
+    print(f"Total de tweets respondidos: {stats['total_responded']}")
+    print("\n✅ Migración completada. Usa DB_BACKEND=sqlite para activar el nuevo backend.")
+
+if __name__ == "__main__":
+    main()
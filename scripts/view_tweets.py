@@ -6,13 +6,16 @@ Ejecutar desde la raíz del proyecto: python scripts/view_tweets.py
 
 import os
 import sys
-import json
+import argparse
 from datetime import datetime
+from itertools import islice
 
 # Agregar el directorio raíz del proyecto al path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.database import Database
+from utils.database import open_database
+
+TWEET_FIELDS = ["processed_at", "responded", "author_username", "tweet_text", "response_text"]
 
 def format_date(iso_date):
     """Formatea una fecha ISO a un formato más legible"""
@@ -22,10 +25,53 @@ def format_date(iso_date):
     except:
         return iso_date
 
+def print_tweet(i, tweet):
+    """Muestra un tweet procesado"""
+    print(f"\n----- Tweet #{i} -----")
+    print(f"ID: {tweet['id']}")
+    print(f"Autor: @{tweet['author_username']}")
+    print(f"Procesado: {format_date(tweet['processed_at'])}")
+    print(f"Respondido: {'✅ Sí' if tweet['responded'] else '❌ No'}")
+    
+    print("\nTWEET ORIGINAL:")
+    print(f"{tweet['tweet_text']}")
+    
+    if tweet['response_text']:
+        print("\nRESPUESTA GENERADA:")
+        print(f"{tweet['response_text']}")
+    else:
+        print("\nRESPUESTA: No se generó respuesta")
+    
+    print("-" * 50)
+
+def iter_latest(db, responded=False, page_size=20):
+    """
+    Recorre los últimos tweets procesados, del más reciente al más antiguo,
+    página a página con el índice de recencia de la base de datos.
+    """
+    before = None
+    while True:
+        page = db.get_last_processed_tweets(page_size, before=before)
+        for tweet in page:
+            if not responded or tweet['responded']:
+                yield tweet
+        # Los registros sin fecha van los últimos: no queda cursor con el que seguir
+        if len(page) < page_size or not page[-1]['processed_at']:
+            return
+        before = page[-1]['processed_at']
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Visualiza los tweets procesados")
+    parser.add_argument("--limit", type=int, default=20, help="Número máximo de tweets a mostrar")
+    parser.add_argument("--since", help="Muestra, a medida que se leen, los tweets procesados desde esta fecha (YYYY-MM-DD)")
+    parser.add_argument("--until", help="Fecha límite de procesamiento, excluida (YYYY-MM-DD)")
+    parser.add_argument("--responded", action="store_true", help="Solo los tweets cuya respuesta se publicó")
+    return parser.parse_args()
+
 def main():
     """Función principal"""
-    db = Database()
-    tweets = db.get_last_processed_tweets(limit=20)  # Obtener los últimos 20 tweets
+    args = parse_args()
+    db = open_database(read_only=True)
     stats = db.get_stats()
     
     # Mostrar estadísticas
@@ -34,30 +80,31 @@ def main():
     print(f"Total de tweets respondidos: {stats['total_responded']}")
     print(f"Tasa de respuesta: {(stats['total_responded']/stats['total_processed']*100) if stats['total_processed'] > 0 else 0:.1f}%")
     
-    # Mostrar tweets
-    print("\n===== ÚLTIMOS TWEETS PROCESADOS =====")
+    if args.since or args.until:
+        # Con un rango de fechas, los tweets se leen en streaming (la memoria no
+        # depende del tamaño del historial) y cada uno se muestra en cuanto se lee,
+        # en orden cronológico
+        tweets = db.iter_records(
+            fields=TWEET_FIELDS,
+            since=args.since,
+            until=args.until,
+            responded=True if args.responded else None
+        )
+        print(f"\n===== TWEETS PROCESADOS DESDE {args.since or 'EL PRINCIPIO'} =====")
+        shown = 0
+        for shown, tweet in enumerate(islice(tweets, args.limit), 1):
+            print_tweet(shown, tweet)
+        if not shown:
+            print("No hay tweets procesados en ese periodo.")
+        return
     
-    if not tweets:
+    # Sin rango, los últimos tweets salen del índice de recencia, sin recorrer el historial
+    print("\n===== ÚLTIMOS TWEETS PROCESADOS =====")
+    shown = 0
+    for shown, tweet in enumerate(islice(iter_latest(db, args.responded), args.limit), 1):
+        print_tweet(shown, tweet)
+    if not shown:
         print("No hay tweets procesados todavía.")
-        return
-        
-    for i, tweet in enumerate(tweets, 1):
-        print(f"\n----- Tweet #{i} -----")
-        print(f"ID: {tweet['id']}")
-        print(f"Autor: @{tweet['author']}")
-        print(f"Procesado: {format_date(tweet['processed_at'])}")
-        print(f"Respondido: {'✅ Sí' if tweet['responded'] else '❌ No'}")
-        
-        print("\nTWEET ORIGINAL:")
-        print(f"{tweet['tweet_text']}")
-        
-        if tweet['response_text']:
-            print("\nRESPUESTA GENERADA:")
-            print(f"{tweet['response_text']}")
-        else:
-            print("\nRESPUESTA: No se generó respuesta")
-        
-        print("-" * 50)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
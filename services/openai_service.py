@@ -1,73 +1,368 @@
 import openai
+import json
+import math
+import re
 import logging
-import time
+from services.openai_transport import OpenAITransport
+from utils.lru_cache import TTLCache
+from utils.token_budget import TokenBudget, BudgetExceeded, DOWNGRADE
+from utils.circuit_breaker import CircuitOpenError
+from utils.text import text_key
 from config.settings import OPENAI_API_KEY
 
 logger = logging.getLogger("crypto_bot.openai")
 
+# Indicaciones de tono según el sentimiento detectado en el tweet
+TONE_INSTRUCTIONS = {
+    "positive": "El tweet es positivo: responde con un tono entusiasta.",
+    "negative": "El tweet es negativo: responde con empatía y calma.",
+    "neutral": "El tweet es neutral: responde de forma objetiva e informativa."
+}
+
+# Relevancia asignada cuando no se puede obtener del modelo
+DEFAULT_RELEVANCE = 0.5
+
+# Errores por los que una llamada no llega a hacerse y el trabajo debe
+# aplazarse (en lugar de darlo por terminado con valores por defecto)
+DEFERRABLE_ERRORS = (BudgetExceeded, CircuitOpenError)
+
+# Nombres de las cachés persistidas de relevancias y respuestas
+RELEVANCE_CACHE = "relevance"
+RESPONSE_CACHE = "responses"
+
+
+def estimate_tokens(text):
+    """Estimación aproximada de tokens de un texto (unos 4 caracteres por token)"""
+    return len(text) // 4 + 1
+
 class OpenAIService:
-    def __init__(self, model="gpt-4", max_retries=3):
+    def __init__(self, model="gpt-4", max_retries=3, batch_max_items=20, batch_max_tokens=2000,
+                 db=None, cache_size=5000, cache_ttl=7 * 24 * 3600, max_in_flight=3,
+                 api_base=None, timeout=60, transport=None, cycle_token_budget=None,
+                 daily_token_budget=None, downgrade_at=0.8, fallback_model=None, budget=None,
+                 circuit_breaker=None):
         """
         Inicializa el servicio de OpenAI.
         
         Args:
             model: Modelo de OpenAI a utilizar
             max_retries: Número máximo de reintentos en caso de error
+            batch_max_items: Tweets como máximo por petición en analyze_relevance_batch
+            batch_max_tokens: Tokens (estimados) como máximo de tweets por petición
+                en analyze_relevance_batch
+            db: Base de datos donde persistir las cachés (opcional; sin ella las
+                cachés solo duran mientras el proceso está en marcha)
+            cache_size: Entradas como máximo de cada caché
+            cache_ttl: Segundos de validez de cada entrada de caché
+            max_in_flight: Peticiones simultáneas como máximo a OpenAI
+            api_base: URL base de la API (None para la de OpenAI)
+            timeout: Segundos máximos de cada petición
+            transport: Transporte de las peticiones (por defecto, un OpenAITransport
+                creado con las opciones anteriores)
+            cycle_token_budget: Tokens como máximo por ciclo (None para no limitarlos)
+            daily_token_budget: Tokens como máximo por día (None para no limitarlos)
+            downgrade_at: Fracción del presupuesto a partir de la que se usa `fallback_model`
+            fallback_model: Modelo más barato para cuando el presupuesto está cerca
+                del límite (None para seguir usando `model`)
+            budget: Contabilidad de tokens (por defecto, un TokenBudget creado con
+                las opciones anteriores)
+            circuit_breaker: CircuitBreaker de OpenAI (por defecto, uno con la
+                configuración por defecto)
         """
         # Configuración para versión 0.28.x
         openai.api_key = OPENAI_API_KEY
         self.model = model
         self.max_retries = max_retries
+        self.batch_max_items = batch_max_items
+        self.batch_max_tokens = batch_max_tokens
+        
+        # Sesión HTTP compartida, límite de peticiones en curso y reintentos
+        self.transport = transport or OpenAITransport(
+            api_base=api_base,
+            max_in_flight=max_in_flight,
+            pool_size=max(max_in_flight, 10),
+            max_retries=max_retries,
+            timeout=timeout,
+            breaker=circuit_breaker
+        )
+        
+        # Consumo de tokens por ciclo, hora y tipo de llamada, y presupuesto
+        self.fallback_model = fallback_model
+        self.budget = budget or TokenBudget(
+            cycle_tokens=cycle_token_budget,
+            daily_tokens=daily_token_budget,
+            downgrade_at=downgrade_at,
+            db=db
+        )
+        
+        # Cachés de relevancia y de respuestas por texto normalizado: los tweets
+        # de plantilla repetidos no vuelven a pagar una llamada a OpenAI
+        self.db = db
+        self._caches = {
+            RELEVANCE_CACHE: TTLCache(maxsize=cache_size, ttl=cache_ttl),
+            RESPONSE_CACHE: TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        }
+        if db is not None:
+            for name, cache in self._caches.items():
+                cache.load(db.get_cache_entries(name))
     
-    def generate_response(self, tweet_text):
+    def _cache_get(self, name, make_key):
         """
-        Genera una respuesta basada en el texto del tweet usando OpenAI.
+        Busca en la caché la entrada del modelo principal y, mientras se usa el
+        de respaldo, también la suya.
         
         Args:
-            tweet_text: Texto del tweet al que se responderá
-            
+            make_key: Función que devuelve la clave para un modelo
+        """
+        cache = self._caches[name]
+        key = make_key(self.model)
+        if key not in cache and self.fallback_model and self.budget.status() == DOWNGRADE:
+            fallback_key = make_key(self.fallback_model)
+            if fallback_key in cache:
+                return cache.get(fallback_key)
+        return cache.get(key)
+    
+    def _cache_put(self, name, key, value):
+        """Guarda un valor en la caché y, si hay base de datos, lo persiste"""
+        expires_at = self._caches[name].set(key, value)
+        if self.db is not None:
+            self.db.put_cache_entries(name, {key: (value, expires_at)})
+    
+    # Las claves incluyen el modelo que respondió: una respuesta del modelo de
+    # respaldo no debe servirse como si fuera del principal
+    def _relevance_key(self, tweet_text, model):
+        return text_key(tweet_text, model)
+    
+    def _response_key(self, tweet_text, sentiment, model):
+        # El tono de la respuesta depende del sentimiento
+        return text_key(tweet_text, model, (sentiment or {}).get("label"))
+    
+    def cache_stats(self):
+        """
+        Aciertos y fallos de las cachés desde el arranque.
+        
         Returns:
-            str: Respuesta generada o None si hay error
+            dict: {nombre de la caché: {"hits", "misses", "size"}}
         """
-        system_prompt = """
+        return {
+            name: {"hits": cache.hits, "misses": cache.misses, "size": len(cache)}
+            for name, cache in self._caches.items()
+        }
+    
+    def available(self):
+        """Indica si se puede llamar a OpenAI (el circuito no está abierto)"""
+        return self.transport.breaker.available()
+    
+    def _model_for_call(self):
+        """
+        Modelo para la siguiente llamada: el de respaldo si el presupuesto está
+        cerca del límite.
+        
+        Raises:
+            BudgetExceeded: Si el presupuesto está agotado
+            CircuitOpenError: Si el circuito de OpenAI está abierto
+        """
+        self.budget.check()
+        self.transport.breaker.check()
+        if self.fallback_model and self.budget.status() == DOWNGRADE:
+            return self.fallback_model
+        return self.model
+    
+    def _record_usage(self, call_type, model, messages, response):
+        """Registra los tokens de una llamada, estimándolos si la API no los informa"""
+        usage = response.get("usage") or {}
+        if "prompt_tokens" in usage:
+            self.budget.record(call_type, model, usage["prompt_tokens"], usage.get("completion_tokens", 0))
+        else:
+            # Unos pocos tokens de formato por mensaje, además del contenido
+            prompt_tokens = sum(estimate_tokens(message["content"]) + 4 for message in messages)
+            self.budget.record(call_type, model, prompt_tokens, estimate_tokens(self._content(response)), estimated=True)
+    
+    def _chat(self, messages, max_tokens, temperature, call_type):
+        """
+        Hace una petición de chat y registra su consumo; el transporte reintenta
+        los errores temporales.
+        
+        Args:
+            call_type: Tipo de llamada, para desglosar el consumo
+        
+        Returns:
+            tuple: (contenido de la respuesta, modelo que respondió)
+        
+        Raises:
+            BudgetExceeded: Si el presupuesto de tokens está agotado
+            CircuitOpenError: Si el circuito de OpenAI está abierto
+            openai.error.OpenAIError: Si el error no es temporal o se agotan los reintentos
+        """
+        model = self._model_for_call()
+        response = self.transport.chat(model, messages, max_tokens, temperature)
+        self._record_usage(call_type, model, messages, response)
+        return self._content(response), model
+    
+    @staticmethod
+    def _content(response):
+        # Estructura de respuesta para 0.28.x
+        return response['choices'][0]['message']['content'].strip()
+    
+    def close(self):
+        """Cierra las conexiones con OpenAI"""
+        self.transport.close()
+    
+    @staticmethod
+    def _response_prompt(sentiment=None):
+        """Instrucciones de sistema para responder a un tweet, adaptadas al sentimiento"""
+        prompt = """
         Eres un bot de X especializado en criptomonedas. Responde de manera informativa,
         amigable y concisa. Tu objetivo es proporcionar valor y ayudar a las personas
         interesadas en criptomonedas. Limita tus respuestas a 280 caracteres.
         Nunca menciones que eres una IA o un bot.
         """
+        tone = TONE_INSTRUCTIONS.get((sentiment or {}).get("label"))
+        if tone:
+            prompt += f"\n        {tone}\n"
+        return prompt
+    
+    @staticmethod
+    def _truncate_reply(reply):
+        """Asegura que la respuesta no excede el límite de caracteres"""
+        if len(reply) > 280:
+            reply = reply[:277] + "..."
+        return reply
+    
+    def generate_response(self, tweet_text, sentiment=None):
+        """
+        Genera una respuesta basada en el texto del tweet usando OpenAI.
         
-        for attempt in range(self.max_retries):
-            try:
-                # API para versión 0.28.x
-                response = openai.ChatCompletion.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": f"Responde a este tweet: {tweet_text}"}
-                    ],
-                    max_tokens=120,  # Limitado para mantener respuestas cortas
-                    temperature=0.7   # Balance entre creatividad y coherencia
-                )
-                
-                # Estructura de respuesta para 0.28.x
-                reply = response['choices'][0]['message']['content'].strip()
-                
-                # Asegurar que la respuesta no excede el límite de caracteres
-                if len(reply) > 280:
-                    reply = reply[:277] + "..."
-                    
-                return reply
-                
-            except openai.error.RateLimitError as e:
-                wait_time = 2 ** attempt  # Backoff exponencial
-                logger.warning(f"⚠️ OpenAI temporalmente no disponible. Reintentando en {wait_time}s: {e}")
-                time.sleep(wait_time)
-                
-            except Exception as e:
-                logger.error(f"❌ Error al generar respuesta con OpenAI: {e}")
-                break
-                
-        return None
+        Args:
+            tweet_text: Texto del tweet al que se responderá
+            sentiment: Resultado del análisis de sentimiento (opcional), para adaptar el tono
+            
+        Returns:
+            str: Respuesta generada o None si hay error
+        
+        Raises:
+            BudgetExceeded: Si el presupuesto de tokens está agotado
+            CircuitOpenError: Si el circuito de OpenAI está abierto
+        """
+        cached = self._cache_get(RESPONSE_CACHE, lambda model: self._response_key(tweet_text, sentiment, model))
+        if cached is not None:
+            return cached
+        
+        try:
+            reply, model = self._chat(
+                [
+                    {"role": "system", "content": self._response_prompt(sentiment)},
+                    {"role": "user", "content": f"Responde a este tweet: {tweet_text}"}
+                ],
+                max_tokens=120,  # Limitado para mantener respuestas cortas
+                temperature=0.7,  # Balance entre creatividad y coherencia
+                call_type="response"
+            )
+        except DEFERRABLE_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error al generar respuesta con OpenAI: {e}")
+            return None
+        
+        if not reply:
+            return None
+        reply = self._truncate_reply(reply)
+        self._cache_put(RESPONSE_CACHE, self._response_key(tweet_text, sentiment, model), reply)
+        return reply
+    
+    def analyze_and_respond(self, tweet_text, sentiment=None, threshold=0.7):
+        """
+        Evalúa la relevancia del tweet y, si alcanza el umbral, genera la
+        respuesta en la misma petición (una sola llamada en lugar de dos).
+        
+        Si la salida del modelo no es el JSON esperado, se recurre a las dos
+        llamadas separadas (analyze_tweet_relevance y generate_response).
+        
+        Args:
+            tweet_text: Texto del tweet
+            sentiment: Resultado del análisis de sentimiento (opcional), para adaptar el tono
+            threshold: Relevancia mínima para generar una respuesta
+            
+        Returns:
+            tuple: (relevancia entre 0.0 y 1.0, respuesta o None)
+        
+        Raises:
+            BudgetExceeded: Si el presupuesto de tokens está agotado
+            CircuitOpenError: Si el circuito de OpenAI está abierto
+        """
+        relevance = self._cache_get(RELEVANCE_CACHE, lambda model: self._relevance_key(tweet_text, model))
+        if relevance is not None:
+            # Relevancia ya conocida: como mucho falta la respuesta (también en caché)
+            if relevance < threshold:
+                return relevance, None
+            return relevance, self.generate_response(tweet_text, sentiment)
+        
+        system_prompt = self._response_prompt(sentiment) + f"""
+        Antes de responder, evalúa la relevancia del tweet sobre criptomonedas entre
+        0.0 (irrelevante o spam) y 1.0 (pregunta directa o discusión interesante).
+        Contesta solamente con un objeto JSON: {{"relevance": <número>, "reply": <texto>}}.
+        Si la relevancia es menor que {threshold}, usa null como "reply".
+        """
+        
+        try:
+            content, model = self._chat(
+                [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": tweet_text}
+                ],
+                max_tokens=150,  # Respuesta corta más el envoltorio JSON
+                temperature=0.5,  # Puntuación estable sin perder naturalidad en la respuesta
+                call_type="combined"
+            )
+        except DEFERRABLE_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error al analizar y responder con OpenAI: {e}")
+            return DEFAULT_RELEVANCE, None  # Valor por defecto en caso de error
+        
+        parsed = self._parse_relevance_reply(content) if content else None
+        if parsed is None:
+            logger.warning(f"⚠️ Salida combinada no válida; usando llamadas separadas: {content}")
+            relevance = self.analyze_tweet_relevance(tweet_text)
+            reply = self.generate_response(tweet_text, sentiment) if relevance >= threshold else None
+            return relevance, reply
+        
+        relevance, reply = parsed
+        self._cache_put(RELEVANCE_CACHE, self._relevance_key(tweet_text, model), relevance)
+        if relevance < threshold:
+            return relevance, None
+        if not reply:
+            # Relevante pero sin respuesta: generarla por separado
+            return relevance, self.generate_response(tweet_text, sentiment)
+        reply = self._truncate_reply(reply)
+        self._cache_put(RESPONSE_CACHE, self._response_key(tweet_text, sentiment, model), reply)
+        return relevance, reply
+    
+    @staticmethod
+    def _parse_relevance_reply(content):
+        """
+        Extrae relevancia y respuesta de la salida combinada del modelo.
+        
+        Returns:
+            tuple: (relevancia, respuesta o None) o None si la salida no es válida
+        """
+        # Tolerar bloques de código y texto alrededor del objeto JSON
+        match = re.search(r"\{.*\}", content, re.DOTALL)
+        if not match:
+            return None
+        try:
+            data = json.loads(match.group(0))
+            relevance = float(data["relevance"])
+        except (ValueError, TypeError, KeyError):
+            return None
+        # json.loads acepta NaN, que no es una puntuación válida
+        if math.isnan(relevance):
+            return None
+        relevance = max(0.0, min(1.0, relevance))
+        reply = data.get("reply")
+        if not isinstance(reply, str) or not reply.strip():
+            reply = None
+        return relevance, reply.strip() if reply else None
     
     def analyze_tweet_relevance(self, tweet_text):
         """
@@ -78,7 +373,15 @@ class OpenAIService:
             
         Returns:
             float: Puntuación de relevancia entre 0.0 y 1.0
+        
+        Raises:
+            BudgetExceeded: Si el presupuesto de tokens está agotado
+            CircuitOpenError: Si el circuito de OpenAI está abierto
         """
+        cached = self._cache_get(RELEVANCE_CACHE, lambda model: self._relevance_key(tweet_text, model))
+        if cached is not None:
+            return cached
+        
         system_prompt = """
         Evalúa la relevancia de un tweet sobre criptomonedas. Asigna una puntuación
         entre 0.0 y 1.0 donde:
@@ -89,28 +392,175 @@ class OpenAIService:
         """
         
         try:
-            # API para versión 0.28.x
-            response = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[
+            relevance_text, model = self._chat(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": tweet_text}
                 ],
                 max_tokens=10,
-                temperature=0.1  # Baja temperatura para respuestas consistentes
+                temperature=0.1,  # Baja temperatura para respuestas consistentes
+                call_type="relevance"
             )
             
             # Extraer el valor numérico
-            relevance_text = response['choices'][0]['message']['content'].strip()
             try:
                 relevance = float(relevance_text)
+                if math.isnan(relevance):
+                    raise ValueError("NaN")
                 # Asegurar que está en el rango correcto
                 relevance = max(0.0, min(1.0, relevance))
-                return relevance
             except ValueError:
                 logger.warning(f"⚠️ No se pudo convertir la relevancia a número: {relevance_text}")
-                return 0.5  # Valor por defecto
+                return DEFAULT_RELEVANCE  # Valor por defecto
+            self._cache_put(RELEVANCE_CACHE, self._relevance_key(tweet_text, model), relevance)
+            return relevance
                 
+        except DEFERRABLE_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"❌ Error al analizar relevancia: {e}")
-            return 0.5  # Valor por defecto en caso de error
\ No newline at end of file
+            return DEFAULT_RELEVANCE  # Valor por defecto en caso de error
+    
+    def analyze_relevance_batch(self, texts):
+        """
+        Analiza la relevancia de varios tweets con pocas peticiones: los tweets
+        se numeran y se envían juntos, repartidos en lotes que no superan
+        `batch_max_items` tweets ni `batch_max_tokens` tokens estimados, que
+        se envían en paralelo (hasta el límite de peticiones en curso). Los
+        tweets cuya puntuación falta o no es válida se reintentan (solo ellos)
+        hasta `max_retries` veces. Los textos con la relevancia en caché no se
+        envían, y los que coinciden una vez normalizados se envían una sola vez.
+        
+        Args:
+            texts: Textos de los tweets a analizar
+            
+        Returns:
+            list: Puntuación de relevancia entre 0.0 y 1.0 de cada texto, en el
+                mismo orden (DEFAULT_RELEVANCE si no se pudo obtener)
+        
+        Raises:
+            BudgetExceeded: Si el presupuesto de tokens está agotado
+            CircuitOpenError: Si el circuito de OpenAI está abierto
+        """
+        # Los textos se agrupan por su clave con el modelo principal; en la
+        # caché se guardan con la del modelo que respondió
+        keys = [self._relevance_key(text, self.model) for text in texts]
+        scores = {}
+        pending = []
+        # Los textos en caché no se envían y los repetidos se envían una sola vez
+        first_index = {}
+        for index, key in enumerate(keys):
+            if key in scores or key in first_index:
+                continue
+            cached = self._cache_get(RELEVANCE_CACHE, lambda model: self._relevance_key(texts[index], model))
+            if cached is not None:
+                scores[key] = cached
+            else:
+                first_index[key] = index
+                pending.append(index)
+        
+        for attempt in range(self.max_retries):
+            if not pending:
+                break
+            failed = []
+            model = self._model_for_call()
+            batches = list(self._relevance_batches(texts, pending))
+            submitted = [self._submit_batch(model, [texts[i] for i in batch]) for batch in batches]
+            for batch, (messages, future) in zip(batches, submitted):
+                batch_scores = self._batch_scores(model, messages, future, len(batch))
+                for position, index in enumerate(batch, start=1):
+                    if position in batch_scores:
+                        scores[keys[index]] = batch_scores[position]
+                        self._cache_put(RELEVANCE_CACHE, self._relevance_key(texts[index], model), batch_scores[position])
+                    else:
+                        failed.append(index)
+            if failed:
+                logger.warning(f"⚠️ Sin puntuación válida para {len(failed)} tweets; reintentando ({attempt + 1}/{self.max_retries})")
+            pending = failed
+        
+        if pending:
+            # Si OpenAI ha dejado de responder, aplazar en lugar de puntuar por defecto
+            self.transport.breaker.check()
+            logger.warning(f"⚠️ Relevancia por defecto para {len(pending)} tweets")
+        return [scores.get(key, DEFAULT_RELEVANCE) for key in keys]
+    
+    def _relevance_batches(self, texts, indexes):
+        """Reparte los índices en lotes según el número de tweets y los tokens estimados"""
+        batch, batch_tokens = [], 0
+        for index in indexes:
+            tokens = estimate_tokens(texts[index])
+            if batch and (len(batch) >= self.batch_max_items or batch_tokens + tokens > self.batch_max_tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(index)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+    
+    def _submit_batch(self, model, texts):
+        """
+        Lanza en segundo plano la puntuación de un lote de tweets en una sola petición.
+        
+        Returns:
+            tuple: (mensajes enviados, Future con la respuesta de la API)
+        """
+        system_prompt = """
+        Evalúa la relevancia de cada tweet sobre criptomonedas. Asigna a cada uno una
+        puntuación entre 0.0 y 1.0 donde:
+        - 0.0: Completamente irrelevante o spam
+        - 0.5: Moderadamente relevante
+        - 1.0: Altamente relevante, pregunta directa o discusión interesante
+        Los tweets van numerados. Responde solamente con un objeto JSON que asocie
+        cada número con su puntuación, por ejemplo: {"1": 0.8, "2": 0.1}
+        """
+        # Una línea por tweet: los saltos de línea del texto no deben partir la numeración
+        numbered = "\n".join(f"[{i}] {' '.join(text.split())}" for i, text in enumerate(texts, start=1))
+        
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": numbered}
+        ]
+        future = self.transport.submit(
+            model,
+            messages,
+            max_tokens=10 * len(texts) + 10,
+            temperature=0.1  # Baja temperatura para respuestas consistentes
+        )
+        return messages, future
+    
+    def _batch_scores(self, model, messages, future, size):
+        """
+        Espera la respuesta de un lote lanzado con _submit_batch y extrae las puntuaciones.
+        
+        Returns:
+            dict: {posición en el lote (desde 1): relevancia} de las puntuaciones válidas
+        """
+        try:
+            response = future.result()
+            self._record_usage("relevance_batch", model, messages, response)
+            content = self._content(response)
+        except CircuitOpenError:
+            # Circuito abierto o semiabierto con la prueba en curso: el lote se
+            # reintenta o, si OpenAI sigue sin responder, se aplaza
+            return {}
+        except Exception as e:
+            logger.error(f"❌ Error al analizar relevancia en lote: {e}")
+            return {}
+        
+        match = re.search(r"\{.*\}", content or "", re.DOTALL)
+        try:
+            data = json.loads(match.group(0)) if match else {}
+        except ValueError:
+            data = {}
+        if not isinstance(data, dict):
+            return {}
+        
+        scores = {}
+        for key, value in data.items():
+            try:
+                position, relevance = int(key), float(value)
+            except (ValueError, TypeError):
+                continue
+            if 1 <= position <= size and not math.isnan(relevance):
+                scores[position] = max(0.0, min(1.0, relevance))
+        return scores
@@ -0,0 +1,209 @@
+import random
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+from utils.circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger("crypto_bot.openai")
+
+# Errores de OpenAI que se pueden reintentar: saturación, caídas y problemas de red
+TRANSIENT_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.ServiceUnavailableError,
+    openai.error.APIConnectionError,
+    openai.error.Timeout,
+    openai.error.TryAgain,
+    openai.error.APIError
+)
+
+
+def is_transient(error):
+    """Indica si merece la pena reintentar una petición que falló con `error`"""
+    if not isinstance(error, TRANSIENT_ERRORS):
+        return False
+    if isinstance(error, openai.error.APIError):
+        # APIError agrupa los códigos sin clase propia: solo los 5xx (o sin
+        # código, como una respuesta ilegible) son temporales
+        return error.http_status is None or error.http_status >= 500
+    return True
+
+
+def retry_after(error):
+    """
+    Segundos de espera que indica el servidor en las cabeceras de un error
+    (retry-after-ms o retry-after, en segundos o como fecha HTTP).
+
+    Returns:
+        float: Segundos de espera o None si el servidor no indica ninguno
+    """
+    headers = {name.lower(): value for name, value in (getattr(error, "headers", None) or {}).items()}
+    try:
+        if "retry-after-ms" in headers:
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class _PooledSession(requests.Session):
+    """
+    Sesión compartida por todas las llamadas a OpenAI.
+
+    La librería de OpenAI cierra periódicamente la sesión de cada hilo para
+    renovarla; con una sesión compartida eso cerraría las conexiones que
+    están usando los demás hilos, así que close() no hace nada y la sesión
+    solo se cierra con shutdown().
+    """
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+class OpenAITransport:
+    """
+    Transporte de las peticiones de chat a OpenAI.
+
+    Todas las peticiones comparten una sesión HTTP con un pool de conexiones
+    persistentes (keep-alive), en lugar de abrir una conexión TLS nueva cada
+    vez. Como mucho `max_in_flight` peticiones están en curso a la vez;
+    submit() las encola en un pool de hilos para lanzar varias en paralelo.
+
+    Los errores temporales (429, 5xx, red y timeouts) se reintentan con
+    backoff exponencial con jitter. Si el servidor indica cuánto esperar
+    (Retry-After), se respeta, y mientras tanto no se envía ninguna otra
+    petición. Las esperas se hacen sin ocupar hueco de petición en curso:
+    una petición que espera no frena a las demás.
+
+    Cada intento se anota en un CircuitBreaker: si OpenAI falla de forma
+    continuada, el circuito se abre y las peticiones fallan al instante con
+    CircuitOpenError en lugar de agotar sus reintentos.
+    """
+
+    def __init__(self, api_base=None, max_in_flight=3, pool_size=10, max_retries=3,
+                 backoff_base=1.0, backoff_max=60.0, timeout=60, breaker=None, clock=time.time,
+                 sleep=time.sleep):
+        """
+        Args:
+            api_base: URL base de la API (None para la de OpenAI; útil para
+                apuntar a un servidor local de pruebas)
+            max_in_flight: Peticiones en curso como máximo
+            pool_size: Conexiones persistentes como máximo, y también peticiones
+                que submit() puede tener en marcha o esperando a reintentar
+            max_retries: Intentos como máximo de cada petición
+            backoff_base: Segundos de espera base del backoff exponencial
+            backoff_max: Segundos máximos de espera entre intentos; si el servidor
+                pide esperar más, la petición falla sin reintentar
+            timeout: Segundos máximos de cada petición
+            breaker: CircuitBreaker de OpenAI (por defecto, uno con la configuración por defecto)
+            clock: Función que devuelve la hora actual en segundos
+            sleep: Función para esperar (útil en pruebas)
+        """
+        self.api_base = api_base
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker("OpenAI", clock=clock)
+        self._clock = clock
+        self._sleep = sleep
+
+        self.session = _PooledSession()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # La librería (0.28.x) usa esta sesión para todas sus peticiones
+        openai.requestssession = self.session
+
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="openai")
+        # Hora hasta la que el servidor pidió no enviar peticiones
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def chat(self, model, messages, max_tokens, temperature):
+        """
+        Hace una petición de chat, reintentando los errores temporales.
+
+        Returns:
+            dict: Respuesta completa de la API
+
+        Raises:
+            CircuitOpenError: Si el circuito de OpenAI está abierto
+            openai.error.OpenAIError: Si el error no es temporal o se agotan los reintentos
+        """
+        for attempt in range(self.max_retries):
+            self._wait_resume()
+            self.breaker.allow()
+            try:
+                with self._in_flight:
+                    # API para versión 0.28.x
+                    response = openai.ChatCompletion.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        api_base=self.api_base,
+                        request_timeout=self.timeout
+                    )
+                self.breaker.record_success()
+                return response
+            except Exception as e:
+                if not is_transient(e):
+                    # OpenAI respondió: el error es de la petición, no del servicio
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.max_retries - 1:
+                    raise
+                wait_time = self._backoff(e, attempt)
+                logger.warning(f"⚠️ OpenAI temporalmente no disponible. Reintentando en {wait_time:.1f}s: {e}")
+                self._sleep(wait_time)
+
+    def submit(self, model, messages, max_tokens, temperature):
+        """
+        Lanza una petición de chat en segundo plano.
+
+        Returns:
+            Future: Con el resultado de chat()
+        """
+        return self._executor.submit(self.chat, model, messages, max_tokens, temperature)
+
+    def _backoff(self, error, attempt):
+        """Segundos de espera antes del siguiente intento"""
+        hint = retry_after(error)
+        if hint is None:
+            # Backoff exponencial con jitter completo: los reintentos de
+            # peticiones que fallaron a la vez no se repiten a la vez
+            return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if hint > self.backoff_max:
+            raise error
+        wait_time = hint + random.uniform(0, self.backoff_base)
+        if isinstance(error, openai.error.RateLimitError):
+            # El límite es de la cuenta: ninguna petición debe salir antes
+            with self._lock:
+                self._resume_at = max(self._resume_at, self._clock() + wait_time)
+        return wait_time
+
+    def _wait_resume(self):
+        wait_time = self._resume_at - self._clock()
+        if wait_time > 0:
+            self._sleep(wait_time)
+
+    def close(self):
+        """Espera a las peticiones pendientes y cierra las conexiones"""
+        self._executor.shutdown(wait=True)
+        self.session.shutdown()
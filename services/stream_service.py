@@ -0,0 +1,172 @@
+import queue
+import random
+import logging
+import threading
+import requests
+import tweepy
+from services.twitter_service import TWEET_FIELDS
+
+logger = logging.getLogger("crypto_bot.stream")
+
+# Host de la API de X al que tweepy dirige todas las peticiones
+API_HOST = "https://api.twitter.com"
+
+# Etiqueta de las reglas del stream creadas por el bot
+RULE_TAG = "crypto_bot"
+
+
+class _HostSession(requests.Session):
+    """Sesión que redirige a otro host las peticiones dirigidas a la API de X (útil para pruebas)"""
+
+    def __init__(self, host):
+        super().__init__()
+        self.host = host.rstrip("/")
+
+    def request(self, method, url, *args, **kwargs):
+        if url.startswith(API_HOST):
+            url = self.host + url[len(API_HOST):]
+        return super().request(method, url, *args, **kwargs)
+
+
+class TweetStream(tweepy.StreamingClient):
+    """
+    Ingesta de tweets en tiempo real con el filtered stream de X.
+
+    Los tweets recibidos se dejan en una cola acotada que vacía el pipeline
+    de procesamiento (TwitterService.process_stream). Si el pipeline se
+    retrasa y la cola se llena, el hilo del stream se bloquea hasta que haya
+    hueco: deja de leer del socket en lugar de acumular tweets sin límite.
+
+    tweepy ya reintenta con backoff los errores HTTP y de red; cuando la
+    conexión se cierra o el stream termina por una excepción, se vuelve a
+    conectar esperando un backoff exponencial con jitter que se reinicia en
+    cuanto llegan datos.
+    """
+
+    def __init__(self, bearer_token, query, queue_size=100, host=API_HOST,
+                 reconnect_min=1.0, reconnect_max=320.0, **kwargs):
+        """
+        Args:
+            bearer_token: Bearer token de la aplicación
+            query: Consulta de búsqueda, usada como regla del stream
+            queue_size: Tweets que caben en la cola antes de aplicar contrapresión
+            host: Host de la API (para apuntar a un servidor local de pruebas)
+            reconnect_min: Segundos de espera antes del primer reintento de conexión
+            reconnect_max: Segundos máximos de espera entre reintentos
+            **kwargs: Opciones adicionales de tweepy.StreamingClient
+        """
+        super().__init__(bearer_token, **kwargs)
+        self.session = _HostSession(host)
+        self.query = query
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.reconnect_min = reconnect_min
+        self.reconnect_max = reconnect_max
+        self.reconnects = 0
+        self._stop = threading.Event()
+        self._received = False
+        self._supervisor = None
+
+    def sync_rules(self):
+        """
+        Ajusta las reglas del stream a la consulta: elimina las reglas del bot
+        con otra consulta y añade la actual si no existe.
+        """
+        response = self.get_rules()
+        rules = [rule for rule in (response.data or []) if rule.tag == RULE_TAG]
+        stale = [rule.id for rule in rules if rule.value != self.query]
+        if stale:
+            self.delete_rules(stale)
+            logger.info(f"🧹 Eliminadas {len(stale)} reglas antiguas del stream")
+        if not any(rule.value == self.query for rule in rules):
+            self.add_rules(tweepy.StreamRule(self.query, tag=RULE_TAG))
+            logger.info(f"📏 Regla del stream creada: {self.query}")
+
+    def start(self):
+        """Sincroniza las reglas y empieza a recibir tweets en un hilo en segundo plano"""
+        self.sync_rules()
+        self._stop.clear()
+        self._supervisor = threading.Thread(target=self._run, name="tweet-stream", daemon=True)
+        self._supervisor.start()
+
+    def stop(self, timeout=None):
+        """Cierra la conexión y espera a que termine el hilo del stream"""
+        self._stop.set()
+        self.disconnect()
+        if self._supervisor is not None:
+            self._supervisor.join(timeout)
+            self._supervisor = None
+
+    def _run(self):
+        attempt = 0
+        while not self._stop.is_set():
+            self._received = False
+            self.filter(
+                tweet_fields=TWEET_FIELDS,
+                expansions=["author_id"],
+                user_fields=["username"]
+            )
+            if self._stop.is_set():
+                break
+            # Una conexión que llegó a entregar datos reinicia el backoff
+            attempt = 0 if self._received else attempt + 1
+            wait = min(self.reconnect_max, self.reconnect_min * 2 ** attempt)
+            wait *= random.uniform(0.5, 1.0)
+            self.reconnects += 1
+            logger.warning(f"🔌 Stream desconectado; reconectando en {wait:.1f} segundos")
+            self._stop.wait(wait)
+
+    def on_connect(self):
+        logger.info("📡 Conectado al stream de tweets")
+
+    def on_closed(self, response):
+        # Salir del bucle de tweepy, que reconectaría sin esperar; _run
+        # vuelve a conectar con backoff
+        self.running = False
+
+    def on_exception(self, exception):
+        logger.error(f"❌ Error en el stream de tweets: {exception}")
+
+    def on_response(self, response):
+        if response.data is None:
+            return
+        self._received = True
+        item = (response.data, response.includes.get("users", []))
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            logger.warning("⏳ Cola del stream llena; esperando al procesamiento")
+        # Contrapresión: esperar a que el pipeline libere hueco en la cola
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def drain(self, max_items, timeout=1.0):
+        """
+        Saca tweets de la cola, esperando hasta `timeout` segundos al primero.
+
+        Args:
+            max_items: Número máximo de tweets a sacar
+            timeout: Segundos de espera si la cola está vacía
+
+        Returns:
+            tuple: (lista de tweets, lista de usuarios incluidos)
+        """
+        tweets, users = [], []
+        try:
+            item = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return tweets, users
+        while True:
+            tweets.append(item[0])
+            users.extend(item[1])
+            if len(tweets) >= max_items:
+                break
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+        return tweets, users
@@ -1,7 +1,18 @@
+import re
+import requests
 import tweepy
 import time
 import logging
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.lru_cache import TTLCache
+from utils.spam_filter import SpamFilter
+from utils.near_duplicates import NearDuplicateIndex, simhash
+from utils.rate_limiter import RateLimiter, RateLimitExceeded
+from utils.token_budget import DOWNGRADE, EXHAUSTED
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.openai_service import DEFERRABLE_ERRORS
 from config.settings import (
     X_API_BEARER,
     X_API_KEY,
@@ -12,8 +23,85 @@ from config.settings import (
 
 logger = logging.getLogger("crypto_bot.twitter")
 
+# Nombre de la caché persistida de nombres de usuario
+AUTHOR_CACHE = "authors"
+
+# Nombre de la caché persistida del historial de spam de cada autor (la
+# anterior, "author_history", contaba también los tweets poco relevantes)
+AUTHOR_HISTORY_CACHE = "author_spam_history"
+
+# Clave de estado de los tweets aplazados (por falta de presupuesto de tokens
+# o porque un servicio no responde) y número máximo que se conservan (se descartan los más antiguos)
+DEFERRED_STATE = "deferred_tweets"
+DEFERRED_MAX = 500
+
+# Campos de tweet solicitados a la API (entities da los enlaces expandidos)
+TWEET_FIELDS = ["author_id", "created_at", "entities"]
+
+# Máximo de IDs por llamada a get_users (límite de la API)
+GET_USERS_BATCH_SIZE = 100
+
+# Consulta por defecto: más restrictiva para reducir el volumen
+DEFAULT_QUERY = "crypto -is:retweet lang:en OR lang:es"
+
+# Límites de max_results en search_recent_tweets
+SEARCH_MIN_RESULTS = 10
+SEARCH_MAX_RESULTS = 100
+
+# Errores de la API de X que indican que el servicio está degradado (los
+# demás, como 400 o 403, son de la petición y no cuentan para el circuito)
+X_FAILURES = (
+    tweepy.errors.TwitterServerError,
+    tweepy.errors.TooManyRequests,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout
+)
+
+# Nombres de los endpoints por método y ruta (los IDs de la ruta se sustituyen por :id)
+ENDPOINT_NAMES = {
+    ("GET", "/2/tweets/search/recent"): "search_recent_tweets",
+    ("GET", "/2/users"): "get_users",
+    ("GET", "/2/users/:id"): "get_user",
+    ("POST", "/2/tweets"): "create_tweet"
+}
+
+
+def endpoint_name(method, route):
+    """Nombre del endpoint de una petición, para agrupar su presupuesto de llamadas"""
+    route = re.sub(r"(?<!^)/\d+(?=/|$)", "/:id", route)
+    return ENDPOINT_NAMES.get((method, route), f"{method} {route}")
+
+
+class RateLimitedClient(tweepy.Client):
+    """
+    Cliente de tweepy que pasa cada petición por un RateLimiter: espera a que
+    el endpoint tenga presupuesto antes de llamar y lo ajusta con las
+    cabeceras x-rate-limit-* de la respuesta, incluidas las de error.
+    """
+    
+    def __init__(self, *args, rate_limiter=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter or RateLimiter()
+    
+    def request(self, method, route, params=None, json=None, user_auth=False):
+        endpoint = endpoint_name(method, route)
+        self.rate_limiter.acquire(endpoint)
+        try:
+            response = super().request(method, route, params=params, json=json, user_auth=user_auth)
+        except tweepy.errors.HTTPException as e:
+            self.rate_limiter.update(endpoint, e.response.headers)
+            raise
+        self.rate_limiter.update(endpoint, response.headers)
+        return response
+
+
 class TwitterService:
-    def __init__(self, openai_service, db, sentiment_service=None, max_results=10, respond=False):
+    def __init__(self, openai_service, db, sentiment_service=None, max_results=10, respond=False,
+                 author_cache_size=10000, author_cache_ttl=24 * 3600, query=DEFAULT_QUERY, max_pages=1,
+                 rate_limit_max_wait=15 * 60, workers=5, sentiment_concurrency=1,
+                 twitter_concurrency=2, relevance_threshold=0.7, combined_llm=None,
+                 batch_relevance=True, responses_per_cycle=5, spam_threshold=0.8,
+                 near_duplicate_distance=6, near_duplicate_window=24 * 3600, circuit_breaker=None):
         """
         Inicializa el servicio de Twitter.
         
@@ -21,85 +109,581 @@ class TwitterService:
             openai_service: Servicio para generar respuestas con OpenAI
             db: Servicio de base de datos
             sentiment_service: Servicio opcional para análisis de sentimiento
-            max_results: Número máximo de tweets a procesar por consulta
+            max_results: Número de tweets por página de búsqueda (entre 10 y 100)
             respond: Si es True, responderá a los tweets. Si es False, solo simulará
+            author_cache_size: Número máximo de nombres de usuario en caché
+            author_cache_ttl: Segundos que se considera válido un nombre de usuario en caché
+            query: Consulta de búsqueda de tweets
+            max_pages: Páginas de resultados que se pueden leer en cada ciclo
+            rate_limit_max_wait: Segundos máximos de espera a que se recargue el
+                presupuesto de un endpoint; si es mayor, la llamada falla
+            workers: Tweets que se procesan a la vez en cada ciclo
+            sentiment_concurrency: Análisis de sentimiento simultáneos como máximo
+            twitter_concurrency: Publicaciones simultáneas como máximo en X
+            relevance_threshold: Relevancia mínima para responder a un tweet
+            combined_llm: Si es True, relevancia y respuesta se obtienen en una sola
+                llamada a OpenAI; si es False, en dos llamadas separadas. Solo se
+                aplica sin `batch_relevance` (None: True si no se puntúa en lote)
+            batch_relevance: Si es True, la relevancia de todos los tweets de un lote
+                se obtiene con pocas peticiones (analyze_relevance_batch)
+            responses_per_cycle: Tweets como máximo a los que se responde en cada
+                ciclo de búsqueda
+            spam_threshold: Puntuación del prefiltro local a partir de la que un
+                tweet se descarta sin llamar a OpenAI (None para desactivarlo)
+            near_duplicate_distance: Distancia de Hamming máxima entre firmas SimHash
+                para reutilizar la relevancia de un tweet casi igual (None para desactivarlo)
+            near_duplicate_window: Segundos durante los que un tweet procesado sirve
+                como referencia de sus casi duplicados
+            circuit_breaker: CircuitBreaker de la API de X (por defecto, uno con la
+                configuración por defecto)
         """
         self.openai_service = openai_service
         self.db = db
         self.sentiment_service = sentiment_service
-        self.max_results = max_results
+        self.max_results = max(SEARCH_MIN_RESULTS, min(SEARCH_MAX_RESULTS, max_results))
         self.respond = respond
+        self.query = query
+        self.max_pages = max_pages
+        self.workers = workers
+        self.relevance_threshold = relevance_threshold
+        # En lote la relevancia ya llega calculada: la llamada combinada no se haría nunca
+        if combined_llm and batch_relevance:
+            raise ValueError("combined_llm y batch_relevance no se pueden activar a la vez")
+        self.combined_llm = not batch_relevance if combined_llm is None else combined_llm
+        self.batch_relevance = batch_relevance
+        self.responses_per_cycle = responses_per_cycle
+        
+        # Llamadas simultáneas permitidas a cada servicio externo, compartidas
+        # por todos los tweets que se procesan a la vez (las de OpenAI las
+        # limita su propio transporte)
+        self._service_slots = {
+            "sentiment": threading.BoundedSemaphore(sentiment_concurrency),
+            "twitter": threading.BoundedSemaphore(twitter_concurrency)
+        }
+        
+        # Caché de nombres de usuario por ID de autor, persistida en la base de datos
+        self.author_cache = TTLCache(maxsize=author_cache_size, ttl=author_cache_ttl)
+        self.author_cache.load(self.db.get_cache_entries(AUTHOR_CACHE))
         
-        # Cliente solo para lectura (búsqueda)
-        self.read_client = tweepy.Client(
+        # Prefiltro local de spam, con el historial de autores persistido
+        self.spam_filter = None
+        if spam_threshold is not None:
+            self.spam_filter = SpamFilter(threshold=spam_threshold)
+            self.spam_filter.author_history.load(self.db.get_cache_entries(AUTHOR_HISTORY_CACHE))
+        
+        # Índice de tweets recientes casi duplicados, con la relevancia obtenida
+        self.near_duplicates = None
+        if near_duplicate_distance is not None:
+            self.near_duplicates = NearDuplicateIndex(
+                max_distance=near_duplicate_distance,
+                bands=near_duplicate_distance + 1,
+                window=near_duplicate_window
+            )
+        
+        # Circuito de la API de X: si falla de forma continuada, las llamadas
+        # fallan al instante en lugar de esperar reintentos
+        self.x_breaker = circuit_breaker or CircuitBreaker("X")
+        
+        # Tweets aplazados, que se procesan al principio del siguiente ciclo
+        self._deferred = [tweepy.Tweet(data) for data in self.db.get_state(DEFERRED_STATE, [])]
+        
+        # Cliente solo para lectura (búsqueda). Los límites de la aplicación y
+        # los del usuario son independientes: cada cliente lleva su limitador
+        self.read_client = RateLimitedClient(
             bearer_token=X_API_BEARER,
-            wait_on_rate_limit=False  # Cambiado a False para manejar manualmente
+            wait_on_rate_limit=False,  # Los límites los gestiona el RateLimiter
+            rate_limiter=RateLimiter(max_wait=rate_limit_max_wait)
         )
         
         # Cliente para lectura y escritura (responder)
         if self.respond:
-            self.write_client = tweepy.Client(
+            self.write_client = RateLimitedClient(
                 consumer_key=X_API_KEY_CONSUMER,
                 consumer_secret=X_API_KEY_SECRET_CONSUMER,
                 access_token=X_API_KEY,
                 access_token_secret=X_API_KEY_SECRET,
-                wait_on_rate_limit=False  # Cambiado a False para manejar manualmente
+                wait_on_rate_limit=False,  # Los límites los gestiona el RateLimiter
+                rate_limiter=RateLimiter(max_wait=rate_limit_max_wait)
             )
     
     def process_tweets(self):
-        """Busca tweets recientes y genera/envía respuestas"""
-        try:
-            logger.info("🔍 Buscando tweets recientes sobre criptomonedas...")
-            
-            # Usamos una consulta más restrictiva para reducir el volumen
-            query = "crypto -is:retweet lang:en OR lang:es"
-            
-            # Intentar obtener tweets con manejo de rate limits
-            tweets = self._safe_api_call(
-                lambda: self.read_client.search_recent_tweets(
-                    query=query, 
-                    max_results=10,
-                    tweet_fields=["author_id", "created_at"]
-                ),
-                endpoint="search_recent_tweets"
-            )
-            
-            if not tweets or not tweets.data:
-                logger.info("⚠️ No se encontraron tweets recientes.")
-                return
+        """
+        Busca tweets recientes y genera/envía respuestas.
+        
+        Returns:
+            dict: {"fetched": tweets nuevos encontrados, "saturated": si quedaron
+                páginas sin leer}, o None si el ciclo no llegó a buscar
+        """
+        # Agrupar las escrituras del ciclo: el backend JSON las vuelca al journal de una
+        # vez; SQLite confirma cada una al momento para no bloquear a otros procesos
+        with self.db.batch():
+            self.openai_service.budget.start_cycle()
+            try:
+                if not self.x_breaker.available():
+                    logger.warning(f"⛔ La API de X no responde; se omite el ciclo "
+                                   f"(se volverá a probar en {self.x_breaker.retry_in():.0f} segundos)")
+                    return None
                 
-            logger.info(f"✅ Encontrados {len(tweets.data)} tweets para procesar.")
-            
-            # Procesar solo una muestra de los tweets (máximo 5)
-            # para evitar rate limits pero cumpliendo con los requisitos de la API
-            sample_size = min(5, len(tweets.data))
-            sample_tweets = random.sample(list(tweets.data), sample_size)
-            
-            logger.info(f"🔄 Procesando muestra de {sample_size} tweets para evitar rate limits")
-            
-            # Procesar cada tweet con pausa para evitar rate limits
-            for i, tweet in enumerate(sample_tweets):
-                logger.info(f"Procesando tweet {i+1}/{sample_size}")
+                logger.info("🔍 Buscando tweets recientes sobre criptomonedas...")
                 
-                # Añadir retrasos aleatorios entre procesos
-                time.sleep(random.uniform(2, 5))
+                tweets, users, search_state = self._fetch_new_tweets()
+                result = {"fetched": len(tweets), "saturated": search_state["cursor"] is not None}
                 
+                if not tweets and not self._deferred:
+                    logger.info("⚠️ No se encontraron tweets nuevos.")
+                    self._save_search_state(search_state)
+                    return result
+                    
+                logger.info(f"✅ Encontrados {len(tweets)} tweets para procesar.")
+                
+                # Responder como máximo a `responses_per_cycle` tweets
+                self._process_batch(tweets, users, max_responses=self.responses_per_cycle)
+                # La búsqueda solo avanza cuando los tweets leídos están procesados o aplazados
+                self._save_search_state(search_state)
+                return result
+                    
+            except Exception as e:
+                logger.error(f"❌ Error al procesar tweets: {e}")
+                return None
+            finally:
+                # Registrar y persistir el consumo de tokens del ciclo
+                self.openai_service.budget.end_cycle()
+    
+    def search_ready_in(self):
+        """
+        Segundos hasta que se pueda hacer un ciclo de búsqueda completo: hasta
+        que el límite de búsqueda permita leer `max_pages` páginas y el
+        circuito de X deje pasar llamadas (0 si ya se puede).
+        """
+        return max(
+            self.read_client.rate_limiter.wait_time("search_recent_tweets", calls=self.max_pages),
+            self.x_breaker.retry_in()
+        )
+    
+    def process_stream(self, stream, timeout=1.0):
+        """
+        Procesa los tweets que el stream ha dejado en su cola (modo streaming).
+        
+        Args:
+            stream: TweetStream del que se sacan los tweets
+            timeout: Segundos de espera si la cola está vacía
+            
+        Returns:
+            int: Número de tweets sacados de la cola
+        """
+        tweets, users = stream.drain(self.workers, timeout=timeout)
+        if not tweets:
+            return 0
+        with self.db.batch():
+            self.openai_service.budget.start_cycle()
+            try:
+                self._process_batch(tweets, users)
+            except Exception as e:
+                logger.error(f"❌ Error al procesar tweets del stream: {e}")
+            finally:
+                self.openai_service.budget.end_cycle()
+        return len(tweets)
+    
+    def _process_batch(self, tweets, users, max_responses=None):
+        """
+        Procesa en paralelo los tweets aún no procesados de un lote. Si falla
+        algo inesperado, el lote entero se aplaza al siguiente ciclo (los
+        tweets que llegaron a registrarse se descartan entonces como procesados).
+        
+        Args:
+            tweets: Tweets recibidos
+            users: Usuarios incluidos en las respuestas de la API
+            max_responses: Si se indica, número máximo de tweets a los que se responde
+        """
+        # Los tweets aplazados en ciclos anteriores van primero
+        if self._deferred:
+            logger.info(f"⏳ Retomando {len(self._deferred)} tweets aplazados")
+            tweets = self._deferred + list(tweets)
+            self._deferred = []
+            self.db.set_state(DEFERRED_STATE, [])
+        
+        try:
+            self._process_new_tweets(tweets, users, max_responses)
+        except Exception as e:
+            logger.error(f"❌ Error al procesar el lote de tweets: {e}")
+            self._defer(tweets, "error al procesar el lote")
+    
+    def _process_new_tweets(self, tweets, users, max_responses=None):
+        """Procesa los tweets de un lote (ver _process_batch)"""
+        # Descartar en una sola consulta los tweets ya procesados, para no
+        # gastar la muestra del ciclo en tweets vistos anteriormente
+        unprocessed_ids = set(self.db.filter_unprocessed([tweet.id for tweet in tweets]))
+        new_tweets = [tweet for tweet in tweets if tweet.id in unprocessed_ids]
+        
+        if not new_tweets:
+            logger.info("⏭️ Todos los tweets encontrados ya fueron procesados anteriormente.")
+            return
+        
+        usernames = self._resolve_authors(new_tweets, {"users": users})
+        history = {}
+        
+        if self.spam_filter is not None:
+            new_tweets = self._prefilter(new_tweets, usernames, history)
+            if not new_tweets:
+                self.db.put_cache_entries(AUTHOR_HISTORY_CACHE, history)
+                return
+        
+        # Sin presupuesto de tokens o con OpenAI sin responder no se llama a
+        # OpenAI: aplazar el lote. Cerca del límite, responder a menos tweets
+        budget_status = self.openai_service.budget.status()
+        if budget_status == EXHAUSTED or not self.openai_service.available():
+            reason = "presupuesto de tokens agotado" if budget_status == EXHAUSTED else "OpenAI no responde"
+            self._defer(new_tweets, reason)
+            self.db.put_cache_entries(AUTHOR_HISTORY_CACHE, history)
+            return
+        if budget_status == DOWNGRADE and max_responses is not None:
+            max_responses = max(1, max_responses // 2)
+            logger.info(f"🪙 Presupuesto de tokens cerca del límite; se responde como máximo a {max_responses} tweets")
+        
+        relevances = {}
+        signatures = {}
+        duplicates = {}
+        # Tweets que superan el límite de respuestas del ciclo: se aplazan, no se pierden
+        overflow = []
+        if self.near_duplicates is not None:
+            duplicates = self._match_near_duplicates(new_tweets, signatures, relevances)
+        
+        if self.batch_relevance:
+            # Puntuar el resto del lote con pocas peticiones en lugar de una por
+            # tweet; los casi duplicados dentro del lote toman la relevancia de
+            # su representante
+            to_score = [tweet for tweet in new_tweets if tweet.id not in relevances and tweet.id not in duplicates]
+            if to_score:
+                try:
+                    scores = self.openai_service.analyze_relevance_batch([tweet.text for tweet in to_score])
+                except DEFERRABLE_ERRORS as e:
+                    self._defer(new_tweets, str(e))
+                    self.db.put_cache_entries(AUTHOR_HISTORY_CACHE, history)
+                    return
+                relevances.update(zip((tweet.id for tweet in to_score), scores))
+            for tweet_id, representative_id in duplicates.items():
+                relevances[tweet_id] = relevances[representative_id]
+            if max_responses is not None:
+                # Los irrelevantes se registran como ignorados y se responde a
+                # los más relevantes, hasta `max_responses`
+                ignored = [tweet for tweet in new_tweets if relevances[tweet.id] < self.relevance_threshold]
+                relevant = sorted(
+                    (tweet for tweet in new_tweets if relevances[tweet.id] >= self.relevance_threshold),
+                    key=lambda tweet: relevances[tweet.id],
+                    reverse=True
+                )
+                if len(relevant) > max_responses:
+                    logger.info(f"🔄 {len(relevant)} tweets relevantes; se responde a los {max_responses} más relevantes")
+                    # Su relevancia queda en caché: retomarlos no vuelve a llamar a OpenAI
+                    overflow = relevant[max_responses:]
+                new_tweets = ignored + relevant[:max_responses]
+        elif max_responses is not None and len(new_tweets) > max_responses:
+            # Sin puntuación previa, procesar solo una muestra aleatoria
+            sample = random.sample(new_tweets, max_responses)
+            sampled_ids = {tweet.id for tweet in sample}
+            overflow = [tweet for tweet in new_tweets if tweet.id not in sampled_ids]
+            new_tweets = sample
+            logger.info(f"🔄 Procesando muestra de {max_responses} tweets")
+        if overflow:
+            self._defer(overflow, "límite de respuestas por ciclo")
+        total = len(new_tweets)
+        if not total:
+            self.db.put_cache_entries(AUTHOR_HISTORY_CACHE, history)
+            return
+        
+        deferred = []
+        defer_reason = None
+        
+        # Procesar los tweets en paralelo: el ciclo dura lo que el tweet
+        # más lento y no la suma de todos. Las llamadas a cada servicio
+        # se limitan con _service_slots y las escrituras en la base de
+        # datos son seguras entre hilos
+        with ThreadPoolExecutor(max_workers=min(self.workers, total),
+                                thread_name_prefix="tweet") as executor:
+            futures = {
+                executor.submit(
+                    self._process_single_tweet, tweet, usernames.get(str(tweet.author_id)), relevances.get(tweet.id)
+                ): tweet
+                for tweet in new_tweets
+            }
+            for i, future in enumerate(as_completed(futures)):
+                tweet = futures[future]
                 # Procesar tweet con manejo de errores
                 try:
-                    self._process_single_tweet(tweet)
+                    relevance = future.result()
+                except DEFERRABLE_ERRORS as e:
+                    # Se queda sin procesar y se retoma en el siguiente ciclo
+                    deferred.append(tweet)
+                    defer_reason = str(e)
+                    continue
                 except Exception as e:
                     logger.error(f"❌ Error al procesar tweet {tweet.id}: {e}")
                     continue
-                
-            logger.info("✅ Procesamiento de tweets completado.")
-                
-        except Exception as e:
-            logger.error(f"❌ Error al procesar tweets: {e}")
+                logger.info(f"Procesado tweet {i+1}/{total}")
+                if relevance is None:
+                    continue
+                if self.spam_filter is not None:
+                    # Una relevancia baja no es spam (el autor puede hablar de otros temas):
+                    # solo cuenta como tweet visto
+                    key, entry = self.spam_filter.record(tweet.author_id, False)
+                    history[key] = entry
+                if self.near_duplicates is not None:
+                    self.near_duplicates.add(tweet.id, signatures[tweet.id], relevance)
+            
+        if deferred:
+            self._defer(deferred, defer_reason)
+        self.db.put_cache_entries(AUTHOR_HISTORY_CACHE, history)
+        logger.info("✅ Procesamiento de tweets completado.")
+        cache_stats = self.openai_service.cache_stats()
+        logger.info("💾 Caché de OpenAI: " + ", ".join(
+            f"{name} {stats['hits']} aciertos / {stats['misses']} fallos" for name, stats in cache_stats.items()
+        ))
+    
+    def _defer(self, tweets, reason):
+        """
+        Aplaza tweets al siguiente ciclo, por falta de presupuesto de tokens o
+        porque un servicio no responde. La lista se persiste para no perderlos
+        si el bot se reinicia.
+        
+        Args:
+            tweets: Tweets sin procesar
+            reason: Motivo, para el log
+        """
+        known = {tweet.id for tweet in self._deferred}
+        self._deferred.extend(tweet for tweet in tweets if tweet.id not in known)
+        if len(self._deferred) > DEFERRED_MAX:
+            logger.warning(f"⚠️ Descartados {len(self._deferred) - DEFERRED_MAX} tweets aplazados antiguos")
+            self._deferred = self._deferred[-DEFERRED_MAX:]
+        self.db.set_state(DEFERRED_STATE, [tweet.data for tweet in self._deferred])
+        logger.warning(f"⏳ {len(tweets)} tweets aplazados al siguiente ciclo: {reason}")
+    
+    def _match_near_duplicates(self, tweets, signatures, relevances):
+        """
+        Busca los tweets casi duplicados de otros ya procesados, cuya
+        relevancia se reutiliza sin llamar a OpenAI, y agrupa los casi
+        duplicados dentro del propio lote.
+        
+        Args:
+            tweets: Tweets nuevos
+            signatures: Diccionario donde se guarda la firma SimHash de cada tweet
+            relevances: Diccionario donde se guarda la relevancia reutilizada
+            
+        Returns:
+            dict: {ID de tweet: ID del primer tweet del lote casi igual a él}
+        """
+        page_index = NearDuplicateIndex(
+            max_distance=self.near_duplicates.max_distance,
+            bands=self.near_duplicates.max_distance + 1,
+            maxsize=len(tweets)
+        )
+        duplicates = {}
+        for tweet in tweets:
+            signature = signatures[tweet.id] = simhash(tweet.text)
+            match = self.near_duplicates.query(signature)
+            if match is not None:
+                matched_id, relevance, distance = match
+                relevances[tweet.id] = relevance
+                logger.debug(f"♻️ Tweet {tweet.id} casi igual al {matched_id} (distancia {distance}); "
+                            f"se reutiliza su relevancia ({relevance:.2f})")
+                continue
+            match = page_index.query(signature)
+            if match is not None:
+                duplicates[tweet.id] = match[0]
+            else:
+                page_index.add(tweet.id, signature, None)
+        
+        if relevances or duplicates:
+            logger.info(f"♻️ Casi duplicados: {len(relevances)} con relevancia reutilizada y "
+                        f"{len(duplicates)} repetidos dentro del lote")
+        return duplicates
+    
+    def _prefilter(self, tweets, usernames, history):
+        """
+        Descarta con el prefiltro local los tweets que son spam claro, antes
+        de cualquier llamada a OpenAI. Cada descarte se registra en el log
+        con su puntuación y sus motivos, y se marca como procesado (ignorado).
+        
+        Args:
+            tweets: Tweets nuevos
+            usernames: {ID de autor (str): nombre de usuario}
+            history: Diccionario donde se acumulan las entradas de historial a persistir
+            
+        Returns:
+            list: Tweets que siguen adelante
+        """
+        kept = []
+        for tweet, (score, reasons) in zip(tweets, self.spam_filter.score_page(tweets)):
+            if not self.spam_filter.is_spam(score):
+                kept.append(tweet)
+                continue
+            username = usernames.get(str(tweet.author_id)) or f"usuario_{tweet.author_id}"
+            logger.info(f"🚫 Spam descartado sin OpenAI: tweet {tweet.id} de @{username} "
+                        f"(puntuación {score:.2f}: {', '.join(reasons)})")
+            self.db.mark_tweet_processed(
+                tweet_id=tweet.id,
+                responded=False,
+                tweet_text=tweet.text,
+                response_text=None,
+                author_username=username
+            )
+            key, entry = self.spam_filter.record(tweet.author_id, True)
+            history[key] = entry
+        
+        if len(kept) < len(tweets):
+            logger.info(f"🧹 Prefiltro: {len(tweets) - len(kept)} de {len(tweets)} tweets descartados como spam")
+        return kept
+    
+    def _fetch_new_tweets(self):
+        """
+        Busca los tweets publicados desde el último ciclo. Se envía como
+        since_id el tweet más reciente visto con la misma consulta (persistido
+        en la base de datos), de modo que cada llamada solo devuelve tweets
+        nuevos, y se recorren páginas con next_token hasta `max_pages`.
+        
+        Si quedan páginas sin leer, su next_token se persiste y el siguiente
+        ciclo continúa desde él antes de avanzar since_id. El estado no se
+        guarda aquí: lo guarda process_tweets con _save_search_state cuando
+        los tweets leídos ya están procesados o aplazados.
+        
+        Returns:
+            tuple: (lista de tweets, lista de usuarios incluidos en las respuestas,
+                estado de la búsqueda a guardar tras procesarlos: {"since_id": ...,
+                "cursor": {"next_token": ..., "newest_id": ...} o None si no quedan
+                páginas sin leer})
+        """
+        since_id = self.db.get_state(f"since_id:{self.query}")
+        cursor = self.db.get_state(f"search_cursor:{self.query}")
+        tweets, users = [], []
+        # Al retomar una paginación, el tweet más reciente es el de su primera página
+        newest_id = cursor["newest_id"] if cursor else None
+        next_token = cursor["next_token"] if cursor else None
+        if cursor:
+            logger.info("📄 Retomando las páginas sin leer del ciclo anterior")
+        
+        for page in range(self.max_pages):
+            params = {
+                "query": self.query,
+                "max_results": self.max_results,
+                "tweet_fields": TWEET_FIELDS,
+                # Los autores llegan en la misma respuesta, sin llamadas adicionales a get_user
+                "expansions": ["author_id"],
+                "user_fields": ["username"]
+            }
+            if since_id:
+                params["since_id"] = since_id
+            if next_token:
+                params["next_token"] = next_token
+            
+            while True:
+                try:
+                    response = self._safe_api_call(
+                        lambda: self.read_client.search_recent_tweets(**params),
+                        endpoint="search_recent_tweets"
+                    )
+                    break
+                except tweepy.errors.BadRequest as e:
+                    if page:
+                        raise
+                    if cursor:
+                        # Un next_token guardado puede haber caducado: empezar de nuevo desde since_id
+                        logger.warning(f"⚠️ Paginación pendiente rechazada por la API; se descarta: {e}")
+                        cursor = newest_id = next_token = None
+                        params.pop("next_token", None)
+                    elif since_id:
+                        # La búsqueda reciente solo admite since_id de los últimos 7 días
+                        logger.warning(f"⚠️ since_id {since_id} rechazado por la API; buscando sin él: {e}")
+                        since_id = None
+                        del params["since_id"]
+                    else:
+                        raise
+            
+            if not response:
+                break
+            meta = response.meta or {}
+            # La primera página empieza por el tweet más reciente
+            if newest_id is None:
+                newest_id = meta.get("newest_id")
+            tweets.extend(response.data or [])
+            users.extend((response.includes or {}).get("users", []))
+            next_token = meta.get("next_token")
+            if not next_token:
+                break
+        
+        if next_token:
+            logger.warning(f"⚠️ Quedan tweets nuevos sin leer tras {self.max_pages} páginas; se leerán en el "
+                           f"siguiente ciclo (considera aumentar el presupuesto de páginas)")
+            return tweets, users, {"since_id": since_id, "cursor": {"next_token": next_token, "newest_id": newest_id}}
+        return tweets, users, {"since_id": newest_id or since_id, "cursor": None}
+    
+    def _save_search_state(self, state):
+        """Guarda el estado de la búsqueda devuelto por _fetch_new_tweets (solo lo que cambió)"""
+        for key, value in ((f"since_id:{self.query}", state["since_id"]),
+                           (f"search_cursor:{self.query}", state["cursor"])):
+            if self.db.get_state(key) != value:
+                self.db.set_state(key, value)
+    
+    def _resolve_authors(self, tweets, includes=None):
+        """
+        Resuelve los nombres de usuario de los autores: primero con los usuarios
+        incluidos en la respuesta de búsqueda, después con la caché y, para los
+        que falten, con get_users en lotes de hasta 100 IDs.
+        
+        Args:
+            tweets: Tweets cuyos autores se quieren resolver
+            includes: Objetos incluidos en la respuesta de búsqueda (opcional)
+            
+        Returns:
+            dict: {ID de autor (str): nombre de usuario}
+        """
+        new_entries = {}
+        for user in (includes or {}).get("users", []):
+            key = str(user.id)
+            new_entries[key] = (user.username, self.author_cache.set(key, user.username))
+        
+        usernames = {}
+        missing = []
+        for tweet in tweets:
+            key = str(tweet.author_id)
+            username = self.author_cache.get(key)
+            if username:
+                usernames[key] = username
+            elif key not in missing:
+                missing.append(key)
+        
+        for start in range(0, len(missing), GET_USERS_BATCH_SIZE):
+            chunk = missing[start:start + GET_USERS_BATCH_SIZE]
+            try:
+                result = self._safe_api_call(
+                    lambda: self.read_client.get_users(ids=chunk, user_fields=["username"]),
+                    endpoint="get_users"
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo obtener información de {len(chunk)} usuarios: {e}")
+                continue
+            
+            for user in (result.data or []) if result else []:
+                key = str(user.id)
+                usernames[key] = user.username
+                new_entries[key] = (user.username, self.author_cache.set(key, user.username))
+        
+        # Persistir los nombres nuevos junto con el resto de escrituras del ciclo
+        self.db.put_cache_entries(AUTHOR_CACHE, new_entries)
+        if missing:
+            logger.info(f"👤 {len(missing)} autores no estaban en la respuesta ni en la caché; consultados con get_users")
+        return usernames
     
     def _safe_api_call(self, api_function, endpoint=None, max_retries=3):
         """
         Ejecuta una función de API de manera segura, manejando rate limits.
         
+        Los clientes ya esperan de forma proactiva con su RateLimiter; aquí
+        solo se reintentan los 429 que se producen igualmente (por ejemplo,
+        si otro proceso consume el mismo límite de la aplicación).
+        
+        Cada llamada pasa por el circuito de X: los 429, los errores 5xx y
+        los de red cuentan como fallos y, con el circuito abierto, la llamada
+        falla al instante con CircuitOpenError (también entre reintentos).
+        
         Args:
             api_function: Función lambda que contiene la llamada a la API
             endpoint: Nombre del endpoint para registro (opcional)
@@ -111,9 +695,13 @@ class TwitterService:
         retries = 0
         
         while retries < max_retries:
+            self.x_breaker.allow()
             try:
-                return api_function()
+                result = api_function()
+                self.x_breaker.record_success()
+                return result
             except tweepy.errors.TooManyRequests as e:
+                self.x_breaker.record_failure()
                 # Extraer el tiempo de espera de la respuesta
                 wait_seconds = self._extract_rate_limit_wait_time(e)
                 
@@ -124,12 +712,26 @@ class TwitterService:
                 if retries >= max_retries:
                     logger.error(f"❌ Alcanzado número máximo de reintentos ({max_retries}). Abortando operación.")
                     raise e
+                # Con el circuito abierto no tiene sentido esperar para reintentar
+                self.x_breaker.check()
                 
                 logger.warning(f"⚠️ Rate limit alcanzado ({wait_seconds} segundos). Esperando antes de reintentar... ({retries}/{max_retries})")
                 
                 # Esperar el tiempo indicado antes de reintentar
                 time.sleep(wait_seconds)
+            except RateLimitExceeded as e:
+                # El presupuesto no se recarga a tiempo: no se llega a llamar a la API
+                self.x_breaker.release()
+                self.db.record_rate_limit(int(e.wait_seconds), endpoint)
+                logger.warning(f"⚠️ {e}")
+                raise e
+            except X_FAILURES as e:
+                self.x_breaker.record_failure()
+                logger.error(f"❌ Error en llamada a API: {e}")
+                raise e
             except Exception as e:
+                # X respondió: el error es de la petición, no del servicio
+                self.x_breaker.record_success()
                 logger.error(f"❌ Error en llamada a API: {e}")
                 raise e
     
@@ -175,28 +777,20 @@ class TwitterService:
             logger.error(f"Error al extraer tiempo de rate limit: {e}")
             return 60  # Valor por defecto de 1 minuto (60 segundos)
     
-    def _process_single_tweet(self, tweet):
-        """Procesa un tweet individual"""
-        try:
-            # Verificar si ya procesamos este tweet
-            if self.db.is_tweet_processed(tweet.id):
-                logger.debug(f"⏭️ Tweet {tweet.id} ya procesado anteriormente.")
-                return
+    def _process_single_tweet(self, tweet, username=None, relevance=None):
+        """
+        Procesa un tweet individual.
+        
+        Args:
+            tweet: Tweet a procesar
+            username: Nombre de usuario del autor, resuelto con _resolve_authors
+            relevance: Relevancia ya calculada en lote (opcional)
             
-            # Obtener información del usuario con manejo seguro de rate limits
-            username = None
-            try:
-                user_result = self._safe_api_call(
-                    lambda: self.read_client.get_user(id=tweet.author_id, user_fields=["username"]),
-                    endpoint="get_user"
-                )
-                
-                if user_result and user_result.data:
-                    username = user_result.data.username
-                else:
-                    username = f"usuario_{tweet.author_id}"
-            except Exception as e:
-                logger.warning(f"⚠️ No se pudo obtener información del usuario: {e}")
+        Returns:
+            float: Relevancia del tweet o None si hubo un error
+        """
+        try:
+            if not username:
                 username = f"usuario_{tweet.author_id}"
             
             # Registrar el tweet encontrado
@@ -205,15 +799,26 @@ class TwitterService:
             # Analizar sentimiento si está disponible
             sentiment = None
             if self.sentiment_service:
-                sentiment = self.sentiment_service.analyze_sentiment(tweet.text)
+                with self._service_slots["sentiment"]:
+                    sentiment = self.sentiment_service.analyze_sentiment(tweet.text)
                 sentiment_label = sentiment.get("label", "unknown")
                 sentiment_score = sentiment.get("sentiment_score", 0)
                 logger.info(f"📊 Sentimiento detectado: {sentiment_label} ({sentiment_score:.2f})")
             
-            # Analizar la relevancia del tweet
-            relevance = self.openai_service.analyze_tweet_relevance(tweet.text)
+            # Analizar la relevancia del tweet (y, en modo combinado, generar la
+            # respuesta en la misma llamada)
+            response = None
+            generated = False
+            if relevance is None:
+                if self.combined_llm:
+                    relevance, response = self.openai_service.analyze_and_respond(
+                        tweet.text, sentiment, threshold=self.relevance_threshold
+                    )
+                    generated = True
+                else:
+                    relevance = self.openai_service.analyze_tweet_relevance(tweet.text)
             
-            if relevance < 0.7:
+            if relevance < self.relevance_threshold:
                 logger.info(f"⏭️ Tweet de @{username} ignorado (relevancia: {relevance:.2f})")
                 self.db.mark_tweet_processed(
                     tweet_id=tweet.id, 
@@ -223,10 +828,11 @@ class TwitterService:
                     author_username=username,
                     sentiment_data=sentiment
                 )
-                return
+                return relevance
                 
             # Generar respuesta con OpenAI, pasando el sentimiento
-            response = self.openai_service.generate_response(tweet.text, sentiment)
+            if not generated:
+                response = self.openai_service.generate_response(tweet.text, sentiment)
             
             if not response:
                 self.db.mark_tweet_processed(
@@ -237,7 +843,7 @@ class TwitterService:
                     author_username=username,
                     sentiment_data=sentiment
                 )
-                return
+                return relevance
                 
             logger.info(f"📝 Respuesta generada para @{username}: {response}")
             
@@ -245,15 +851,19 @@ class TwitterService:
             if self.respond:
                 try:
                     # Usar _safe_api_call para manejar rate limits al responder
-                    result = self._safe_api_call(
-                        lambda: self.write_client.create_tweet(
-                            text=response,
-                            in_reply_to_tweet_id=tweet.id
-                        ),
-                        endpoint="create_tweet"
-                    )
+                    with self._service_slots["twitter"]:
+                        result = self._safe_api_call(
+                            lambda: self.write_client.create_tweet(
+                                text=response,
+                                in_reply_to_tweet_id=tweet.id
+                            ),
+                            endpoint="create_tweet"
+                        )
                     responded = True
                     logger.info(f"✅ Respuesta enviada correctamente a @{username}")
+                except CircuitOpenError:
+                    # Sin publicar: el tweet se aplaza (la respuesta queda en caché)
+                    raise
                 except Exception as e:
                     logger.error(f"❌ Error al responder al tweet: {e}")
                     responded = False
@@ -275,6 +885,10 @@ class TwitterService:
                     author_username=username,
                     sentiment_data=sentiment
                 )
+            return relevance
                 
+        except DEFERRABLE_ERRORS:
+            raise
         except Exception as e:
-            logger.error(f"❌ Error al procesar tweet {tweet.id}: {e}")
\ No newline at end of file
+            logger.error(f"❌ Error al procesar tweet {tweet.id}: {e}")
+            return None
\ No newline at end of file
@@ -0,0 +1,94 @@
+import unittest
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    """Estados del circuito: cerrado, abierto y semiabierto"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("prueba", failure_rate=0.5, min_calls=4, window=60,
+                                      open_seconds=30, half_open_calls=1, clock=self.clock)
+
+    def call(self, failed):
+        self.breaker.allow()
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def open_circuit(self):
+        for failed in (False, False, True, True):
+            self.call(failed)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_opens_at_failure_rate_with_min_calls(self):
+        for failed in (False, True, True):
+            self.call(failed)
+        # Menos de `min_calls` llamadas en la ventana: sigue cerrado
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.call(True)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_stays_closed_below_failure_rate(self):
+        for failed in (False, False, False, True, False):
+            self.call(failed)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_old_calls_leave_the_window(self):
+        self.call(True)
+        self.call(True)
+        self.clock.now += 61
+        self.call(True)
+        self.call(False)
+        self.call(False)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_open_circuit_fails_fast(self):
+        self.open_circuit()
+        self.assertFalse(self.breaker.available())
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.allow()
+        self.assertEqual(raised.exception.retry_in, 30)
+        self.clock.now += 10
+        self.assertEqual(self.breaker.retry_in(), 20)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.check()
+
+    def test_half_open_probe_closes_on_success(self):
+        self.open_circuit()
+        self.clock.now += 30
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.breaker.allow()
+        # Solo pasa una llamada de prueba a la vez
+        self.assertFalse(self.breaker.available())
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_probe_reopens_on_failure(self):
+        self.open_circuit()
+        self.clock.now += 30
+        self.call(True)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.retry_in(), 30)
+
+    def test_release_frees_the_probe(self):
+        self.open_circuit()
+        self.clock.now += 30
+        self.breaker.allow()
+        self.breaker.release()
+        self.assertTrue(self.breaker.available())
+
+
+if __name__ == "__main__":
+    unittest.main()
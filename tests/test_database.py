@@ -0,0 +1,207 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from utils.database import Database
+
+# Base de datos de ejemplo del repositorio, anterior a los contadores detallados
+LEGACY_FIXTURE = os.path.join(os.path.dirname(__file__), "..", "data", "processed_tweets.json")
+
+
+class LegacyStatsReadOnlyTest(unittest.TestCase):
+    """Lectura en streaming de las estadísticas de una base de datos anterior a user-006"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.tmp_dir, "processed_tweets.json")
+        shutil.copy(LEGACY_FIXTURE, self.db_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def open_reader(self):
+        db = Database(self.db_file, read_only=True)
+        self.addCleanup(db.close)
+        return db
+
+    def test_verify_reports_no_differences(self):
+        db = self.open_reader()
+        self.assertEqual(db.verify(), {})
+        # Las estadísticas se leen en streaming, sin cargar el documento
+        self.assertIsNone(db._data)
+
+    def test_get_stats_computes_detailed_counters(self):
+        db = self.open_reader()
+        stats = db.get_stats()
+        self.assertIsNone(db._data)
+        self.assertEqual(stats["total_processed"], 19)
+        self.assertEqual(stats["ignored"] + stats["generated"] + stats["posted"], 19)
+        self.assertIn("by_hour", stats)
+        self.assertEqual(sum(stats["by_day"].values()), 19)
+
+        # Mismo resultado que la migración al cargar el documento
+        loaded = self.open_reader()
+        loaded.export()
+        self.assertEqual(loaded.get_stats(), stats)
+
+    def test_last_processed_tweets_are_streamed(self):
+        db = self.open_reader()
+        latest = db.get_last_processed_tweets(5)
+        older = db.get_last_processed_tweets(5, before=latest[-1]["processed_at"])
+        self.assertIsNone(db._data)
+
+        loaded = self.open_reader()
+        loaded.export()
+        self.assertEqual(latest, loaded.get_last_processed_tweets(5))
+        self.assertEqual(older, loaded.get_last_processed_tweets(5, before=latest[-1]["processed_at"]))
+
+    def test_journal_is_applied_on_top_of_legacy_snapshot(self):
+        with open(os.path.splitext(self.db_file)[0] + ".journal", "w") as f:
+            f.write(json.dumps({"op": "tweet", "id": "1900000000000000000", "seq": 1, "record": {
+                "processed_at": "2025-03-01T10:00:00", "responded": True, "author_username": "alice",
+                "tweet_text": "texto", "response_text": "respuesta"
+            }}) + "\n")
+
+        db = self.open_reader()
+        self.assertEqual(db.verify(), {})
+        self.assertEqual(db.get_stats()["total_processed"], 20)
+
+        loaded = self.open_reader()
+        loaded.export()
+        self.assertEqual(loaded.verify(), {})
+        self.assertEqual(loaded.get_stats(), db.get_stats())
+
+
+class JournalCompactionTest(unittest.TestCase):
+    """Journal, compactación y reconstrucción del índice de IDs"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.tmp_dir, "processed_tweets.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def open_database(self, **options):
+        db = Database(self.db_file, **options)
+        self.addCleanup(db.close)
+        return db
+
+    def write_tweets(self, db, tweet_ids):
+        for tweet_id in tweet_ids:
+            db.mark_tweet_processed(tweet_id, responded=tweet_id % 2 == 0, tweet_text=f"tweet {tweet_id}",
+                                    response_text=f"respuesta {tweet_id}", author_username="alice")
+
+    def test_journal_is_replayed_on_restart(self):
+        db = self.open_database()
+        self.write_tweets(db, range(1, 11))
+        db.close()
+        self.assertGreater(os.path.getsize(db.journal_file), 0)
+
+        reopened = self.open_database()
+        self.assertEqual(reopened.filter_unprocessed(range(1, 13)), [11, 12])
+        self.assertEqual(reopened.get_stats()["total_processed"], 10)
+        self.assertEqual(reopened.verify(), {})
+
+    def test_torn_journal_line_is_ignored_and_repaired(self):
+        db = self.open_database()
+        self.write_tweets(db, range(1, 6))
+        db.close()
+        # Una caída a mitad de escritura deja la última línea incompleta
+        with open(db.journal_file, "a") as f:
+            f.write('{"op": "tweet", "id": 6, "seq": 6, "rec')
+
+        reopened = self.open_database()
+        self.assertEqual(reopened.filter_unprocessed([5, 6]), [6])
+        self.write_tweets(reopened, [7])
+        reopened.close()
+
+        again = self.open_database()
+        self.assertEqual(again.filter_unprocessed([5, 6, 7]), [6])
+        self.assertEqual(again.verify(), {})
+
+    def test_compaction_moves_journal_into_snapshot(self):
+        db = self.open_database()
+        self.write_tweets(db, range(1, 21))
+        db.flush()
+        stats = db.get_stats()
+        db.compact()
+        self.assertEqual(os.path.getsize(db.journal_file), 0)
+        self.assertTrue(os.path.exists(db.ids_file))
+
+        # Las escrituras posteriores continúan la secuencia sobre la instantánea nueva
+        self.write_tweets(db, [21])
+        db.close()
+        reopened = self.open_database()
+        self.assertEqual(reopened.get_stats()["total_processed"], stats["total_processed"] + 1)
+        self.assertEqual(reopened.filter_unprocessed(range(1, 23)), [22])
+        self.assertEqual(reopened.verify(), {})
+
+    def test_compaction_runs_in_background_when_journal_grows(self):
+        db = self.open_database(compact_min_bytes=1, compact_ratio=0, flush_every=1)
+        self.write_tweets(db, range(1, 4))
+        db.close()
+        self.assertIsNotNone(db._compactor)
+        with open(self.db_file) as f:
+            self.assertGreaterEqual(len(json.load(f)["processed_tweets"]), 1)
+        reopened = self.open_database()
+        self.assertEqual(reopened.filter_unprocessed(range(1, 5)), [4])
+
+    def test_id_index_and_bloom_are_rebuilt(self):
+        db = self.open_database(use_bloom=True)
+        self.write_tweets(db, range(1, 21))
+        db.compact()
+        db.close()
+        self.assertTrue(os.path.exists(db.bloom_file))
+        os.remove(db.ids_file)
+        os.remove(db.bloom_file)
+
+        reopened = self.open_database(use_bloom=True)
+        self.assertEqual(reopened.filter_unprocessed(range(15, 25)), [21, 22, 23, 24])
+        self.assertIsNotNone(reopened._ids.bloom)
+
+    def test_stale_id_index_is_completed_from_snapshot(self):
+        db = self.open_database()
+        self.write_tweets(db, range(1, 6))
+        db.compact()
+        shutil.copy(db.ids_file, db.ids_file + ".old")
+        self.write_tweets(db, range(6, 11))
+        db.compact()
+        db.close()
+        # Índice de una compactación anterior: le faltan los IDs 6-10
+        os.replace(db.ids_file + ".old", db.ids_file)
+
+        reopened = self.open_database()
+        self.assertEqual(reopened.filter_unprocessed(range(1, 12)), [11])
+
+class SegmentExpiryTest(unittest.TestCase):
+    """Archivado y caducidad de segmentos: las estadísticas deben seguir cuadrando"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.tmp_dir, "processed_tweets.json")
+        shutil.copy(LEGACY_FIXTURE, self.db_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_verify_after_archive_and_expiry(self):
+        db = Database(self.db_file, retention_days=1)
+        self.addCleanup(db.close)
+        stats = db.get_stats()
+        db.compact()
+
+        # Todos los registros del ejemplo son antiguos: se archivan y caducan en la misma compactación
+        self.assertEqual(db.get_last_processed_tweets(), [])
+        self.assertEqual(list(db.iter_archived()), [])
+        self.assertEqual(db.verify(), {})
+        self.assertEqual(db.get_stats()["by_hour"], stats["by_hour"])
+
+        reopened = Database(self.db_file, read_only=True)
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.verify(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
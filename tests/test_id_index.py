@@ -0,0 +1,60 @@
+import unittest
+from utils.id_index import IdIndex, BloomFilter
+
+
+class IdIndexTest(unittest.TestCase):
+    """Índice compacto de IDs y filtro de Bloom"""
+
+    def test_membership_and_filter(self):
+        index = IdIndex(["3", 1, 2])
+        index.add(10)
+        self.assertIn(2, index)
+        self.assertIn("10", index)
+        self.assertNotIn(4, index)
+        self.assertEqual(len(index), 4)
+        # Conserva el orden y el tipo de entrada, sin repetidos
+        self.assertEqual(index.filter_unprocessed(["5", 1, "5", 4]), ["5", 4])
+
+    def test_compact_merges_recent_ids(self):
+        index = IdIndex([5, 1])
+        index.add(3)
+        index.add(3)
+        index.compact()
+        self.assertEqual(list(index), [1, 3, 5])
+
+    def test_serialization_round_trip(self):
+        index = IdIndex([1, 2**63 + 5])
+        index.add(7)
+        restored, seq = IdIndex.from_bytes(index.to_bytes(42))
+        self.assertEqual(seq, 42)
+        self.assertEqual(list(restored), [1, 7, 2**63 + 5])
+        with self.assertRaises(ValueError):
+            IdIndex.from_bytes(b"XXXX" + index.to_bytes(1)[4:])
+
+    def test_copy_is_independent(self):
+        index = IdIndex([1])
+        index.add(2)
+        copy = index.copy()
+        index.add(3)
+        index.compact()
+        self.assertEqual(list(copy), [1, 2])
+        self.assertIsNone(copy.bloom)
+
+    def test_bloom_filter(self):
+        index = IdIndex(range(1000))
+        bloom = index.build_bloom()
+        index.add(5000)
+        self.assertIn(5000, bloom)
+        self.assertTrue(all(tweet_id in bloom for tweet_id in range(1000)))
+        # Tasa de falsos positivos cercana a la pedida (1 %)
+        false_positives = sum(tweet_id in bloom for tweet_id in range(10**6, 10**6 + 10000))
+        self.assertLess(false_positives, 300)
+
+        restored, seq = BloomFilter.from_bytes(bloom.to_bytes(9))
+        self.assertEqual(seq, 9)
+        self.assertIn(5000, restored)
+        self.assertEqual(restored.count, bloom.count)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import random
+import unittest
+from utils.near_duplicates import NearDuplicateIndex, simhash
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def flip(signature, bits):
+    for bit in bits:
+        signature ^= 1 << bit
+    return signature
+
+
+class SimHashTest(unittest.TestCase):
+    """Firmas SimHash de tweets normalizados"""
+
+    def test_mentions_links_and_cashtags_are_ignored(self):
+        self.assertEqual(
+            simhash("@alice Bitcoin sube con fuerza hoy https://t.co/abc $BTC"),
+            simhash("@bob bitcoin sube con fuerza hoy https://t.co/xyz $ETH")
+        )
+
+    def test_similar_texts_are_close(self):
+        base = "el precio de bitcoin supera los cien mil dólares por primera vez en la historia"
+        similar = base + " hoy"
+        unrelated = "receta de tortilla de patatas con cebolla para cuatro personas"
+        self.assertLess(bin(simhash(base) ^ simhash(similar)).count("1"), bin(simhash(base) ^ simhash(unrelated)).count("1"))
+        self.assertLessEqual(bin(simhash(base) ^ simhash(similar)).count("1"), 12)
+
+    def test_empty_text(self):
+        self.assertEqual(simhash("@alice https://t.co/abc"), 0)
+
+
+class NearDuplicateIndexTest(unittest.TestCase):
+    """Búsqueda LSH por bandas con ventana y tamaño máximo"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.index = NearDuplicateIndex(max_distance=6, bands=7, window=60, maxsize=100, clock=self.clock)
+        self.signature = random.Random(1).getrandbits(64)
+
+    def test_finds_signatures_within_max_distance(self):
+        self.index.add("a", self.signature, 0.9)
+        rng = random.Random(2)
+        for _ in range(50):
+            bits = rng.sample(range(64), 6)
+            self.assertEqual(self.index.query(flip(self.signature, bits)), ("a", 0.9, 6))
+        self.assertIsNone(self.index.query(flip(self.signature, range(0, 63, 9))))
+
+    def test_returns_closest_entry(self):
+        self.index.add("lejos", flip(self.signature, [1, 2, 3, 4]), 0.1)
+        self.index.add("cerca", flip(self.signature, [5]), 0.8)
+        self.assertEqual(self.index.query(self.signature), ("cerca", 0.8, 1))
+
+    def test_entries_expire_and_are_bounded(self):
+        self.index.add("a", self.signature, 0.9)
+        self.clock.now += 61
+        self.assertIsNone(self.index.query(self.signature))
+        self.assertEqual(len(self.index), 0)
+
+        for i in range(150):
+            self.index.add(i, self.signature + i, i)
+        self.assertEqual(len(self.index), 100)
+
+    def test_add_replaces_existing_key(self):
+        self.index.add("a", self.signature, 0.9)
+        self.index.add("a", ~self.signature & (2**64 - 1), 0.2)
+        self.assertIsNone(self.index.query(self.signature))
+        self.assertEqual(len(self.index), 1)
+
+    def test_bands_must_exceed_max_distance(self):
+        with self.assertRaises(ValueError):
+            NearDuplicateIndex(max_distance=7, bands=7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import os
+import unittest
+from concurrent.futures import Future
+
+# config.settings exige las credenciales al importarse
+for name in ("X_API_PROJECT_ID", "X_API_KEY_CONSUMER", "X_API_KEY_SECRET_CONSUMER", "X_API_BEARER",
+             "X_API_KEY", "X_API_KEY_SECRET", "OPENAI_API_KEY"):
+    os.environ.setdefault(name, "test")
+
+from services.openai_service import OpenAIService, DEFAULT_RELEVANCE
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class FakeTransport:
+    """Transporte simulado: devuelve las respuestas indicadas, en orden"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+        self.breaker = CircuitBreaker("OpenAI")
+
+    def chat(self, model, messages, max_tokens, temperature):
+        self.calls.append((model, messages))
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return {"choices": [{"message": {"content": reply}}], "usage": {"prompt_tokens": 10, "completion_tokens": 5}}
+
+    def submit(self, model, messages, max_tokens, temperature):
+        future = Future()
+        try:
+            future.set_result(self.chat(model, messages, max_tokens, temperature))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def close(self):
+        pass
+
+
+def service(replies, **options):
+    transport = FakeTransport(replies)
+    return OpenAIService(model="gpt-4", transport=transport, **options), transport
+
+
+class RelevanceParsingTest(unittest.TestCase):
+    """Lectura de las puntuaciones de relevancia devueltas por el modelo"""
+
+    def test_parse_relevance_reply(self):
+        parse = OpenAIService._parse_relevance_reply
+        self.assertEqual(parse('```json\n{"relevance": 0.8, "reply": " hola "}\n```'), (0.8, "hola"))
+        self.assertEqual(parse('{"relevance": 3, "reply": null}'), (1.0, None))
+        self.assertIsNone(parse('{"reply": "hola"}'))
+        self.assertIsNone(parse("sin json"))
+
+    def test_parse_relevance_reply_rejects_nan(self):
+        self.assertIsNone(OpenAIService._parse_relevance_reply('{"relevance": NaN, "reply": "hola"}'))
+
+    def test_analyze_tweet_relevance_rejects_nan(self):
+        openai_service, _ = service(["nan"])
+        self.assertEqual(openai_service.analyze_tweet_relevance("tweet sobre bitcoin"), DEFAULT_RELEVANCE)
+        # Un valor no válido no se guarda en caché
+        self.assertEqual(openai_service.cache_stats()["relevance"]["size"], 0)
+
+
+
+class RelevanceBatchTest(unittest.TestCase):
+    """Puntuación de relevancia en lote y reintento de las puntuaciones que faltan"""
+
+    def test_batch_reply_is_parsed_in_order(self):
+        openai_service, transport = service(['Puntuaciones:\n```json\n{"1": 0.9, "2": "0.2", "3": 1.5}\n```'])
+        self.assertEqual(openai_service.analyze_relevance_batch(["a", "b", "c"]), [0.9, 0.2, 1.0])
+        self.assertEqual(len(transport.calls), 1)
+        # Una línea por tweet, numerada
+        self.assertEqual(transport.calls[0][1][1]["content"], "[1] a\n[2] b\n[3] c")
+
+    def test_missing_and_invalid_scores_are_retried(self):
+        openai_service, transport = service(['{"1": 0.9, "2": NaN, "7": 0.5}', '{"1": 0.4, "2": 0.3}'])
+        self.assertEqual(openai_service.analyze_relevance_batch(["a", "b", "c"]), [0.9, 0.4, 0.3])
+        # El reintento solo envía los tweets sin puntuación válida
+        self.assertEqual(transport.calls[1][1][1]["content"], "[1] b\n[2] c")
+
+    def test_default_relevance_after_retries(self):
+        openai_service, transport = service(["sin json"] * 3, max_retries=3)
+        self.assertEqual(openai_service.analyze_relevance_batch(["a"]), [DEFAULT_RELEVANCE])
+        self.assertEqual(len(transport.calls), 3)
+        # El valor por defecto no se guarda en caché
+        self.assertEqual(openai_service.cache_stats()["relevance"]["size"], 0)
+
+    def test_batches_respect_item_limit(self):
+        openai_service, transport = service(['{"1": 0.1, "2": 0.2}', '{"1": 0.3}'], batch_max_items=2)
+        self.assertEqual(openai_service.analyze_relevance_batch(["a", "b", "c"]), [0.1, 0.2, 0.3])
+        self.assertEqual(len(transport.calls), 2)
+
+    def test_open_circuit_defers_instead_of_defaulting(self):
+        openai_service, transport = service([])
+        for _ in range(5):
+            transport.breaker.allow()
+            transport.breaker.record_failure()
+        with self.assertRaises(CircuitOpenError):
+            openai_service.analyze_relevance_batch(["a"])
+
+class ModelCacheKeyTest(unittest.TestCase):
+    """Las entradas de caché se guardan con el modelo que respondió"""
+
+    def test_fallback_answers_are_not_served_as_primary(self):
+        # 15 tokens por llamada con un presupuesto de 40: la segunda llamada ya usa el de respaldo
+        openai_service, transport = service(
+            ["0.9", "0.2", "0.3"], fallback_model="gpt-3.5-turbo", cycle_token_budget=40, downgrade_at=0.3
+        )
+        openai_service.budget.start_cycle()
+        self.assertEqual(openai_service.analyze_tweet_relevance("primero"), 0.9)
+        self.assertEqual(openai_service.analyze_tweet_relevance("segundo"), 0.2)
+        self.assertEqual([model for model, _ in transport.calls], ["gpt-4", "gpt-3.5-turbo"])
+
+        # Con el modelo de respaldo en uso se aprovechan ambas entradas
+        self.assertEqual(openai_service.analyze_tweet_relevance("primero"), 0.9)
+        self.assertEqual(openai_service.analyze_tweet_relevance("segundo"), 0.2)
+        self.assertEqual(len(transport.calls), 2)
+
+        # De vuelta al modelo principal, la respuesta del de respaldo no sirve
+        openai_service.budget.start_cycle()
+        self.assertEqual(openai_service.analyze_tweet_relevance("primero"), 0.9)
+        self.assertEqual(openai_service.analyze_tweet_relevance("segundo"), 0.3)
+        self.assertEqual(transport.calls[-1][0], "gpt-4")
+
+    def test_batch_scores_are_cached_per_model(self):
+        openai_service, transport = service(['{"1": 0.8, "2": 0.1}'])
+        self.assertEqual(openai_service.analyze_relevance_batch(["uno", "dos", "uno"]), [0.8, 0.1, 0.8])
+        # Los textos ya puntuados no se vuelven a enviar
+        self.assertEqual(openai_service.analyze_tweet_relevance("dos"), 0.1)
+        self.assertEqual(len(transport.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
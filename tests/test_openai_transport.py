@@ -0,0 +1,103 @@
+import unittest
+from email.utils import formatdate
+from unittest import mock
+import openai
+from services.openai_transport import OpenAITransport, is_transient, retry_after
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+RESPONSE = {"choices": [{"message": {"content": "ok"}}]}
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def rate_limit_error(**headers):
+    return openai.error.RateLimitError("Rate limit", http_status=429, headers=headers)
+
+
+class RetryAfterTest(unittest.TestCase):
+    """Lectura de las cabeceras de espera y clasificación de errores"""
+
+    def test_retry_after_headers(self):
+        self.assertEqual(retry_after(rate_limit_error(**{"Retry-After": "3"})), 3.0)
+        self.assertEqual(retry_after(rate_limit_error(**{"retry-after-ms": "1500"})), 1.5)
+        self.assertIsNone(retry_after(rate_limit_error()))
+        self.assertIsNone(retry_after(rate_limit_error(**{"Retry-After": "pronto"})))
+        date_hint = retry_after(rate_limit_error(**{"Retry-After": formatdate(usegmt=True)}))
+        self.assertLessEqual(date_hint, 1.0)
+
+    def test_transient_errors(self):
+        self.assertTrue(is_transient(rate_limit_error()))
+        self.assertTrue(is_transient(openai.error.APIError("error", http_status=503)))
+        self.assertTrue(is_transient(openai.error.APIError("error")))
+        self.assertFalse(is_transient(openai.error.APIError("error", http_status=400)))
+        self.assertFalse(is_transient(openai.error.InvalidRequestError("error", param=None)))
+        self.assertFalse(is_transient(ValueError("error")))
+
+
+class OpenAITransportTest(unittest.TestCase):
+    """Reintentos, esperas indicadas por el servidor y circuito de OpenAI"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("OpenAI", min_calls=3, clock=self.clock)
+        self.transport = OpenAITransport(max_retries=3, backoff_base=0.0, backoff_max=60.0,
+                                         breaker=self.breaker, clock=self.clock, sleep=self.clock.sleep)
+        self.addCleanup(self.transport.close)
+
+    def chat(self, *outcomes):
+        with mock.patch("openai.ChatCompletion.create", side_effect=list(outcomes)) as create:
+            try:
+                return self.transport.chat("gpt-4", [], 10, 0.1)
+            finally:
+                self.calls = create.call_count
+
+    def test_retry_after_is_respected(self):
+        self.assertEqual(self.chat(rate_limit_error(**{"Retry-After": "7"}), RESPONSE), RESPONSE)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.clock.sleeps, [7.0])
+
+    def test_rate_limit_pauses_all_requests(self):
+        self.transport._backoff(rate_limit_error(**{"Retry-After": "5"}), 0)
+        self.chat(RESPONSE)
+        self.assertEqual(self.clock.sleeps, [5.0])
+
+    def test_long_retry_after_fails_without_retrying(self):
+        with self.assertRaises(openai.error.RateLimitError):
+            self.chat(rate_limit_error(**{"Retry-After": "120"}), RESPONSE)
+        self.assertEqual(self.calls, 1)
+
+    def test_backoff_without_hint_is_bounded(self):
+        self.transport.backoff_base = 1.0
+        self.chat(openai.error.APIError("error", http_status=502), openai.error.Timeout("timeout"), RESPONSE)
+        self.assertEqual(self.calls, 3)
+        self.assertLessEqual(self.clock.sleeps[0], 1.0)
+        self.assertLessEqual(self.clock.sleeps[1], 2.0)
+
+    def test_non_transient_error_is_not_retried(self):
+        with self.assertRaises(openai.error.InvalidRequestError):
+            self.chat(openai.error.InvalidRequestError("error", param=None), RESPONSE)
+        self.assertEqual(self.calls, 1)
+
+    def test_breaker_opens_after_repeated_failures(self):
+        errors = [openai.error.ServiceUnavailableError("caído", http_status=503)] * 3
+        with self.assertRaises(openai.error.ServiceUnavailableError):
+            self.chat(*errors)
+        # Con el circuito abierto la petición falla sin llegar a hacerse
+        with self.assertRaises(CircuitOpenError):
+            self.chat(RESPONSE)
+        self.assertEqual(self.calls, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from utils.rate_limiter import TokenBucket, RateLimiter, RateLimitExceeded
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def headers(remaining, reset, limit=180, prefix="x-rate-limit"):
+    return {f"{prefix}-remaining": str(remaining), f"{prefix}-reset": str(reset), f"{prefix}-limit": str(limit)}
+
+
+class TokenBucketTest(unittest.TestCase):
+    """Presupuesto de llamadas de un endpoint a partir de las cabeceras de X"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(self.clock)
+
+    def test_unknown_budget_does_not_wait(self):
+        self.assertEqual(self.bucket.wait_time(), 0)
+        self.assertIsNone(self.bucket.remaining)
+
+    def test_waits_until_reset_when_empty(self):
+        self.bucket.update(headers(1, 1900))
+        self.assertEqual(self.bucket.wait_time(), 0)
+        self.bucket.take()
+        self.assertEqual(self.bucket.wait_time(), 900)
+
+        # Al llegar la hora de recarga vuelve a tener la capacidad completa
+        self.clock.now = 1900
+        self.assertEqual(self.bucket.wait_time(), 0)
+        self.assertEqual(self.bucket.remaining, 180)
+
+    def test_most_restrictive_window_wins(self):
+        self.bucket.update({**headers(50, 1900), **headers(0, 5000, 1000, "x-app-limit-24hour")})
+        self.assertEqual(self.bucket.remaining, 0)
+        self.assertEqual(self.bucket.wait_time(), 4000)
+
+    def test_out_of_order_responses_keep_lowest_count(self):
+        self.bucket.update(headers(3, 1900))
+        self.bucket.update(headers(5, 1900))
+        self.assertEqual(self.bucket.remaining, 3)
+        # Una ventana nueva sí reemplaza la cuenta
+        self.bucket.update(headers(179, 2800))
+        self.assertEqual(self.bucket.remaining, 179)
+
+    def test_ignores_incomplete_headers(self):
+        self.bucket.update({"x-rate-limit-remaining": "abc", "x-rate-limit-reset": "1900"})
+        self.assertIsNone(self.bucket.remaining)
+
+
+class RateLimiterTest(unittest.TestCase):
+    """Espera proactiva antes de cada llamada"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(max_wait=600, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_acquire_waits_for_reset(self):
+        self.limiter.update("search", headers(1, 1300))
+        self.assertEqual(self.limiter.acquire("search"), 0)
+        self.assertEqual(self.limiter.acquire("search"), 300)
+        self.assertEqual(self.clock.now, 1300)
+
+    def test_acquire_fails_beyond_max_wait(self):
+        self.limiter.update("search", headers(0, 2000))
+        with self.assertRaises(RateLimitExceeded) as raised:
+            self.limiter.acquire("search")
+        self.assertEqual(raised.exception.wait_seconds, 1000)
+        # Los demás endpoints tienen su propio presupuesto
+        self.assertEqual(self.limiter.acquire("users"), 0)
+
+    def test_wait_time_for_several_calls(self):
+        self.limiter.update("search", headers(2, 1500))
+        self.assertEqual(self.limiter.wait_time("search", calls=2), 0)
+        self.assertEqual(self.limiter.wait_time("search", calls=3), 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from datetime import datetime
+from utils.scheduler import AdaptiveScheduler
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class StopLoop(Exception):
+    pass
+
+
+class AdaptiveSchedulerTest(unittest.TestCase):
+    """Intervalo adaptativo entre ciclos y tareas programadas"""
+
+    def setUp(self):
+        self.clock = FakeClock(datetime(2025, 3, 1, 3, 0).timestamp())
+        self.scheduler = AdaptiveScheduler(interval=600, min_interval=120, max_interval=3600, page_size=100,
+                                           history=3, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_full_pages_shorten_the_interval(self):
+        self.scheduler.adapt({"fetched": 250, "saturated": False})
+        self.assertEqual(self.scheduler.interval, 300)
+        self.scheduler.adapt({"fetched": 10, "saturated": True})
+        self.assertEqual(self.scheduler.interval, 150)
+        self.scheduler.adapt({"fetched": 400, "saturated": True})
+        self.assertEqual(self.scheduler.interval, 120)
+        reason = self.scheduler.adapt({"fetched": 400, "saturated": True})
+        self.assertEqual(self.scheduler.interval, 120)
+        self.assertIn("en el límite", reason)
+
+    def test_empty_cycles_lengthen_the_interval(self):
+        self.scheduler.adapt({"fetched": 0, "saturated": False})
+        self.assertEqual(self.scheduler.interval, 900)
+        # Tweets sin llegar a una página de media: el intervalo se mantiene
+        self.scheduler.adapt({"fetched": 30, "saturated": False})
+        self.assertEqual(self.scheduler.interval, 900)
+        self.assertEqual(self.scheduler.adapt(None), "ciclo sin búsqueda")
+        self.assertEqual(self.scheduler.interval, 900)
+
+    def test_jobs_run_when_due(self):
+        runs = []
+        self.scheduler.every(30, lambda: runs.append("flush"))
+        self.scheduler.daily("04:00", lambda: runs.append("archive"))
+        self.assertEqual(self.scheduler.run_pending(), self.clock.now + 30)
+        self.clock.now += 3600
+        self.scheduler.run_pending()
+        self.assertEqual(runs, ["flush", "archive"])
+
+    def test_failing_job_is_rescheduled(self):
+        def broken():
+            raise RuntimeError("fallo")
+        self.scheduler.every(10, broken)
+        self.clock.now += 10
+        with self.assertLogs("crypto_bot.scheduler", level="ERROR"):
+            self.assertEqual(self.scheduler.run_pending(), self.clock.now + 10)
+
+    def test_run_sleeps_until_next_deadline_and_waits_for_rate_limit(self):
+        flushes = []
+        self.scheduler.every(200, lambda: flushes.append(self.clock.now))
+        polls = []
+        results = [{"fetched": 0, "saturated": False}, {"fetched": 0, "saturated": False}]
+
+        def poll():
+            polls.append(self.clock.now)
+            if not results:
+                raise StopLoop
+            return results.pop(0)
+
+        # El segundo ciclo no puede completarse hasta dentro de 2000 segundos
+        ready = iter([0.0, 2000.0])
+        with self.assertRaises(StopLoop):
+            self.scheduler.run(poll, ready_in=lambda: next(ready))
+
+        start = polls[0]
+        self.assertEqual(polls[1] - start, 900)
+        self.assertEqual(polls[2] - polls[1], 2001)
+        # Duerme hasta cada plazo (tarea o ciclo) sin despertarse de más
+        self.assertEqual(len(flushes), int((polls[2] - start) // 200))
+        self.assertLessEqual(len(self.clock.sleeps), len(flushes) + 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
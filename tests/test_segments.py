@@ -0,0 +1,87 @@
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from utils import segments
+
+
+def record(processed_at, responded=False):
+    return {"processed_at": processed_at, "responded": responded, "tweet_text": "texto", "response_text": None}
+
+
+class SegmentsTest(unittest.TestCase):
+    """Segmentos comprimidos del historial archivado"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def path(self, key, fmt="gzip"):
+        return segments.segment_path(self.tmp_dir, "tweets", key, fmt)
+
+    def test_segment_keys(self):
+        self.assertEqual(segments.segment_key("2025-02-27T10:00:00"), "2025-02-27")
+        self.assertEqual(segments.segment_key("2025-02-27T10:00:00", "week"), "2025-W09")
+        self.assertEqual(segments.segment_key(None), segments.UNDATED_KEY)
+        self.assertEqual(segments.segment_start("2025-W09"), date(2025, 2, 24))
+        self.assertEqual(segments.segment_end("2025-W09"), date(2025, 3, 3))
+        self.assertEqual(segments.segment_end("2025-02-27"), date(2025, 2, 28))
+
+    def test_write_appends_and_reads_back(self):
+        for fmt in segments.SEGMENT_FORMATS:
+            path = self.path("2025-02-27", fmt)
+            segments.write_segment(path, [("1", record("2025-02-27T10:00:00"))])
+            segments.write_segment(path, [("2", record("2025-02-27T11:00:00")), ("1", record("2025-02-27T10:00:00"))])
+            # El registro archivado dos veces solo se lee una
+            self.assertEqual([tweet_id for tweet_id, _ in segments.iter_segment(path)], ["1", "2"])
+
+    def test_truncated_segment_keeps_complete_records(self):
+        path = self.path("2025-02-27")
+        segments.write_segment(path, [("1", record("2025-02-27T10:00:00"))])
+        with open(path, "ab") as f:
+            f.write(gzip.compress(b'{"id":"2","processed_at":"2025-02-27T11:00:00"}\n')[:20])
+        with self.assertLogs("crypto_bot.database", level="WARNING"):
+            self.assertEqual([tweet_id for tweet_id, _ in segments.iter_segment(path)], ["1"])
+
+    def test_iter_segments_filters_by_interval(self):
+        segments.write_segment(self.path("2025-02-26"), [("1", record("2025-02-26T23:00:00"))])
+        segments.write_segment(self.path("2025-02-27"), [("2", record("2025-02-27T10:00:00"))])
+        segments.write_segment(self.path(segments.UNDATED_KEY), [("3", record(None))])
+
+        def ids(**interval):
+            return [tweet_id for tweet_id, _ in segments.iter_segments(self.tmp_dir, "tweets", **interval)]
+
+        self.assertEqual(ids(), ["3", "1", "2"])
+        self.assertEqual(ids(since="2025-02-27"), ["2"])
+        self.assertEqual(ids(until="2025-02-27"), ["1"])
+        self.assertEqual(ids(since="2025-02-26T12:00:00", until="2025-02-27T10:00:00"), ["1"])
+
+    def test_segment_starting_at_until_is_not_opened(self):
+        path = self.path("2025-02-27")
+        segments.write_segment(path, [("2", record("2025-02-27T10:00:00"))])
+        with open(path, "wb") as f:
+            f.write(b"no es gzip")
+        # Si se abriera, el segmento dañado dejaría un aviso en el log
+        with self.assertNoLogs("crypto_bot.database", level="WARNING"):
+            self.assertEqual(list(segments.iter_segments(self.tmp_dir, "tweets", until="2025-02-27")), [])
+
+    def test_expired_segments_and_deltas(self):
+        segments.write_segment(self.path("2025-02-26"), [("1", record("2025-02-26T10:00:00", responded=True))])
+        segments.write_segment(self.path("2025-02-27"), [("2", record("2025-02-27T10:00:00"))])
+        segments.write_segment(self.path(segments.UNDATED_KEY), [("3", record(None))])
+
+        expired = segments.expired_segments(self.tmp_dir, "tweets", retention_days=1, today=date(2025, 2, 28))
+        self.assertEqual([key for key, _ in expired], ["2025-02-26"])
+
+        deltas = dict(segments.expired_deltas(expired[0][1]))
+        self.assertEqual(deltas[("total_processed",)], 1)
+        self.assertEqual(deltas[("by_day", "2025-02-26")], 1)
+        self.assertEqual(deltas[("by_hour", "2025-02-26T10")], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from types import SimpleNamespace
+from utils.spam_filter import SpamFilter, MIN_AUTHOR_HISTORY
+
+
+def tweet(text, author_id="1", entities=None):
+    return SimpleNamespace(text=text, author_id=author_id, entities=entities)
+
+
+class SpamFilterTest(unittest.TestCase):
+    """Prefiltro local de spam"""
+
+    def setUp(self):
+        self.spam_filter = SpamFilter(threshold=0.8)
+
+    def score(self, *tweets):
+        return [score for score, _ in self.spam_filter.score_page(list(tweets))]
+
+    def test_legitimate_question_passes(self):
+        score, = self.score(tweet("@amigo ¿qué opinas de la actualización de Ethereum de esta semana?"))
+        self.assertEqual(score, 0)
+        self.assertFalse(self.spam_filter.is_spam(score))
+
+    def test_template_spam_is_rejected(self):
+        (score, reasons), = self.spam_filter.score_page([tweet(
+            "Free crypto AIRDROP! Claim your $PEPE $DOGE $SHIB now, click the link bit.ly/x https://tinyurl.com/y @a @b @c"
+        )])
+        self.assertTrue(self.spam_filter.is_spam(score))
+        self.assertTrue(reasons[0].startswith(("lexicon", "cashtag_density", "shortened")))
+
+    def test_leading_reply_mentions_do_not_count(self):
+        reply, inline = self.score(tweet("@a @b @c @d buen análisis"), tweet("buen análisis @a @b @c @d"))
+        self.assertEqual(reply, 0)
+        self.assertGreater(inline, 0)
+
+    def test_expanded_urls_from_entities(self):
+        entities = {"urls": [{"url": "https://t.co/abc", "expanded_url": "https://www.bit.ly/abc"}]}
+        with_entities, without = self.score(tweet("mira https://t.co/abc", entities=entities), tweet("mira https://t.co/abc"))
+        self.assertGreater(with_entities, without)
+
+    def test_author_history_only_after_minimum(self):
+        for _ in range(MIN_AUTHOR_HISTORY - 1):
+            self.spam_filter.record("7", True)
+        self.assertEqual(self.score(tweet("hola", "7")), [0])
+        key, (history, expires_at) = self.spam_filter.record("7", False)
+        self.assertEqual((key, history), ("7", [MIN_AUTHOR_HISTORY, MIN_AUTHOR_HISTORY - 1]))
+        score, = self.score(tweet("hola", "7"))
+        self.assertAlmostEqual(score, 0.5 * (MIN_AUTHOR_HISTORY - 1) / MIN_AUTHOR_HISTORY)
+
+
+if __name__ == "__main__":
+    unittest.main()
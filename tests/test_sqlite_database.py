@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from utils.database import Database, open_database
+from utils.sqlite_database import SQLiteDatabase
+
+# Base de datos de ejemplo del repositorio, anterior a los contadores detallados
+LEGACY_FIXTURE = os.path.join(os.path.dirname(__file__), "..", "data", "processed_tweets.json")
+
+
+class SQLiteDatabaseTest(unittest.TestCase):
+    """Importación desde JSON y caducidad de segmentos en el backend SQLite"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.tmp_dir, "processed_tweets.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def open_database(self, **options):
+        db = SQLiteDatabase(self.db_file, **options)
+        self.addCleanup(db.close)
+        return db
+
+    def test_import_json_matches_source(self):
+        db = self.open_database()
+        db.import_json(LEGACY_FIXTURE)
+
+        source = Database(LEGACY_FIXTURE, read_only=True)
+        self.addCleanup(source.close)
+        self.assertEqual(db.verify(), {})
+        self.assertEqual(db.get_stats(), source.get_stats())
+        for record in source.iter_records():
+            self.assertTrue(db.is_tweet_processed(record["id"]))
+
+    def test_verify_after_archive_and_expiry(self):
+        db = self.open_database(retention_days=1)
+        db.import_json(LEGACY_FIXTURE)
+        stats = db.get_stats()
+        db.archive()
+
+        self.assertEqual(db.get_last_processed_tweets(), [])
+        self.assertEqual(db.verify(), {})
+        self.assertEqual(db.get_stats()["by_hour"], stats["by_hour"])
+
+
+    def test_batch_does_not_block_other_writers(self):
+        db = self.open_database()
+        with db.batch():
+            db.set_state("cursor", "1")
+            # Otro proceso puede escribir mientras el bot sigue dentro del lote
+            other = SQLiteDatabase(self.db_file, busy_timeout=0.1)
+            self.addCleanup(other.close)
+            other.set_state("other", "2")
+            self.assertEqual(other.get_state("cursor"), "1")
+
+    def test_bulk_write_is_one_transaction(self):
+        db = self.open_database()
+        db.mark_tweets_processed_bulk([
+            {"tweet_id": 1, "responded": False, "tweet_text": "uno"},
+            {"tweet_id": 2, "responded": True, "tweet_text": "dos", "response_text": "respuesta"}
+        ])
+        self.assertFalse(db._conn.in_transaction)
+        self.assertEqual(db.filter_unprocessed([1, 2, 3]), [3])
+        self.assertEqual(db.verify(), {})
+
+
+class OpenDatabaseTest(unittest.TestCase):
+    """Elección del backend en open_database()"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        self.addCleanup(os.chdir, cwd)
+        os.mkdir("data")
+
+    def open(self, backend=None):
+        env = {name: value for name, value in os.environ.items() if name != "DB_BACKEND"}
+        if backend:
+            env["DB_BACKEND"] = backend
+        with mock.patch.dict(os.environ, env, clear=True):
+            db = open_database()
+        self.addCleanup(db.close)
+        return db
+
+    def test_uses_db_backend(self):
+        self.assertIsInstance(self.open("sqlite"), SQLiteDatabase)
+
+    def test_autodetects_without_db_backend(self):
+        self.assertIsInstance(self.open(), Database)
+        SQLiteDatabase(os.path.join("data", "processed_tweets.db")).close()
+        self.assertIsInstance(self.open(), SQLiteDatabase)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from utils.database import Database
+from utils.token_budget import TokenBudget, BudgetExceeded, model_cost, NORMAL, DOWNGRADE, EXHAUSTED
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBudgetTest(unittest.TestCase):
+    """Contabilidad de tokens y estados del presupuesto"""
+
+    def setUp(self):
+        self.clock = FakeClock(datetime(2025, 3, 1, 10, 30).timestamp())
+
+    def test_model_cost_uses_longest_prefix(self):
+        self.assertAlmostEqual(model_cost("gpt-4", 1000, 1000), 0.09)
+        self.assertAlmostEqual(model_cost("gpt-4o-mini-2024-07-18", 1000, 0), 0.00015)
+        self.assertEqual(model_cost("modelo-local", 1000, 1000), 0.0)
+
+    def test_cycle_budget_states(self):
+        budget = TokenBudget(cycle_tokens=100, downgrade_at=0.8, clock=self.clock)
+        budget.start_cycle()
+        budget.record("relevance", "gpt-4", 50, 10)
+        self.assertEqual(budget.status(), NORMAL)
+        budget.record("response", "gpt-4", 15, 5)
+        self.assertEqual(budget.status(), DOWNGRADE)
+        budget.check()
+        budget.record("response", "gpt-4", 15, 5)
+        self.assertEqual(budget.status(), EXHAUSTED)
+        with self.assertRaises(BudgetExceeded) as raised:
+            budget.check()
+        self.assertEqual((raised.exception.used, raised.exception.limit), (100, 100))
+
+        # Cada ciclo empieza de cero
+        cycle = budget.end_cycle()
+        self.assertEqual(cycle["response"]["calls"], 2)
+        budget.start_cycle()
+        self.assertEqual(budget.status(), NORMAL)
+
+    def test_daily_budget_counts_only_today(self):
+        budget = TokenBudget(daily_tokens=100, clock=self.clock)
+        budget.record("relevance", "gpt-4", 90, 10)
+        self.assertEqual(budget.status(), EXHAUSTED)
+        self.clock.now += 24 * 3600
+        self.assertEqual(budget.daily_used(), 0)
+        self.assertEqual(budget.status(), NORMAL)
+
+    def test_unlimited_budget(self):
+        budget = TokenBudget(clock=self.clock)
+        budget.record("relevance", "gpt-4", 10**9, 0)
+        self.assertEqual(budget.status(), NORMAL)
+        budget.check()
+
+    def test_hourly_usage_survives_restart(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        db = Database(os.path.join(tmp_dir, "processed_tweets.json"))
+        self.addCleanup(db.close)
+
+        # La caché persistida caduca según la hora real
+        self.clock.now = datetime.now().replace(minute=30).timestamp()
+        hour = datetime.fromtimestamp(self.clock.now).strftime("%Y-%m-%dT%H")
+        budget = TokenBudget(daily_tokens=1000, db=db, clock=self.clock)
+        budget.record("relevance", "gpt-4", 300, 20, estimated=True)
+        budget.record("response", "gpt-3.5-turbo", 100, 80)
+        budget.end_cycle()
+
+        restored = TokenBudget(daily_tokens=1000, db=db, clock=self.clock)
+        self.assertEqual(restored.daily_used(), 500)
+        usage = restored.hourly_usage()[hour]
+        self.assertEqual(usage["by_type"]["relevance"]["estimated"], 1)
+        self.assertEqual(usage["by_model"]["gpt-3.5-turbo"]["completion_tokens"], 80)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+# config.settings exige las credenciales al importarse
+for name in ("X_API_PROJECT_ID", "X_API_KEY_CONSUMER", "X_API_KEY_SECRET_CONSUMER", "X_API_BEARER",
+             "X_API_KEY", "X_API_KEY_SECRET", "OPENAI_API_KEY"):
+    os.environ.setdefault(name, "test")
+
+import tweepy
+from utils.database import Database
+from utils.token_budget import TokenBudget
+from services.twitter_service import TwitterService
+
+
+class FakeOpenAI:
+    """Servicio de OpenAI simulado: la relevancia de cada tweet va en su texto"""
+
+    def __init__(self):
+        self.budget = TokenBudget()
+        self.fail_batch = False
+
+    def available(self):
+        return True
+
+    @staticmethod
+    def _score(text):
+        return float(text.split()[-1])
+
+    def analyze_relevance_batch(self, texts):
+        if self.fail_batch:
+            raise ValueError("respuesta inesperada")
+        return [self._score(text) for text in texts]
+
+    def analyze_tweet_relevance(self, text):
+        return self._score(text)
+
+    def analyze_and_respond(self, text, sentiment=None, threshold=0.7):
+        relevance = self._score(text)
+        return relevance, "respuesta" if relevance >= threshold else None
+
+    def generate_response(self, text, sentiment=None):
+        return "respuesta"
+
+    def cache_stats(self):
+        return {}
+
+
+class ProcessTweetsTest(unittest.TestCase):
+    """Cada tweet leído en un ciclo termina procesado o aplazado"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp_dir, "processed_tweets.json"))
+        self.openai = FakeOpenAI()
+        # 12 tweets, la mitad relevantes
+        self.tweet_ids = list(range(112, 100, -1))
+        self.scores = {tweet_id: 0.9 if tweet_id % 2 else 0.1 for tweet_id in self.tweet_ids}
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def search(self, **params):
+        since_id = int(params.get("since_id") or 0)
+        data = [
+            tweepy.Tweet({"id": str(tweet_id), "text": f"tweet {tweet_id} {self.scores[tweet_id]}", "author_id": "7", "edit_history_tweet_ids": [str(tweet_id)]})
+            for tweet_id in self.tweet_ids if tweet_id > since_id
+        ]
+        meta = {"newest_id": data[0]["id"] if data else None, "result_count": len(data)}
+        users = [tweepy.User({"id": "7", "username": "alice", "name": "Alice"})]
+        return tweepy.Response(data, {"users": users}, [], meta)
+
+    def service(self, **options):
+        service = TwitterService(
+            self.openai, self.db, max_results=100, responses_per_cycle=2,
+            spam_threshold=None, near_duplicate_distance=None, **options
+        )
+        service.read_client.search_recent_tweets = self.search
+        return service
+
+    def assert_all_handled(self, service):
+        deferred = {tweet.id for tweet in service._deferred}
+        processed = {tweet_id for tweet_id in self.tweet_ids if self.db.is_tweet_processed(tweet_id)}
+        self.assertEqual(processed | deferred, set(self.tweet_ids))
+        self.assertFalse(processed & deferred)
+        return processed, deferred
+
+    def test_batch_relevance_defers_relevant_over_cap(self):
+        service = self.service(batch_relevance=True)
+        self.assertEqual(service.process_tweets()["fetched"], 12)
+
+        processed, deferred = self.assert_all_handled(service)
+        # Los 6 irrelevantes se registran como ignorados; se responde a 2 relevantes
+        self.assertEqual(len(processed), 8)
+        self.assertEqual(len(deferred), 4)
+        self.assertEqual(self.db.get_state(f"since_id:{service.query}"), 112)
+
+        # Los aplazados se retoman en los ciclos siguientes
+        service.process_tweets()
+        service.process_tweets()
+        processed, deferred = self.assert_all_handled(service)
+        self.assertEqual(deferred, set())
+
+    def test_sampling_defers_unsampled_tweets(self):
+        service = self.service(batch_relevance=False)
+        service.process_tweets()
+
+        processed, deferred = self.assert_all_handled(service)
+        self.assertEqual(len(processed), 2)
+        self.assertEqual(len(deferred), 10)
+
+    def test_failed_batch_is_deferred_and_retried(self):
+        self.openai.fail_batch = True
+        service = self.service(batch_relevance=True)
+        service.process_tweets()
+
+        processed, deferred = self.assert_all_handled(service)
+        self.assertEqual(processed, set())
+
+        self.openai.fail_batch = False
+        service.process_tweets()
+        processed, deferred = self.assert_all_handled(service)
+        self.assertEqual(len(processed), 8)
+
+    def test_nothing_left_to_process_after_cap(self):
+        self.scores = dict.fromkeys(self.tweet_ids, 0.9)
+        service = self.service(batch_relevance=True)
+        service.responses_per_cycle = 0
+        with self.assertNoLogs("crypto_bot.twitter", level="ERROR"):
+            service.process_tweets()
+
+        processed, deferred = self.assert_all_handled(service)
+        self.assertEqual(processed, set())
+
+    def test_combined_calls_require_per_tweet_relevance(self):
+        with self.assertRaises(ValueError):
+            self.service(batch_relevance=True, combined_llm=True)
+        self.assertFalse(self.service(batch_relevance=True).combined_llm)
+        self.assertTrue(self.service(batch_relevance=False).combined_llm)
+
+    def test_deferred_tweets_survive_restart(self):
+        self.service(batch_relevance=True).process_tweets()
+        restarted = self.service(batch_relevance=True)
+        self.assertEqual(len(restarted._deferred), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("crypto_bot.circuit_breaker")
+
+# Estados del circuito: cerrado (las llamadas pasan), abierto (fallan sin
+# llegar a hacerse) y semiabierto (pasan unas pocas llamadas de prueba)
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """El circuito de un servicio está abierto: la llamada no se hace"""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"Circuito de {name} abierto; se volverá a probar en {retry_in:.0f} segundos")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Cortocircuito de las llamadas a un servicio externo.
+
+    Cada llamada se anota como éxito o fallo en una ventana deslizante de
+    `window` segundos. Con al menos `min_calls` llamadas en la ventana y una
+    proporción de fallos de `failure_rate` o más, el circuito se abre: durante
+    `open_seconds` las llamadas fallan al instante con CircuitOpenError en
+    lugar de esperar timeouts y reintentos. Pasado ese tiempo queda
+    semiabierto y deja pasar `half_open_calls` llamadas de prueba: si una
+    falla, vuelve a abrirse; si todas van bien, se cierra.
+
+    Uso: allow() antes de la llamada y, después, record_success(),
+    record_failure() o release() (la llamada no llegó al servicio o su
+    resultado no dice nada de su estado). Es seguro entre hilos.
+    """
+
+    def __init__(self, name, failure_rate=0.5, min_calls=5, window=60.0, open_seconds=60.0,
+                 half_open_calls=1, clock=time.time):
+        """
+        Args:
+            name: Nombre del servicio, para el log
+            failure_rate: Proporción de fallos en la ventana que abre el circuito
+            min_calls: Llamadas en la ventana necesarias para abrir el circuito
+            window: Segundos de la ventana deslizante
+            open_seconds: Segundos que el circuito permanece abierto
+            half_open_calls: Llamadas de prueba en estado semiabierto
+            clock: Función que devuelve la hora actual en segundos
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        # (hora, fallo) de cada llamada en la ventana
+        self._calls = deque()
+        self._probes = 0
+        self._probe_successes = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self):
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+            logger.info(f"🟡 Circuito de {self.name} semiabierto: probando el servicio")
+
+    def _retry_in(self):
+        return max(0.0, self._opened_at + self.open_seconds - self._clock())
+
+    def available(self):
+        """Indica si una llamada pasaría ahora (sin reservar la llamada de prueba)"""
+        with self._lock:
+            self._refresh()
+            if self._state == OPEN:
+                return False
+            return self._state == CLOSED or self._probes < self.half_open_calls
+
+    def check(self):
+        """
+        Comprueba que el circuito deje pasar llamadas, sin reservar ninguna.
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto
+        """
+        if not self.available():
+            raise CircuitOpenError(self.name, self.retry_in())
+
+    def retry_in(self):
+        """Segundos hasta que el circuito deje pasar llamadas de prueba (0 si no está abierto)"""
+        with self._lock:
+            self._refresh()
+            return self._retry_in() if self._state == OPEN else 0.0
+
+    def allow(self):
+        """
+        Reserva una llamada.
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto o ya hay bastantes
+                llamadas de prueba en curso
+        """
+        with self._lock:
+            self._refresh()
+            if self._state == OPEN:
+                raise CircuitOpenError(self.name, self._retry_in())
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    raise CircuitOpenError(self.name, 0)
+                self._probes += 1
+
+    def record_success(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    logger.info(f"🟢 Circuito de {self.name} cerrado: el servicio responde")
+                return
+            self._add(False)
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            if self._state == OPEN:
+                return
+            self._add(True)
+            failures = sum(failed for _, failed in self._calls)
+            if len(self._calls) >= self.min_calls and failures >= self.failure_rate * len(self._calls):
+                self._open()
+
+    def release(self):
+        """Libera una llamada reservada que no llegó a hacerse o cuyo resultado no cuenta"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def _add(self, failed):
+        now = self._clock()
+        self._calls.append((now, failed))
+        while self._calls and self._calls[0][0] <= now - self.window:
+            self._calls.popleft()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._calls.clear()
+        logger.warning(f"🔴 Circuito de {self.name} abierto: las llamadas fallarán al instante "
+                       f"durante {self.open_seconds:.0f} segundos")
@@ -1,73 +1,766 @@
 import os
+import copy
+import heapq
 import json
+import time
+import struct
 import logging
-from datetime import datetime
+import tempfile
+import itertools
+import threading
+from contextlib import contextmanager
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
+from dotenv import load_dotenv
+from utils import segments
+from utils import stats as stats_engine
+from utils.id_index import IdIndex, BloomFilter
+from utils.file_lock import FileLock
+from utils.records import ProcessedTweet, to_epoch, record_matches, project_record
+from utils.json_stream import iter_document
+from utils.sqlite_database import SQLiteDatabase
 
 logger = logging.getLogger("crypto_bot.database")
 
+DEFAULT_JSON_FILE = "data/processed_tweets.json"
+DEFAULT_SQLITE_FILE = "data/processed_tweets.db"
+
+# Número de eventos de rate limit que se conservan en el historial
+RATE_LIMIT_HISTORY_SIZE = 10
+
+# Intentos de lectura de una instantánea coherente en modo solo lectura
+SNAPSHOT_RETRIES = 5
+
+def _atomic_write(path, content, fsync=False):
+    """
+    Escribe un archivo (texto o bytes) de forma atómica (archivo temporal + rename),
+    de modo que un fallo a mitad de escritura nunca trunca el archivo original.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(content, bytes) else 'w') as f:
+            f.write(content)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _is_legacy_stats(stats):
+    """Indica si las estadísticas son anteriores a los contadores detallados (solo tienen los totales)"""
+    return "by_day" not in stats
+
+
+def _rate_limit_counts(history):
+    """Contadores por endpoint del historial de rate limits (acotado: se cuenta lo que queda de él)"""
+    counts = {}
+    for event in history:
+        for path, delta in stats_engine.rate_limit_deltas(event.get("endpoint")):
+            counts[path[1]] = counts.get(path[1], 0) + delta
+    return counts
+
 class Database:
     """
     Clase para gestionar el almacenamiento de tweets procesados.
     Ahora también almacena datos de sentimiento y rate limits.
+    
+    El documento se mantiene residente en memoria. Cada escritura se agrega
+    como una línea JSON compacta a un journal (append-only), agrupando las
+    líneas hasta `flush_every` cambios o `flush_interval` segundos. Cuando el
+    journal crece lo suficiente, un hilo en segundo plano lo compacta en una
+    nueva instantánea del documento. Al arrancar se carga la instantánea y
+    se reaplica la cola del journal.
+    
+    En memoria, cada tweet es un ProcessedTweet (utils.records) indexado por
+    su ID entero; el formato almacenado solo se genera al escribir.
+    Los IDs procesados se consultan en un índice compacto (utils.id_index)
+    que se persiste junto a la instantánea, con un filtro de Bloom opcional.
+    Un índice ordenado por processed_at, mantenido en cada inserción, sirve
+    las consultas de los últimos tweets sin ordenar todo el historial.
+    Las estadísticas (utils.stats) se actualizan en la misma operación que
+    cada registro, por lo que leerlas nunca requiere recorrer el historial.
+    
+    En cada compactación, los registros anteriores a los últimos `hot_days`
+    días salen del documento y se archivan en segmentos diarios o semanales
+    comprimidos (utils.segments). De ellos solo se conserva el ID en el
+    índice, para no volver a procesarlos; las consultas de tweets recientes
+    trabajan únicamente con el documento y los segmentos se leen en
+    streaming con iter_archived(). Con `retention_days`, los segmentos más
+    antiguos se eliminan.
+    
+    Acceso entre procesos: solo hay un escritor, que mantiene un cerrojo de
+    archivo (utils.file_lock) mientras la base de datos está abierta. Los
+    lectores (`read_only=True`, como el dashboard) no toman ningún cerrojo:
+    la instantánea se reemplaza de forma atómica y del journal solo se
+    consumen líneas completas, de modo que siempre ven un estado confirmado.
+    Si el escritor compacta mientras un lector carga, la instantánea
+    cambiada o un salto en los números de secuencia lo delatan y la lectura
+    se repite. refresh() incorpora solo la cola nueva del journal.
+    
+    iter_records(), verify() y get_stats() no necesitan el documento
+    residente: si no está cargado, leen la instantánea de forma incremental
+    (utils.json_stream), por lo que los scripts de consulta y mantenimiento
+    usan memoria constante con cualquier tamaño de historial.
     """
     
-    def __init__(self, db_file="data/processed_tweets.json"):
+    def __init__(self, db_file=DEFAULT_JSON_FILE, flush_every=20, flush_interval=30.0, fsync=False,
+                 compact_min_bytes=1024 * 1024, compact_ratio=0.5, use_bloom=False,
+                 hot_days=7, retention_days=None, archive_format="gzip", segment_period="day",
+                 read_only=False, lock_timeout=10.0):
         """
         Inicializa la base de datos local.
         
         Args:
             db_file: Ruta al archivo JSON que almacenará los tweets procesados
+            flush_every: Número de cambios pendientes que fuerza un volcado a disco
+            flush_interval: Segundos máximos que un cambio puede quedar sin volcar
+            fsync: Si es True, fuerza os.fsync en cada volcado
+            compact_min_bytes: Tamaño mínimo del journal para compactarlo
+            compact_ratio: Fracción del tamaño de la instantánea que debe alcanzar
+                el journal para compactarlo (mantiene el coste amortizado por registro)
+            use_bloom: Si es True, mantiene un filtro de Bloom delante del índice de IDs
+            hot_days: Días que los registros permanecen en el documento antes de
+                archivarse (None para no archivar nunca)
+            retention_days: Días que se conservan los segmentos archivados tras el
+                fin de su periodo (None para conservarlos siempre)
+            archive_format: Compresión de los segmentos ("gzip" o "lzma")
+            segment_period: Periodo de cada segmento ("day" o "week")
+            read_only: Si es True, abre la base de datos como lector, sin cerrojo
+                y sin escribir nunca en disco (usar refresh() para ver cambios)
+            lock_timeout: Segundos que un escritor espera el cerrojo de otro proceso
         """
+        if archive_format not in segments.SEGMENT_FORMATS:
+            raise ValueError(f"❌ ERROR: Formato de archivo desconocido: {archive_format}")
+        base_path = os.path.splitext(db_file)[0]
         self.db_file = db_file
+        self.journal_file = base_path + ".journal"
+        self.ids_file = base_path + ".ids"
+        self.bloom_file = base_path + ".bloom"
+        self.lock_file = base_path + ".lock"
+        self.archive_dir = os.path.join(os.path.dirname(db_file), "archive")
+        self.segment_prefix = os.path.basename(base_path)
+        self.use_bloom = use_bloom
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.compact_min_bytes = compact_min_bytes
+        self.compact_ratio = compact_ratio
+        self.hot_days = hot_days
+        self.retention_days = retention_days
+        self.archive_format = archive_format
+        self.segment_period = segment_period
+        self.read_only = read_only
+        
+        self._lock = threading.RLock()
+        # Serializa las compactaciones (la de fondo y las de archive()), que no toman _lock todo el tiempo
+        self._compaction_lock = threading.Lock()
+        self._data = None
+        self._ids = None
+        self._recency = None
+        self._seq = 0
+        self._pending = []
+        self._batch_depth = 0
+        self._last_flush = time.monotonic()
+        self._journal = None
+        self._journal_size = 0
+        self._snapshot_size = 0
+        self._compactor = None
+        self._compacting = False
+        # IDs registrados durante una compactación con filtro de Bloom, que el filtro nuevo también debe cubrir
+        self._compaction_ids = None
+        self._journal_offset = 0
+        self._snapshot_id = None
+        self._legacy_stats = False
+        self._file_lock = None
+        
+        if read_only:
+            return
+        
         self._ensure_data_dir()
+        # Un único escritor: el bot, o un script de mantenimiento si el bot está parado
+        self._file_lock = FileLock(self.lock_file)
+        if not self._file_lock.acquire(timeout=lock_timeout):
+            owner = self._file_lock.owner()
+            raise RuntimeError(
+                f"❌ ERROR: La base de datos {db_file} está abierta para escritura por otro proceso"
+                + (f" (PID {owner})" if owner else "")
+            )
         self._init_db()
     
     def _ensure_data_dir(self):
         """Asegura que existe el directorio de datos"""
-        os.makedirs(os.path.dirname(self.db_file), exist_ok=True)
+        os.makedirs(os.path.dirname(self.db_file) or ".", exist_ok=True)
+    
+    def _empty_db(self):
+        """Documento vacío de la base de datos"""
+        return {
+            "processed_tweets": {},
+            "stats": stats_engine.empty_stats(),
+            "rate_limits": {
+                "last_encounter": None,
+                "wait_seconds": 0,
+                "history": []
+            },
+            "caches": {},
+            "state": {}
+        }
     
     def _init_db(self):
         """Inicializa la base de datos si no existe"""
         if not os.path.exists(self.db_file):
-            with open(self.db_file, 'w') as f:
-                json.dump({
-                    "processed_tweets": {},
-                    "stats": {
-                        "total_processed": 0,
-                        "total_responded": 0
-                    },
-                    "rate_limits": {
-                        "last_encounter": None,
-                        "wait_seconds": 0,
-                        "history": []
-                    }
-                }, f)
+            _atomic_write(self.db_file, json.dumps(self._empty_db()), fsync=self.fsync)
             logger.info(f"✅ Base de datos inicializada en {self.db_file}")
     
     def _load_db(self):
-        """Carga los datos de la base de datos"""
+        """
+        Devuelve la copia residente del documento. La primera vez carga la
+        instantánea y reaplica las operaciones del journal posteriores a ella.
+        """
+        with self._lock:
+            if self._data is None:
+                for _ in range(SNAPSHOT_RETRIES):
+                    if self._load_snapshot() or not self.read_only:
+                        break
+                    logger.debug("🔁 Compactación concurrente detectada; releyendo la instantánea")
+                self._migrate_stats()
+            return self._data
+    
+    def _file_id(self, stat):
+        """Identifica una versión de un archivo (el reemplazo atómico cambia el inodo)"""
+        return (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+    
+    def _current_snapshot_id(self):
+        try:
+            return self._file_id(os.stat(self.db_file))
+        except FileNotFoundError:
+            return None
+    
+    def _load_snapshot(self):
+        """
+        Carga la instantánea y reaplica el journal.
+        
+        Returns:
+            bool: False si un escritor compactó durante la lectura y el estado
+                cargado puede no ser coherente
+        """
         try:
             with open(self.db_file, 'r') as f:
-                return json.load(f)
+                self._snapshot_id = self._file_id(os.fstat(f.fileno()))
+                self._data = json.load(f)
+        except FileNotFoundError:
+            # Un lector puede arrancar antes de que el escritor cree la base de datos
+            self._snapshot_id = None
+            self._data = self._empty_db()
         except json.JSONDecodeError:
             logger.error(f"❌ Error al leer la base de datos. Creando nueva.")
-            return {
-                "processed_tweets": {}, 
-                "stats": {
-                    "total_processed": 0, 
-                    "total_responded": 0
-                },
-                "rate_limits": {
-                    "last_encounter": None,
-                    "wait_seconds": 0,
-                    "history": []
-                }
+            self._data = self._empty_db()
+        self._snapshot_size = os.path.getsize(self.db_file) if self._snapshot_id else 0
+        self._seq = self._data.get("journal_seq", 0)
+        self._journal_offset = 0
+        # Se decide antes de reaplicar el journal: sus tweets crearían los contadores detallados a medias
+        self._legacy_stats = _is_legacy_stats(self._data.get("stats", {}))
+        # Sustituir los diccionarios de la instantánea por registros compactos
+        self._data["processed_tweets"] = {
+            int(tweet_id): ProcessedTweet.from_dict(tweet_id, details)
+            for tweet_id, details in self._data["processed_tweets"].items()
+        }
+        self._ids = self._load_id_index()
+        self._recency = sorted(record.sort_key for record in self._data["processed_tweets"].values())
+        consistent = self._replay_journal()
+        # El escritor reemplaza la instantánea antes de vaciar el journal: si la
+        # instantánea sigue siendo la leída, el journal leído le correspondía
+        return consistent and self._current_snapshot_id() == self._snapshot_id
+    
+    def refresh(self):
+        """
+        En modo solo lectura, incorpora los cambios confirmados por el escritor.
+        Normalmente solo lee la cola nueva del journal; tras una compactación
+        recarga la instantánea.
+        
+        Returns:
+            bool: True si el estado cambió
+        """
+        with self._lock:
+            if not self.read_only:
+                return False
+            if self._data is None:
+                self._load_db()
+                return True
+            
+            seq = self._seq
+            try:
+                journal_size = os.path.getsize(self.journal_file)
+            except FileNotFoundError:
+                journal_size = 0
+            if (self._current_snapshot_id() != self._snapshot_id or journal_size < self._journal_offset
+                    or not self._replay_journal()):
+                self._data = None
+                self._load_db()
+                return True
+            return self._seq != seq
+    
+    def _migrate_stats(self):
+        """Calcula una única vez los contadores detallados en instantáneas anteriores a ellos"""
+        if not self._legacy_stats:
+            return
+        self._legacy_stats = False
+        
+        rate_limit_counts = _rate_limit_counts(self._data.get("rate_limits", {}).get("history", []))
+        computed = stats_engine.compute_stats(self._data["processed_tweets"].values(), rate_limit_counts)
+        if self.read_only:
+            # Un lector no escribe: el escritor persistirá el cálculo la próxima vez que abra la base de datos
+            self._data["stats"] = computed
+            return
+        self._append({"op": "stats", "stats": computed})
+        logger.info("📊 Estadísticas detalladas calculadas a partir del historial")
+    
+    def _read_persisted(self, path, loader):
+        """Lee un archivo binario persistido en una compactación, junto con su número de secuencia"""
+        try:
+            with open(path, 'rb') as f:
+                return loader(f.read())
+        except (OSError, ValueError, struct.error):
+            return None, None
+    
+    def _read_versioned(self, path, loader):
+        """Lee un archivo binario persistido en la última compactación si corresponde a la instantánea actual"""
+        obj, seq = self._read_persisted(path, loader)
+        return obj if seq == self._seq else None
+    
+    def _load_id_index(self):
+        """
+        Carga el índice de IDs persistido. Si corresponde a otra compactación se
+        completa con los IDs de la instantánea (el conjunto de IDs solo crece,
+        así que un índice antiguo sigue siendo válido como base) y, si no existe,
+        se reconstruye además con los IDs de los segmentos archivados.
+        """
+        index, seq = self._read_persisted(self.ids_file, IdIndex.from_bytes)
+        if index is None:
+            index = IdIndex(tweet_id for tweet_id, _ in segments.iter_segments(self.archive_dir, self.segment_prefix))
+        if seq != self._seq:
+            for tweet_id in self._data["processed_tweets"]:
+                index.add(tweet_id)
+        
+        if self.use_bloom:
+            bloom = self._read_versioned(self.bloom_file, BloomFilter.from_bytes)
+            if bloom is None:
+                index.build_bloom()
+            else:
+                index.bloom = bloom
+        return index
+    
+    def _replay_journal(self):
+        """
+        Aplica sobre el documento las operaciones del journal que no están en la
+        instantánea, a partir de la última posición leída. Solo se consumen
+        líneas completas: una línea sin salto de línea puede estar escribiéndose.
+        
+        Returns:
+            bool: False si falta alguna operación entre el estado cargado y el
+                journal (un escritor lo compactó mientras se leía)
+        """
+        try:
+            f = open(self.journal_file, 'rb')
+        except FileNotFoundError:
+            return True
+        
+        replayed = 0
+        consistent = True
+        with f:
+            f.seek(self._journal_offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                self._journal_offset += len(raw)
+                line = raw.strip()
+                if not line:
+                    continue
+                try:
+                    op = json.loads(line)
+                except json.JSONDecodeError:
+                    # Solo la última línea puede quedar incompleta tras una caída
+                    logger.warning(f"⚠️ Línea incompleta en el journal ignorada")
+                    continue
+                if op.get("seq", 0) <= self._seq:
+                    continue
+                if op["seq"] != self._seq + 1 and self.read_only:
+                    consistent = False
+                    break
+                self._apply(self._data, op)
+                self._seq = op["seq"]
+                replayed += 1
+            self._journal_size = os.fstat(f.fileno()).st_size
+        
+        if replayed and not self.read_only:
+            logger.info(f"🔁 Reaplicadas {replayed} operaciones del journal")
+        return consistent
+    
+    def _apply(self, data, op):
+        """Aplica una operación del journal sobre el documento"""
+        if op["op"] == "tweet":
+            self._apply_tweet(data, ProcessedTweet.from_dict(op["id"], op["record"]))
+        elif op["op"] == "rate_limit":
+            self._apply_rate_limit(data, op["event"])
+        elif op["op"] == "stats":
+            data["stats"] = op["stats"]
+            self._legacy_stats = False
+        elif op["op"] == "cache":
+            data.setdefault("caches", {}).setdefault(op["name"], {}).update(op["entries"])
+        elif op["op"] == "state":
+            data.setdefault("state", {})[op["key"]] = op["value"]
+    
+    def _apply_tweet(self, data, record):
+        """Registra un tweet procesado y actualiza las estadísticas"""
+        previous = data["processed_tweets"].get(record.tweet_id)
+        data["processed_tweets"][record.tweet_id] = record
+        self._ids.add(record.tweet_id)
+        if self._compaction_ids is not None:
+            self._compaction_ids.append(record.tweet_id)
+        
+        # Mantener el índice de recencia (normalmente es un append al final)
+        if previous is not None:
+            entry = previous.sort_key
+            pos = bisect_left(self._recency, entry)
+            if pos < len(self._recency) and self._recency[pos] == entry:
+                del self._recency[pos]
+        insort(self._recency, record.sort_key)
+        
+        # Actualizar estadísticas: se resta la versión anterior del registro, si existía
+        deltas = stats_engine.record_deltas(record)
+        if previous is not None:
+            deltas = stats_engine.record_deltas(previous, -1) + deltas
+        stats_engine.apply_deltas(data["stats"], deltas)
+    
+    def _apply_rate_limit(self, data, event):
+        """Registra un evento de rate limit en el historial"""
+        # Asegurarse de que la sección de rate_limits existe
+        if "rate_limits" not in data:
+            data["rate_limits"] = {
+                "last_encounter": None,
+                "wait_seconds": 0,
+                "history": []
             }
+        
+        rate_limits = data["rate_limits"]
+        rate_limits["last_encounter"] = event["timestamp"]
+        rate_limits["wait_seconds"] = event["wait_seconds"]
+        rate_limits["history"].append(event)
+        
+        # Mantener historial limitado a los últimos eventos
+        if len(rate_limits["history"]) > RATE_LIMIT_HISTORY_SIZE:
+            rate_limits["history"] = rate_limits["history"][-RATE_LIMIT_HISTORY_SIZE:]
+        
+        stats_engine.apply_deltas(data["stats"], stats_engine.rate_limit_deltas(event.get("endpoint")))
+    
+    def _append(self, op):
+        """Aplica una operación en memoria y la encola para el journal"""
+        if self.read_only:
+            raise RuntimeError(f"❌ ERROR: La base de datos {self.db_file} está abierta en modo solo lectura")
+        with self._lock:
+            data = self._load_db()
+            self._seq += 1
+            op["seq"] = self._seq
+            self._apply(data, op)
+            self._pending.append(json.dumps(op, separators=(",", ":")))
+            
+            # Dentro de un lote las operaciones se confirman todas juntas al final
+            if self._batch_depth:
+                return
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+            else:
+                self.flush_if_due()
+    
+    @contextmanager
+    def batch(self):
+        """
+        Agrupa todas las escrituras del bloque en una única escritura al journal.
+        Las operaciones se aplican en memoria al momento (las lecturas las ven),
+        pero no se confirman en disco hasta salir del bloque más externo.
+        
+        Si el bloque termina con una excepción, lo ya registrado se confirma
+        igualmente: un tweet respondido no debe volver a procesarse.
+        
+        Uso:
+            with db.batch():
+                db.mark_tweet_processed(...)
+                db.record_rate_limit(...)
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self.flush()
+    
+    def _open_journal(self):
+        """Abre el journal en modo append, reparando una posible última línea incompleta"""
+        if self._journal is None:
+            if os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) > 0:
+                with open(self.journal_file, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    needs_newline = f.read(1) != b"\n"
+            else:
+                needs_newline = False
+            self._journal = open(self.journal_file, 'a')
+            if needs_newline:
+                self._journal.write("\n")
+        return self._journal
+    
+    def flush_if_due(self):
+        """Vuelca los cambios pendientes si ha pasado `flush_interval` desde el último volcado"""
+        if self._pending and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+    
+    def flush(self):
+        """Agrega al journal las operaciones pendientes en una única escritura"""
+        with self._lock:
+            if not self._pending:
+                return
+            
+            text = "\n".join(self._pending) + "\n"
+            journal = self._open_journal()
+            journal.write(text)
+            journal.flush()
+            if self.fsync:
+                os.fsync(journal.fileno())
+            
+            logger.debug(f"💾 Agregadas {len(self._pending)} operaciones al journal")
+            self._journal_size += len(text.encode("utf-8"))
+            self._pending = []
+            self._last_flush = time.monotonic()
+            
+            if self._needs_compaction():
+                self._compactor = threading.Thread(target=self.compact, name="db-compactor", daemon=True)
+                self._compactor.start()
+    
+    def _needs_compaction(self):
+        """Indica si el journal es lo bastante grande como para compactarlo"""
+        if self._compacting or (self._compactor is not None and self._compactor.is_alive()):
+            return False
+        threshold = max(self.compact_min_bytes, self._snapshot_size * self.compact_ratio)
+        return self._journal_size > threshold
+    
+    def compact(self):
+        """
+        Pliega el journal en una nueva instantánea del documento y lo vacía.
+        La instantánea guarda el último número de secuencia aplicado, por lo que
+        si el proceso cae antes de vaciar el journal la reaplicación es idempotente.
+        
+        Bajo el cerrojo solo se captura el estado (copia superficial del
+        documento y número de secuencia); la serialización y las escrituras se
+        hacen fuera, mientras los demás hilos siguen leyendo y escribiendo. Al
+        terminar, el journal se reemplaza por las operaciones agregadas desde
+        la captura.
+        """
+        if self.read_only:
+            raise RuntimeError(f"❌ ERROR: La base de datos {self.db_file} está abierta en modo solo lectura")
+        with self._compaction_lock:
+            with self._lock:
+                self._compacting = True
+                self.flush()
+                data = self._load_db()
+                self._prune_caches(data)
+                seq = self._seq
+                try:
+                    journal_offset = os.path.getsize(self.journal_file)
+                except FileNotFoundError:
+                    journal_offset = 0
+                cutoff, cold = self._cold_records()
+                document = self._capture(data)
+                ids = self._ids.copy()
+                if self.use_bloom:
+                    self._compaction_ids = []
+            try:
+                self._archive_cold_records(document, cold)
+                expired = self._account_expired_segments(document)
+                document["journal_seq"] = seq
+                text = json.dumps(self._serialize(document), indent=2)
+                _atomic_write(self.db_file, text, fsync=self.fsync)
+                
+                # Los segmentos caducados solo se borran cuando la instantánea ya registra su contribución
+                for _, path in expired:
+                    os.remove(path)
+                
+                # Persistir el índice de IDs para que el arranque no tenga que reconstruirlo
+                _atomic_write(self.ids_file, ids.to_bytes(seq), fsync=self.fsync)
+                bloom = None
+                added = 0
+                if self.use_bloom:
+                    bloom = ids.build_bloom()
+                    _atomic_write(self.bloom_file, bloom.to_bytes(seq), fsync=self.fsync)
+                    # Incorporar al filtro nuevo los IDs registrados mientras tanto; bajo el cerrojo solo quedan los últimos
+                    while len(self._compaction_ids) - added > 100:
+                        for tweet_id in self._compaction_ids[added:]:
+                            bloom.add(tweet_id)
+                            added += 1
+                
+                with self._lock:
+                    self.flush()
+                    self._rotate_journal(journal_offset)
+                    if bloom is not None:
+                        for tweet_id in self._compaction_ids[added:]:
+                            bloom.add(tweet_id)
+                        self._ids.bloom = bloom
+                    self._drop_archived(data, cutoff, cold)
+                    for key in ("journal_seq", "expired_segments", "expired_stats"):
+                        if key in document:
+                            data[key] = document[key]
+                    self._snapshot_size = len(text.encode("utf-8"))
+            finally:
+                with self._lock:
+                    self._compacting = False
+                    self._compaction_ids = None
+        logger.info(f"🗜️ Journal compactado en {self.db_file}")
+    
+    def _capture(self, data):
+        """
+        Copia del documento que la compactación serializa fuera del cerrojo.
+        Los registros no cambian una vez creados, así que se comparten; se
+        copian los contenedores que las operaciones modifican en su sitio.
+        """
+        document = dict(data)
+        document["processed_tweets"] = dict(data["processed_tweets"])
+        for key in ("stats", "rate_limits", "expired_segments", "expired_stats"):
+            if key in data:
+                document[key] = copy.deepcopy(data[key])
+        document["caches"] = {name: dict(entries) for name, entries in data.get("caches", {}).items()}
+        document["state"] = dict(data.get("state", {}))
+        return document
+    
+    def _rotate_journal(self, offset):
+        """
+        Reemplaza el journal por las operaciones agregadas a partir de `offset`
+        (las posteriores a la nueva instantánea).
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        try:
+            with open(self.journal_file, 'rb') as f:
+                f.seek(offset)
+                tail = f.read()
+        except FileNotFoundError:
+            tail = b""
+        _atomic_write(self.journal_file, tail, fsync=self.fsync)
+        self._journal_size = len(tail)
+    
+    def _prune_caches(self, data):
+        """Elimina de las cachés persistidas las entradas caducadas"""
+        now = time.time()
+        for name, entries in data.get("caches", {}).items():
+            data["caches"][name] = {key: entry for key, entry in entries.items() if entry[1] > now}
+    
+    def _cold_records(self):
+        """
+        Registros anteriores a la ventana caliente, que la compactación archiva.
+        
+        Returns:
+            tuple: (época de corte, lista de tuplas (ID, registro))
+        """
+        if self.hot_days is None:
+            return None, []
+        cutoff = segments.period_start(date.today() - timedelta(days=self.hot_days), self.segment_period)
+        cutoff = to_epoch(cutoff.isoformat())
+        # El índice de recencia está ordenado, así que los registros fríos son un prefijo
+        end = bisect_left(self._recency, (cutoff,))
+        tweets = self._data["processed_tweets"]
+        return cutoff, [(tweet_id, tweets[tweet_id]) for _, tweet_id in self._recency[:end]]
+    
+    def _archive_cold_records(self, document, cold):
+        """
+        Mueve a segmentos comprimidos los registros fríos y los quita de la copia
+        que se va a guardar como instantánea. Los segmentos se escriben antes que
+        la instantánea: si el proceso cae entre ambos pasos, los registros siguen
+        en el documento y se vuelven a archivar (iter_segment descarta los duplicados).
+        """
+        if not cold:
+            return
+        groups = {}
+        for tweet_id, record in cold:
+            key = segments.segment_key(record.processed_at_iso, self.segment_period)
+            groups.setdefault(key, []).append((str(tweet_id), record.to_dict()))
+        for key, records in groups.items():
+            path = segments.segment_path(self.archive_dir, self.segment_prefix, key, self.archive_format)
+            segments.write_segment(path, records, fsync=self.fsync)
+        
+        for tweet_id, _ in cold:
+            del document["processed_tweets"][tweet_id]
+        logger.info(f"📦 Archivados {len(cold)} tweets en {len(groups)} segmentos comprimidos")
+    
+    def _drop_archived(self, data, cutoff, cold):
+        """Quita del documento residente los registros ya archivados (salvo los reemplazados durante la compactación)"""
+        if not cold:
+            return
+        tweets = data["processed_tweets"]
+        # Los IDs se quedan en el índice para que los tweets archivados no se reprocesen
+        for tweet_id, record in cold:
+            if tweets.get(tweet_id) is record:
+                del tweets[tweet_id]
+        # Un registro reemplazado sale del prefijo frío del índice de recencia al reemplazarse
+        del self._recency[:bisect_left(self._recency, (cutoff,))]
+    
+    def _account_expired_segments(self, data):
+        """
+        Registra en el documento los contadores de los segmentos que superan la
+        retención, para que verify() siga cuadrando cuando se eliminen.
+        
+        Returns:
+            list: Tuplas (clave, ruta) de los segmentos a eliminar
+        """
+        if self.retention_days is None:
+            return []
+        expired = segments.expired_segments(self.archive_dir, self.segment_prefix, self.retention_days)
+        accounted = data.setdefault("expired_segments", [])
+        expired_stats = data.setdefault("expired_stats", {})
+        for key, path in expired:
+            # Un segmento ya contabilizado puede seguir en disco si el proceso cayó antes de borrarlo
+            if key in accounted:
+                continue
+            stats_engine.apply_deltas(expired_stats, segments.expired_deltas(path))
+            accounted.append(key)
+        if expired:
+            logger.info(f"🗑️ Eliminando {len(expired)} segmentos archivados fuera de la retención")
+        return expired
     
-    def _save_db(self, data):
-        """Guarda los datos en la base de datos"""
-        with open(self.db_file, 'w') as f:
-            json.dump(data, f, indent=2)
+    def archive(self):
+        """Archiva los registros fríos y aplica la retención (se hace al compactar)"""
+        self.compact()
+    
+    def iter_archived(self, since=None, until=None):
+        """
+        Recorre en streaming los tweets archivados, segmento a segmento.
+        
+        Args:
+            since: Fecha ISO mínima de procesamiento (opcional)
+            until: Fecha ISO máxima de procesamiento, excluida (opcional)
+        
+        Yields:
+            dict: Detalles del tweet, con su ID en "id"
+        """
+        for tweet_id, record in segments.iter_segments(self.archive_dir, self.segment_prefix, since, until):
+            yield {"id": tweet_id, **record}
+    
+    def close(self):
+        """Vuelca los cambios pendientes, espera a la compactación en curso y libera el cerrojo"""
+        self.flush()
+        compactor = self._compactor
+        if compactor is not None and compactor is not threading.current_thread():
+            compactor.join()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self._file_lock is not None:
+                self._file_lock.release()
+                self._file_lock = None
     
     def is_tweet_processed(self, tweet_id):
         """
@@ -75,12 +768,27 @@ class Database:
         
         Args:
             tweet_id: ID del tweet a verificar
-            
+        
         Returns:
             bool: True si ya fue procesado, False en caso contrario
         """
-        db = self._load_db()
-        return str(tweet_id) in db["processed_tweets"]
+        with self._lock:
+            self._load_db()
+            return tweet_id in self._ids
+    
+    def filter_unprocessed(self, tweet_ids):
+        """
+        Filtra en una sola pasada los IDs que todavía no han sido procesados.
+        
+        Args:
+            tweet_ids: Lista de IDs de tweets (por ejemplo, una página de búsqueda)
+            
+        Returns:
+            list: IDs no procesados, en el orden original y sin repetidos
+        """
+        with self._lock:
+            self._load_db()
+            return self._ids.filter_unprocessed(tweet_ids)
     
     def mark_tweet_processed(self, tweet_id, responded=False, tweet_text=None, response_text=None, author_username=None, sentiment_data=None):
         """
@@ -94,13 +802,8 @@ class Database:
             author_username: Nombre de usuario del autor del tweet
             sentiment_data: Datos de análisis de sentimiento (opcional)
         """
-        db = self._load_db()
-        
-        # Comprobar si el tweet ya fue procesado
-        tweet_already_processed = str(tweet_id) in db["processed_tweets"]
-        
         # Registrar el tweet con su contenido y respuesta
-        db["processed_tweets"][str(tweet_id)] = {
+        record = {
             "processed_at": datetime.now().isoformat(),
             "responded": responded,
             "author_username": author_username,
@@ -110,26 +813,78 @@ class Database:
         
         # Agregar datos de sentimiento si están disponibles
         if sentiment_data:
-            db["processed_tweets"][str(tweet_id)]["sentiment"] = sentiment_data
-        
-        # Actualizar estadísticas sólo si es un tweet nuevo
-        if not tweet_already_processed:
-            db["stats"]["total_processed"] += 1
-        
-        # Si tiene una respuesta generada, contar como respondido para estadísticas
-        if response_text:
-            # Comprobar si ya tenía una respuesta generada
-            old_response = False
-            if tweet_already_processed:
-                old_response = db["processed_tweets"][str(tweet_id)].get("response_text") is not None
-            
-            # Solo incrementar el contador si es nuevo o no tenía respuesta antes
-            if not tweet_already_processed or not old_response:
-                db["stats"]["total_responded"] += 1
+            record["sentiment"] = sentiment_data
         
-        self._save_db(db)
+        self._append({"op": "tweet", "id": str(tweet_id), "record": record})
         logger.info(f"✅ Tweet {tweet_id} de @{author_username} guardado en la base de datos")
     
+    def mark_tweets_processed_bulk(self, records):
+        """
+        Marca varios tweets como procesados con una sola confirmación.
+        
+        Args:
+            records: Lista de diccionarios con los argumentos de mark_tweet_processed
+        """
+        with self.batch():
+            for record in records:
+                self.mark_tweet_processed(**record)
+    
+    def get_cache_entries(self, name):
+        """
+        Obtiene las entradas vigentes de una caché persistida (por ejemplo,
+        la de nombres de usuario de TwitterService).
+        
+        Args:
+            name: Nombre de la caché
+        
+        Returns:
+            dict: {clave: (valor, hora de caducidad en segundos desde la época)}
+        """
+        now = time.time()
+        with self._lock:
+            db = self._load_db()
+            entries = db.get("caches", {}).get(name, {})
+            return {key: tuple(entry) for key, entry in entries.items() if entry[1] > now}
+    
+    def put_cache_entries(self, name, entries):
+        """
+        Guarda entradas en una caché persistida. Las caducadas se eliminan al compactar.
+        
+        Args:
+            name: Nombre de la caché
+            entries: Diccionario {clave: (valor, hora de caducidad)}
+        """
+        if not entries:
+            return
+        self._append({
+            "op": "cache",
+            "name": name,
+            "entries": {str(key): list(entry) for key, entry in entries.items()}
+        })
+    
+    def get_state(self, key, default=None):
+        """
+        Obtiene un valor de estado persistido (por ejemplo, el último tweet
+        leído de cada búsqueda).
+        
+        Args:
+            key: Clave del valor
+            default: Valor si la clave no existe
+        """
+        with self._lock:
+            db = self._load_db()
+            return db.get("state", {}).get(key, default)
+    
+    def set_state(self, key, value):
+        """
+        Guarda un valor de estado persistido.
+        
+        Args:
+            key: Clave del valor
+            value: Valor serializable en JSON
+        """
+        self._append({"op": "state", "key": key, "value": value})
+    
     def record_rate_limit(self, wait_seconds, endpoint=None):
         """
         Registra información sobre un rate limit encontrado.
@@ -138,48 +893,215 @@ class Database:
             wait_seconds: Tiempo de espera en segundos
             endpoint: Endpoint de la API que generó el rate limit (opcional)
         """
-        db = self._load_db()
+        self._append({
+            "op": "rate_limit",
+            "event": {
+                "timestamp": datetime.now().isoformat(),
+                "wait_seconds": wait_seconds,
+                "endpoint": endpoint
+            }
+        })
+        logger.info(f"📊 Rate limit registrado: {wait_seconds} segundos")
+    
+    def get_rate_limit_info(self):
+        """
+        Obtiene información sobre los rate limits.
         
-        # Asegurarse de que la sección de rate_limits existe
-        if "rate_limits" not in db:
-            db["rate_limits"] = {
+        Returns:
+            dict: Información de rate limits
+        """
+        with self._lock:
+            db = self._load_db()
+            return db.get("rate_limits", {
                 "last_encounter": None,
                 "wait_seconds": 0,
                 "history": []
-            }
+            })
+    
+    def _serialize(self, data):
+        """Convierte el documento residente al formato almacenado"""
+        document = dict(data)
+        document["processed_tweets"] = {
+            str(tweet_id): record.to_dict() for tweet_id, record in data["processed_tweets"].items()
+        }
+        return document
+    
+    def export(self):
+        """
+        Devuelve el documento completo (instantánea más journal) en el formato
+        almacenado.
         
-        # Actualizar información del último rate limit
-        current_time = datetime.now().isoformat()
-        db["rate_limits"]["last_encounter"] = current_time
-        db["rate_limits"]["wait_seconds"] = wait_seconds
+        Returns:
+            dict: Documento de la base de datos
+        """
+        with self._lock:
+            return self._serialize(self._load_db())
+    
+    def _read_journal_ops(self):
+        """Lee las operaciones completas del journal, para las lecturas en streaming"""
+        ops = []
+        try:
+            f = open(self.journal_file, 'rb')
+        except FileNotFoundError:
+            return ops
+        with f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                line = raw.strip()
+                if not line:
+                    continue
+                try:
+                    ops.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return ops
+    
+    @contextmanager
+    def _streaming_snapshot(self):
+        """
+        Abre la instantánea para leerla en streaming junto con las operaciones
+        del journal que le corresponden. Igual que al cargarla, si un escritor
+        la reemplaza mientras se lee el journal, se vuelve a intentar.
         
-        # Agregar a historial (limitado a los últimos 10 eventos)
-        db["rate_limits"]["history"].append({
-            "timestamp": current_time,
-            "wait_seconds": wait_seconds,
-            "endpoint": endpoint
-        })
+        Yields:
+            tuple: (archivo de la instantánea o None si no existe, operaciones del journal)
+        """
+        for attempt in range(SNAPSHOT_RETRIES):
+            try:
+                f = open(self.db_file, 'r')
+            except FileNotFoundError:
+                f = None
+            snapshot_id = self._file_id(os.fstat(f.fileno())) if f else None
+            ops = self._read_journal_ops()
+            if self._current_snapshot_id() == snapshot_id or attempt == SNAPSHOT_RETRIES - 1:
+                break
+            if f:
+                f.close()
+        try:
+            yield f, ops
+        finally:
+            if f:
+                f.close()
+    
+    def iter_records(self, fields=None, since=None, until=None, responded=None):
+        """
+        Recorre los tweets procesados en streaming: primero los archivados y
+        después los del documento, con la última versión de cada tweet. Si el
+        documento no está residente, la instantánea se lee de forma incremental
+        y nunca se carga entera.
         
-        # Mantener historial limitado a 10 eventos
-        if len(db["rate_limits"]["history"]) > 10:
-            db["rate_limits"]["history"] = db["rate_limits"]["history"][-10:]
+        Args:
+            fields: Campos a incluir en cada tweet (None para todos)
+            since: Fecha ISO mínima de procesamiento (opcional)
+            until: Fecha ISO máxima de procesamiento, excluida (opcional)
+            responded: Si no es None, solo los tweets con ese valor de "responded"
         
-        self._save_db(db)
-        logger.info(f"📊 Rate limit registrado: {wait_seconds} segundos")
+        Yields:
+            dict: Detalles del tweet, con su ID en "id"
+        """
+        for tweet_id, details in segments.iter_segments(self.archive_dir, self.segment_prefix, since, until):
+            if record_matches(details, since, until, responded):
+                yield project_record(tweet_id, details, fields)
+        
+        for tweet_id, details in self._iter_hot_records():
+            if record_matches(details, since, until, responded):
+                yield project_record(tweet_id, details, fields)
     
-    def get_rate_limit_info(self):
+    def _iter_hot_records(self):
         """
-        Obtiene información sobre los rate limits.
+        Recorre los tweets del documento (no archivados) en el formato
+        almacenado: los del documento residente o, si no está cargado, los de
+        la instantánea leída en streaming con los del journal encima.
+        
+        Yields:
+            tuple: (ID del tweet, detalles)
+        """
+        with self._lock:
+            records = None if self._data is None else list(self._data["processed_tweets"].values())
+        if records is not None:
+            for record in records:
+                yield record.tweet_id, record.to_dict()
+            return
+        
+        with self._streaming_snapshot() as (f, ops):
+            # Los tweets del journal sustituyen a su versión de la instantánea
+            overrides = {}
+            for op in ops:
+                if op.get("op") == "tweet":
+                    overrides.pop(op["id"], None)
+                    overrides[op["id"]] = op["record"]
+            
+            if f is not None:
+                for key, tweet_id, details in iter_document(f):
+                    if key == "processed_tweets" and tweet_id not in overrides:
+                        yield tweet_id, details
+            
+            yield from overrides.items()
+    
+    def _read_stored_stats(self):
+        """
+        Lee en streaming las estadísticas almacenadas (instantánea más journal)
+        sin cargar los registros: solo se conservan los que el journal
+        reemplaza, para poder restar su versión anterior.
         
         Returns:
-            dict: Información de rate limits
+            tuple: (estadísticas, contadores de los segmentos caducados)
         """
-        db = self._load_db()
-        return db.get("rate_limits", {
-            "last_encounter": None,
-            "wait_seconds": 0,
-            "history": []
-        })
+        with self._streaming_snapshot() as (f, ops):
+            touched = {op["id"] for op in ops if op.get("op") == "tweet"}
+            document = self._empty_db()
+            previous = {}
+            if f is not None:
+                for key, tweet_id, value in iter_document(f):
+                    if key != "processed_tweets":
+                        document[key] = value
+                    elif tweet_id in touched:
+                        previous[tweet_id] = value
+            
+            journal_seq = document.get("journal_seq", 0)
+            ops = [op for op in ops if op.get("seq", 0) > journal_seq]
+            if _is_legacy_stats(document["stats"]) and not any(op["op"] == "stats" for op in ops):
+                # Igual que _migrate_stats al cargar: se calculan con los registros finales
+                return self._compute_legacy_stats(f, ops, document), document.get("expired_stats", {})
+        
+        stats = document["stats"]
+        for op in ops:
+            if op["op"] == "tweet":
+                deltas = stats_engine.record_deltas(op["record"])
+                if op["id"] in previous:
+                    deltas = stats_engine.record_deltas(previous[op["id"]], -1) + deltas
+                previous[op["id"]] = op["record"]
+                stats_engine.apply_deltas(stats, deltas)
+            elif op["op"] == "rate_limit":
+                stats_engine.apply_deltas(stats, stats_engine.rate_limit_deltas(op["event"].get("endpoint")))
+            elif op["op"] == "stats":
+                stats = op["stats"]
+        return stats, document.get("expired_stats", {})
+    
+    def _compute_legacy_stats(self, f, ops, document):
+        """
+        Calcula en streaming, como _migrate_stats, las estadísticas de una
+        instantánea anterior a los contadores detallados: una segunda pasada
+        por la instantánea ya abierta con la última versión de cada tweet.
+        """
+        overrides = {}
+        history = list(document.get("rate_limits", {}).get("history", []))
+        for op in ops:
+            if op["op"] == "tweet":
+                overrides[op["id"]] = op["record"]
+            elif op["op"] == "rate_limit":
+                history.append(op["event"])
+        
+        def records():
+            if f is not None:
+                f.seek(0)
+                for key, tweet_id, details in iter_document(f):
+                    if key == "processed_tweets" and tweet_id not in overrides:
+                        yield details
+            yield from overrides.values()
+        
+        return stats_engine.compute_stats(records(), _rate_limit_counts(history[-RATE_LIMIT_HISTORY_SIZE:]))
     
     def get_tweet_details(self, tweet_id):
         """
@@ -187,48 +1109,164 @@ class Database:
         
         Args:
             tweet_id: ID del tweet
-            
+        
         Returns:
-            dict: Detalles del tweet o None si no existe
+            dict: Detalles del tweet o None si no existe o ya está archivado
         """
-        db = self._load_db()
-        tweet_id_str = str(tweet_id)
-        
-        if tweet_id_str in db["processed_tweets"]:
-            return db["processed_tweets"][tweet_id_str]
-        return None
-        
+        with self._lock:
+            db = self._load_db()
+            record = db["processed_tweets"].get(int(tweet_id))
+            return record.to_dict() if record else None
+    
     def get_stats(self):
         """
-        Obtiene estadísticas de tweets procesados.
+        Obtiene estadísticas de tweets procesados: totales, desglose por estado
+        (ignored/generated/posted), contadores por hora y por día y rate limits
+        por endpoint. Los contadores por autor se consultan con get_author_stats.
+        Si el documento no está residente, se leen en streaming sin cargarlo.
         
         Returns:
             dict: Estadísticas actuales
         """
-        db = self._load_db()
-        return db.get("stats", {"total_processed": 0, "total_responded": 0})
+        with self._lock:
+            if self._data is None:
+                stats, _ = self._read_stored_stats()
+            else:
+                stats = self._data["stats"]
+            return {key: value for key, value in stats.items() if key != "by_author"}
+    
+    def get_author_stats(self, author_username):
+        """
+        Obtiene los contadores de un autor.
+        
+        Args:
+            author_username: Nombre de usuario del autor
         
-    def get_last_processed_tweets(self, limit=10):
+        Returns:
+            dict: Contadores por estado ("processed", "ignored", "generated", "posted")
+        """
+        with self._lock:
+            db = self._load_db()
+            return dict(db["stats"]["by_author"].get(author_username, {}))
+    
+    def _compute_stats(self, db, rate_limits_by_endpoint=None):
+        """Recalcula las estadísticas a partir de los registros archivados, los del documento y los caducados"""
+        records = itertools.chain(
+            (record for _, record in segments.iter_segments(self.archive_dir, self.segment_prefix)),
+            db["processed_tweets"].values()
+        )
+        computed = stats_engine.compute_stats(records, rate_limits_by_endpoint)
+        stats_engine.merge_stats(computed, db.get("expired_stats", {}))
+        return computed
+    
+    def verify(self):
+        """
+        Recalcula las estadísticas recorriendo los registros y las compara
+        con las almacenadas. Si el documento no está residente, tanto los
+        registros como las estadísticas se leen en streaming.
+        
+        Returns:
+            dict: {clave: (valor almacenado, valor calculado)} para cada diferencia
+        """
+        with self._lock:
+            if self._data is not None:
+                return stats_engine.diff_stats(self._data["stats"], self._compute_stats(self._data))
+            stored, expired_stats = self._read_stored_stats()
+        computed = stats_engine.compute_stats(self.iter_records())
+        stats_engine.merge_stats(computed, expired_stats)
+        return stats_engine.diff_stats(stored, computed)
+    
+    def rebuild(self):
+        """
+        Reemplaza las estadísticas almacenadas por las recalculadas a partir
+        de los registros. Los contadores de rate limits se conservan.
+        
+        Returns:
+            dict: Diferencias corregidas, con el mismo formato que verify()
         """
-        Obtiene los últimos tweets procesados.
+        with self._lock:
+            db = self._load_db()
+            stored = db["stats"]
+            computed = self._compute_stats(db, stored.get("rate_limits_by_endpoint"))
+            differences = stats_engine.diff_stats(stored, computed)
+            if differences:
+                self._append({"op": "stats", "stats": computed})
+                logger.info(f"📊 Estadísticas reconstruidas ({len(differences)} contadores corregidos)")
+            return differences
+    
+    def get_last_processed_tweets(self, limit=10, before=None):
+        """
+        Obtiene los últimos tweets procesados usando el índice de recencia
+        (un lector sin el documento cargado los selecciona en streaming).
+        Solo consulta los registros calientes; los archivados se recorren con
+        iter_archived().
         
         Args:
             limit: Número máximo de tweets a retornar
-            
+            before: Cursor opcional (processed_at del último tweet de la página
+                anterior) para obtener tweets más antiguos
+        
         Returns:
             list: Lista de los últimos tweets procesados con sus detalles
         """
-        db = self._load_db()
-        tweets = db.get("processed_tweets", {})
+        with self._lock:
+            if self._data is not None or not self.read_only:
+                db = self._load_db()
+                tweets = db["processed_tweets"]
+                
+                end = len(self._recency) if before is None else bisect_left(self._recency, (to_epoch(before),))
+                page = self._recency[max(end - limit, 0):end]
+                
+                # Convertir a lista (descendente) y agregar ID como propiedad
+                return [{"id": str(tweet_id), **tweets[tweet_id].to_dict()} for _, tweet_id in reversed(page)]
         
-        # Convertir a lista y agregar ID como propiedad
-        tweet_list = [
-            {"id": tweet_id, **details} 
-            for tweet_id, details in tweets.items()
-        ]
-        
-        # Ordenar por fecha de procesamiento (descendente)
-        tweet_list.sort(key=lambda x: x.get("processed_at", ""), reverse=True)
-        
-        # Retornar solo los más recientes según el límite
-        return tweet_list[:limit]
\ No newline at end of file
+        # Lector sin el documento cargado (dashboard, view_tweets): recorrer la
+        # instantánea en streaming quedándose solo con los `limit` más recientes
+        records = (ProcessedTweet.from_dict(tweet_id, details) for tweet_id, details in self._iter_hot_records())
+        if before is not None:
+            end = (to_epoch(before),)
+            records = (record for record in records if record.sort_key < end)
+        newest = heapq.nlargest(limit, records, key=lambda record: record.sort_key)
+        return [{"id": str(record.tweet_id), **record.to_dict()} for record in newest]
+
+
+def open_database(backend=None, db_file=None, read_only=False, **options):
+    """
+    Crea la base de datos con el backend indicado.
+    
+    Args:
+        backend: "json" o "sqlite". Si es None se deduce de la extensión de
+            `db_file` o, sin él, se usa DB_BACKEND (entorno o .env, como el bot);
+            si tampoco está definido, SQLite cuando ya existe su archivo y JSON
+            en caso contrario (útil para el dashboard y los scripts)
+        db_file: Ruta opcional al archivo de la base de datos
+        read_only: Si es True, abre la base de datos como lector (dashboard y
+            scripts de consulta), sin interferir con las escrituras del bot
+        **options: Opciones de archivado (hot_days, retention_days, archive_format,
+            segment_period) para el constructor del backend
+    
+    Returns:
+        Database o SQLiteDatabase
+    """
+    if backend is None:
+        if db_file:
+            backend = "sqlite" if db_file.endswith(".db") else "json"
+        else:
+            # Se lee del entorno y no de config.settings, que exige las
+            # credenciales de las APIs y los scripts de consulta no las necesitan
+            load_dotenv()
+            backend = os.getenv("DB_BACKEND") or (
+                "sqlite" if os.path.exists(DEFAULT_SQLITE_FILE) else "json"
+            )
+    
+    if backend == "json":
+        return Database(db_file or DEFAULT_JSON_FILE, read_only=read_only, **options)
+    
+    if backend == "sqlite":
+        db = SQLiteDatabase(db_file or DEFAULT_SQLITE_FILE, read_only=read_only, **options)
+        # Importar una única vez el historial del backend JSON
+        if not read_only and db.is_empty() and os.path.exists(DEFAULT_JSON_FILE):
+            db.import_json(DEFAULT_JSON_FILE)
+        return db
+    
+    raise ValueError(f"❌ ERROR: Backend de base de datos desconocido: {backend}")
@@ -0,0 +1,96 @@
+import os
+import time
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+logger = logging.getLogger("crypto_bot.database")
+
+
+class FileLock:
+    """
+    Cerrojo exclusivo entre procesos basado en un archivo (fcntl.flock en
+    POSIX, msvcrt.locking en Windows). El sistema operativo lo libera si el
+    proceso que lo tiene termina, por lo que nunca queda un cerrojo huérfano.
+    El archivo guarda el PID del propietario para los mensajes de error.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Ruta del archivo de cerrojo
+        """
+        self.path = path
+        self._file = None
+
+    def _try_lock(self):
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            return True
+        if msvcrt is not None:
+            try:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+            except OSError:
+                return False
+            return True
+        logger.warning("⚠️ Cerrojos de archivo no disponibles en esta plataforma; no se protege el acceso concurrente")
+        return True
+
+    def owner(self):
+        """PID del proceso que tiene el cerrojo, si se conoce"""
+        try:
+            with open(self.path, 'r') as f:
+                return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+    def acquire(self, timeout=None):
+        """
+        Adquiere el cerrojo, esperando como máximo `timeout` segundos.
+
+        Args:
+            timeout: Segundos de espera (None para esperar indefinidamente)
+
+        Returns:
+            bool: True si se adquirió el cerrojo
+        """
+        if self._file is not None:
+            return True
+        self._file = open(self.path, 'a+')
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._try_lock():
+            if deadline is not None and time.monotonic() >= deadline:
+                self._file.close()
+                self._file = None
+                return False
+            time.sleep(0.1)
+
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(str(os.getpid()))
+        self._file.flush()
+        return True
+
+    def release(self):
+        """Libera el cerrojo"""
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        elif msvcrt is not None:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
@@ -0,0 +1,211 @@
+import sys
+import math
+import heapq
+import struct
+from array import array
+from bisect import bisect_left
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix64(value):
+    """Mezcla un entero de 64 bits (splitmix64) para obtener un hash bien distribuido"""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+def _to_little_endian(values):
+    """Devuelve los bytes de un array en orden little-endian, independientemente de la plataforma"""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom para IDs enteros. Permite descartar en O(k) los IDs que
+    seguro no están en el índice sin consultar la estructura exacta.
+    """
+
+    _HEADER = struct.Struct("<4sQQQQ")
+    _MAGIC = b"TWBF"
+
+    def __init__(self, capacity, error_rate=0.01):
+        """
+        Args:
+            capacity: Número de elementos esperados
+            error_rate: Tasa de falsos positivos deseada
+        """
+        capacity = max(int(capacity), 1)
+        self.num_bits = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.num_bits / capacity * math.log(2))), 1)
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, value):
+        h1 = _mix64(value)
+        h2 = _mix64(h1) | 1
+        for i in range(self.num_hashes):
+            yield ((h1 + i * h2) & _MASK64) % self.num_bits
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+    def to_bytes(self, seq):
+        """
+        Serializa el filtro junto con el número de secuencia del journal que cubre.
+
+        Args:
+            seq: Último número de secuencia incluido en el filtro
+        """
+        return self._HEADER.pack(self._MAGIC, seq, self.num_bits, self.num_hashes, self.count) + bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Reconstruye un filtro serializado con to_bytes.
+
+        Returns:
+            tuple: (filtro, número de secuencia del journal que cubre)
+        """
+        magic, seq, num_bits, num_hashes, count = cls._HEADER.unpack_from(data)
+        if magic != cls._MAGIC:
+            raise ValueError("Formato de filtro de Bloom no reconocido")
+        bloom = cls.__new__(cls)
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.count = count
+        bloom._bits = bytearray(data[cls._HEADER.size:])
+        return bloom, seq
+
+
+class IdIndex:
+    """
+    Índice compacto de IDs de tweets procesados.
+
+    Los IDs persistidos se guardan en un array ordenado de enteros sin signo
+    de 64 bits (8 bytes por ID) y se consultan por búsqueda binaria; los IDs
+    añadidos desde la última persistencia viven en un set pequeño. Un filtro
+    de Bloom opcional descarta los IDs nuevos sin tocar ninguna de las dos
+    estructuras.
+    """
+
+    _HEADER = struct.Struct("<4sQQ")
+    _MAGIC = b"TWID"
+
+    def __init__(self, ids=(), bloom=None):
+        """
+        Args:
+            ids: IDs iniciales (enteros o cadenas numéricas)
+            bloom: Filtro de Bloom opcional que ya contiene esos IDs
+        """
+        self._sorted = array("Q", sorted({int(i) for i in ids}))
+        self._recent = set()
+        self.bloom = bloom
+
+    def __len__(self):
+        return len(self._sorted) + len(self._recent)
+
+    def __iter__(self):
+        self.compact()
+        return iter(self._sorted)
+
+    def __contains__(self, tweet_id):
+        tweet_id = int(tweet_id)
+        if self.bloom is not None and tweet_id not in self.bloom:
+            return False
+        if tweet_id in self._recent:
+            return True
+        pos = bisect_left(self._sorted, tweet_id)
+        return pos < len(self._sorted) and self._sorted[pos] == tweet_id
+
+    def add(self, tweet_id):
+        tweet_id = int(tweet_id)
+        if tweet_id in self:
+            return
+        self._recent.add(tweet_id)
+        if self.bloom is not None:
+            self.bloom.add(tweet_id)
+
+    def filter_unprocessed(self, tweet_ids):
+        """
+        Devuelve, en el orden original y sin repetidos, los IDs que no están en el índice.
+
+        Args:
+            tweet_ids: Iterable de IDs (enteros o cadenas numéricas)
+
+        Returns:
+            list: IDs no procesados, con el mismo tipo con el que se recibieron
+        """
+        seen = set()
+        unprocessed = []
+        for tweet_id in tweet_ids:
+            key = int(tweet_id)
+            if key in seen:
+                continue
+            seen.add(key)
+            if key not in self:
+                unprocessed.append(tweet_id)
+        return unprocessed
+
+    def compact(self):
+        """Fusiona los IDs recientes en el array ordenado"""
+        if self._recent:
+            self._sorted = array("Q", heapq.merge(self._sorted, sorted(self._recent)))
+            self._recent = set()
+
+    def copy(self):
+        """
+        Copia del índice, sin filtro de Bloom, para serializarla sin bloquear
+        al índice original (el array ordenado nunca se modifica en su sitio,
+        así que se comparte).
+        """
+        index = IdIndex()
+        index._sorted = self._sorted
+        index._recent = set(self._recent)
+        return index
+
+    def build_bloom(self, error_rate=0.01):
+        """Crea un filtro de Bloom con holgura para el doble de los IDs actuales"""
+        self.compact()
+        bloom = BloomFilter(max(2 * len(self), 100000), error_rate)
+        for tweet_id in self._sorted:
+            bloom.add(tweet_id)
+        self.bloom = bloom
+        return bloom
+
+    def to_bytes(self, seq):
+        """
+        Serializa el índice junto con el número de secuencia del journal que cubre.
+
+        Args:
+            seq: Último número de secuencia incluido en el índice
+        """
+        self.compact()
+        return self._HEADER.pack(self._MAGIC, seq, len(self._sorted)) + _to_little_endian(self._sorted)
+
+    @classmethod
+    def from_bytes(cls, data, bloom=None):
+        """
+        Reconstruye un índice serializado con to_bytes.
+
+        Returns:
+            tuple: (índice, número de secuencia del journal que cubre)
+        """
+        magic, seq, count = cls._HEADER.unpack_from(data)
+        if magic != cls._MAGIC:
+            raise ValueError("Formato de índice de IDs no reconocido")
+        index = cls(bloom=bloom)
+        index._sorted.frombytes(data[cls._HEADER.size:cls._HEADER.size + 8 * count])
+        if sys.byteorder == "big":
+            index._sorted.byteswap()
+        return index, seq
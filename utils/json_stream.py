@@ -0,0 +1,103 @@
+import json
+
+_WHITESPACE = " \t\n\r"
+
+
+class _Reader:
+    """Lee valores JSON de un archivo por bloques, sin cargarlo entero"""
+
+    def __init__(self, f, chunk_size):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Descarta lo ya consumido y añade un bloque al buffer; False al final del archivo"""
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Siguiente carácter significativo ("" al final del archivo)"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON inválido: se esperaba '{char}' y se encontró '{found}'")
+        self._pos += 1
+
+    def value(self):
+        """Decodifica el siguiente valor completo"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # El valor puede continuar en el siguiente bloque
+                if not self._fill():
+                    raise
+                continue
+            # Un número que termina justo al final del buffer puede estar cortado
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def keys(self):
+        """
+        Recorre las claves de un objeto cuya llave de apertura ya se consumió.
+        Quien lo usa debe leer el valor de cada clave antes de pedir la siguiente.
+        """
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            separator = self.peek()
+            self._pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"JSON inválido: se esperaba ',' o '}}' y se encontró '{separator}'")
+
+
+def iter_document(f, stream_keys=("processed_tweets",), chunk_size=1 << 16):
+    """
+    Recorre un documento JSON (un objeto) de forma incremental. Las claves de
+    `stream_keys` se recorren entrada a entrada, de modo que la memoria usada
+    depende del tamaño de cada entrada y no del documento.
+
+    Args:
+        f: Archivo de texto abierto
+        stream_keys: Claves de primer nivel cuyo objeto se recorre por entradas
+        chunk_size: Caracteres leídos en cada bloque
+
+    Yields:
+        tuple: (clave, subclave, valor) para cada entrada de las claves de
+            `stream_keys` y (clave, None, valor) para el resto de claves
+    """
+    reader = _Reader(f, chunk_size)
+    reader.expect("{")
+    for key in reader.keys():
+        if key in stream_keys:
+            reader.expect("{")
+            for subkey in reader.keys():
+                yield key, subkey, reader.value()
+        else:
+            yield key, None, reader.value()
@@ -0,0 +1,84 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Caché LRU con caducidad por entrada.
+
+    Las entradas caducan `ttl` segundos después de guardarse (hora del
+    sistema, para que la caducidad siga siendo válida tras un reinicio si la
+    caché se persiste) y, al superar `maxsize`, se descarta la usada hace
+    más tiempo. Es segura entre hilos.
+    """
+
+    def __init__(self, maxsize=10000, ttl=24 * 3600, clock=time.time):
+        """
+        Args:
+            maxsize: Número máximo de entradas
+            ttl: Segundos de validez de cada entrada
+            clock: Función que devuelve la hora actual en segundos
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > self._clock()
+
+    def get(self, key, default=None):
+        """Devuelve el valor de una entrada vigente, marcándola como usada"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[1] <= self._clock():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, expires_at=None):
+        """
+        Guarda una entrada.
+
+        Args:
+            key: Clave
+            value: Valor
+            expires_at: Hora de caducidad (por defecto, ahora más `ttl`)
+
+        Returns:
+            float: Hora de caducidad de la entrada
+        """
+        if expires_at is None:
+            expires_at = self._clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return expires_at
+
+    def load(self, entries):
+        """
+        Carga entradas persistidas, descartando las caducadas.
+
+        Args:
+            entries: Diccionario {clave: (valor, hora de caducidad)}
+        """
+        now = self._clock()
+        for key, (value, expires_at) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if expires_at > now:
+                self.set(key, value, expires_at)
@@ -0,0 +1,129 @@
+import time
+import hashlib
+from collections import OrderedDict
+from utils.text import normalize_tweet
+
+SIMHASH_BITS = 64
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text):
+    """
+    Firma SimHash de 64 bits del texto normalizado de un tweet (sin menciones,
+    enlaces ni cashtags). Las características son las palabras y los pares de
+    palabras consecutivas, de modo que textos casi iguales dan firmas a poca
+    distancia de Hamming.
+    """
+    words = normalize_tweet(text).split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        return 0
+    hashes = [_feature_hash(feature) for feature in set(features)]
+    # Un bit de la firma vale 1 si más de la mitad de las características lo
+    # tienen a 1. Se cuentan por columnas sobre los hashes en binario, bastante
+    # más rápido que recorrer los 64 bits de cada hash con máscaras
+    half = len(hashes) / 2
+    columns = zip(*[f"{h:064b}" for h in hashes])
+    return int("".join("1" if "".join(column).count("1") > half else "0" for column in columns), 2)
+
+
+class NearDuplicateIndex:
+    """
+    Índice de tweets casi duplicados con LSH por bandas sobre firmas SimHash.
+
+    La firma se divide en `bands` bandas; dos firmas a distancia de Hamming
+    menor que `bands` coinciden por fuerza en al menos una banda, así que
+    solo se comparan las entradas que comparten cubo con la consulta.
+
+    Las entradas caducan al salir de la ventana de `window` segundos y, por
+    encima de `maxsize`, se descartan las más antiguas, de modo que la
+    memoria está acotada. No es seguro entre hilos.
+    """
+
+    def __init__(self, max_distance=6, bands=7, window=24 * 3600, maxsize=20000, clock=time.time):
+        """
+        Args:
+            max_distance: Distancia de Hamming máxima para considerar dos tweets casi iguales
+            bands: Bandas de la firma (debe ser mayor que max_distance)
+            window: Segundos que una entrada permanece en el índice
+            maxsize: Número máximo de entradas
+            clock: Función que devuelve la hora actual en segundos
+        """
+        if bands <= max_distance:
+            raise ValueError("❌ ERROR: el número de bandas debe ser mayor que la distancia máxima")
+        self.max_distance = max_distance
+        self.window = window
+        self.maxsize = maxsize
+        self._clock = clock
+        self._band_bits = SIMHASH_BITS // bands
+        self._band_mask = (1 << self._band_bits) - 1
+        self._bands = bands
+        # {clave: (firma, hora de inserción, valor)} en orden de inserción
+        self._entries = OrderedDict()
+        self._buckets = [{} for _ in range(bands)]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _band_values(self, signature):
+        return [(signature >> (band * self._band_bits)) & self._band_mask for band in range(self._bands)]
+
+    def _evict(self):
+        cutoff = self._clock() - self.window
+        while self._entries:
+            key, (signature, inserted_at, _) = next(iter(self._entries.items()))
+            if inserted_at > cutoff and len(self._entries) <= self.maxsize:
+                break
+            self._remove(key, signature)
+
+    def _remove(self, key, signature):
+        del self._entries[key]
+        for bucket, value in zip(self._buckets, self._band_values(signature)):
+            keys = bucket.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del bucket[value]
+
+    def add(self, key, signature, value):
+        """
+        Añade (o reemplaza) una entrada.
+
+        Args:
+            key: Clave de la entrada (por ejemplo, el ID del tweet)
+            signature: Firma SimHash del texto
+            value: Valor asociado (por ejemplo, la relevancia)
+        """
+        if key in self._entries:
+            self._remove(key, self._entries[key][0])
+        self._entries[key] = (signature, self._clock(), value)
+        for bucket, band_value in zip(self._buckets, self._band_values(signature)):
+            bucket.setdefault(band_value, set()).add(key)
+        self._evict()
+
+    def query(self, signature):
+        """
+        Busca la entrada más parecida dentro de la distancia máxima.
+
+        Args:
+            signature: Firma SimHash del texto
+
+        Returns:
+            tuple: (clave, valor, distancia) o None si no hay ninguna
+        """
+        self._evict()
+        best = None
+        seen = set()
+        for bucket, band_value in zip(self._buckets, self._band_values(signature)):
+            for key in bucket.get(band_value, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                candidate, _, value = self._entries[key]
+                distance = bin(candidate ^ signature).count("1")
+                if distance <= self.max_distance and (best is None or distance < best[2]):
+                    best = (key, value, distance)
+        return best
@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger("crypto_bot.rate_limiter")
+
+# Prefijos de las cabeceras de límites de X: ventana de 15 minutos y límites
+# diarios por aplicación y por usuario (cada uno con -limit, -remaining y -reset)
+RATE_LIMIT_HEADERS = ("x-rate-limit", "x-app-limit-24hour", "x-user-limit-24hour")
+
+
+class RateLimitExceeded(Exception):
+    """El presupuesto de un endpoint está agotado durante más tiempo del que se puede esperar"""
+
+    def __init__(self, endpoint, wait_seconds):
+        super().__init__(f"Límite de {endpoint} agotado; se restablece en {wait_seconds:.0f} segundos")
+        self.endpoint = endpoint
+        self.wait_seconds = wait_seconds
+
+
+class TokenBucket:
+    """
+    Presupuesto de llamadas de un endpoint.
+
+    Cada ventana de límite (la de 15 minutos y, si la API la informa, la
+    diaria) es un cubo cuyos tokens son las llamadas restantes. Las cabeceras
+    de cada respuesta fijan los tokens y la hora de recarga; entre respuestas
+    se descuenta un token por llamada, de modo que las llamadas en curso
+    también cuentan. Al llegar la hora de recarga el cubo vuelve a llenarse.
+    """
+
+    def __init__(self, clock=time.time):
+        """
+        Args:
+            clock: Función que devuelve la hora actual en segundos
+        """
+        self._clock = clock
+        # {prefijo de cabecera: [tokens restantes, hora de recarga, capacidad]}
+        self._windows = {}
+
+    def wait_time(self, calls=1):
+        """Segundos hasta que haya `calls` tokens en todas las ventanas (0 si ya los hay)"""
+        now = self._clock()
+        wait = 0.0
+        for window in self._windows.values():
+            remaining, reset_at, limit = window
+            if reset_at is not None and now >= reset_at:
+                # Ventana restablecida: capacidad completa hasta la próxima respuesta
+                window[0], window[1] = limit, None
+            elif remaining < calls and reset_at is not None:
+                wait = max(wait, reset_at - now)
+        return wait
+
+    def take(self):
+        """Descuenta un token de cada ventana"""
+        for window in self._windows.values():
+            window[0] -= 1
+
+    def update(self, headers):
+        """
+        Actualiza las ventanas con las cabeceras de una respuesta.
+
+        Args:
+            headers: Cabeceras de la respuesta HTTP
+        """
+        for prefix in RATE_LIMIT_HEADERS:
+            try:
+                remaining = int(headers[f"{prefix}-remaining"])
+                reset_at = float(headers[f"{prefix}-reset"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            limit = headers.get(f"{prefix}-limit")
+            limit = int(limit) if limit and limit.isdigit() else max(remaining, 1)
+            window = self._windows.get(prefix)
+            # Las respuestas de llamadas concurrentes pueden llegar desordenadas:
+            # dentro de la misma ventana se conserva el menor número de tokens
+            if window and window[1] == reset_at:
+                remaining = min(remaining, window[0])
+            self._windows[prefix] = [remaining, reset_at, limit]
+
+    @property
+    def remaining(self):
+        """Tokens disponibles en la ventana más restrictiva (None si aún no se conocen)"""
+        self.wait_time()
+        return min((window[0] for window in self._windows.values()), default=None)
+
+
+class RateLimiter:
+    """
+    Limitador proactivo con un TokenBucket por endpoint.
+
+    Antes de cada llamada acquire() espera, si hace falta, a que el endpoint
+    tenga presupuesto, y después de cada respuesta update() lo ajusta con las
+    cabeceras x-rate-limit-*. Así las llamadas se hacen tan rápido como
+    permite el límite, sin pausas arbitrarias y sin provocar errores 429.
+    """
+
+    def __init__(self, max_wait=15 * 60, clock=time.time, sleep=time.sleep):
+        """
+        Args:
+            max_wait: Segundos máximos que acquire() espera a que se recargue un endpoint
+            clock: Función que devuelve la hora actual en segundos
+            sleep: Función de espera
+        """
+        self.max_wait = max_wait
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, endpoint):
+        bucket = self._buckets.get(endpoint)
+        if bucket is None:
+            bucket = self._buckets[endpoint] = TokenBucket(self._clock)
+        return bucket
+
+    def acquire(self, endpoint):
+        """
+        Reserva una llamada al endpoint, esperando a que haya presupuesto.
+
+        Args:
+            endpoint: Nombre del endpoint
+
+        Returns:
+            float: Segundos esperados
+
+        Raises:
+            RateLimitExceeded: Si el presupuesto no se recarga antes de `max_wait`
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                bucket = self._bucket(endpoint)
+                wait = bucket.wait_time()
+                if wait <= 0:
+                    bucket.take()
+                    return waited
+            if wait > self.max_wait:
+                raise RateLimitExceeded(endpoint, wait)
+            logger.info(f"⏳ Presupuesto de {endpoint} agotado; esperando {wait:.0f} segundos a que se restablezca")
+            self._sleep(wait)
+            waited += wait
+
+    def update(self, endpoint, headers):
+        """
+        Ajusta el presupuesto del endpoint con las cabeceras de una respuesta.
+
+        Args:
+            endpoint: Nombre del endpoint
+            headers: Cabeceras de la respuesta HTTP
+        """
+        with self._lock:
+            self._bucket(endpoint).update(headers)
+
+    def wait_time(self, endpoint, calls=1):
+        """Segundos hasta que el endpoint tenga presupuesto para `calls` llamadas (0 si ya lo tiene)"""
+        with self._lock:
+            return self._bucket(endpoint).wait_time(calls)
+
+    def remaining(self, endpoint):
+        """Llamadas disponibles del endpoint (None si aún no se conocen)"""
+        with self._lock:
+            return self._bucket(endpoint).remaining
@@ -0,0 +1,201 @@
+import sys
+from datetime import datetime, timedelta
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Clave de orden de los registros sin fecha de procesamiento (van primero)
+MISSING_TIMESTAMP = -(1 << 62)
+
+# Campos con slot propio; cualquier otra clave se conserva en `extras`
+FIELDS = ("processed_at", "responded", "author_username", "tweet_text", "response_text", "sentiment")
+
+
+def to_epoch(iso_date):
+    """
+    Convierte una fecha ISO en microsegundos desde la época, tomando la hora
+    tal cual está escrita (las fechas del bot son locales y sin zona horaria).
+    """
+    dt = datetime.fromisoformat(iso_date)
+    return (dt.replace(tzinfo=None) - _EPOCH) // _MICROSECOND
+
+
+def from_epoch(timestamp):
+    """Convierte microsegundos desde la época en un datetime sin zona horaria"""
+    return _EPOCH + timedelta(microseconds=timestamp)
+
+
+class ProcessedTweet:
+    """
+    Registro compacto de un tweet procesado.
+
+    Usa __slots__ en lugar de un diccionario por registro: el ID es un entero,
+    la fecha de procesamiento se guarda como microsegundos desde la época
+    (ordenar y comparar no requiere analizar cadenas) y los nombres de autor
+    se internan, de modo que todos los tweets de un autor comparten la cadena.
+
+    from_dict()/to_dict() convierten sin pérdidas desde y hacia el formato
+    almacenado. La clave antigua "author" se normaliza a "author_username";
+    las claves desconocidas y las fechas que no se pueden reproducir con
+    isoformat() se conservan en `extras`.
+    """
+
+    __slots__ = ("tweet_id", "processed_at", "responded", "author_username",
+                 "tweet_text", "response_text", "sentiment", "extras")
+
+    def __init__(self, tweet_id, processed_at=None, responded=False, author_username=None,
+                 tweet_text=None, response_text=None, sentiment=None, extras=None):
+        """
+        Args:
+            tweet_id: ID del tweet
+            processed_at: Microsegundos desde la época (None si se desconoce)
+            responded: Si la respuesta se publicó
+            author_username: Nombre de usuario del autor
+            tweet_text: Texto original del tweet
+            response_text: Respuesta generada
+            sentiment: Datos de análisis de sentimiento
+            extras: Claves adicionales del formato almacenado
+        """
+        self.tweet_id = int(tweet_id)
+        self.processed_at = processed_at
+        self.responded = bool(responded)
+        self.author_username = sys.intern(author_username) if author_username else author_username
+        self.tweet_text = tweet_text
+        self.response_text = response_text
+        self.sentiment = sentiment
+        self.extras = extras
+
+    @classmethod
+    def from_dict(cls, tweet_id, details):
+        """
+        Crea un registro a partir del formato almacenado.
+
+        Args:
+            tweet_id: ID del tweet (entero o cadena numérica)
+            details: Diccionario con los detalles del tweet
+        """
+        extras = {key: value for key, value in details.items() if key not in FIELDS and key != "author"}
+
+        processed_at = details.get("processed_at")
+        timestamp = None
+        if processed_at:
+            try:
+                timestamp = to_epoch(processed_at)
+                if from_epoch(timestamp).isoformat() != processed_at:
+                    extras["processed_at"] = processed_at
+            except ValueError:
+                extras["processed_at"] = processed_at
+
+        return cls(
+            tweet_id,
+            processed_at=timestamp,
+            responded=details.get("responded", False),
+            # Los registros antiguos usan "author" en lugar de "author_username"
+            author_username=details.get("author_username") or details.get("author"),
+            tweet_text=details.get("tweet_text"),
+            response_text=details.get("response_text"),
+            sentiment=details.get("sentiment"),
+            extras=extras or None
+        )
+
+    def to_dict(self):
+        """Convierte el registro al formato almacenado"""
+        details = {
+            "processed_at": self.processed_at_iso,
+            "responded": self.responded,
+            "author_username": self.author_username,
+            "tweet_text": self.tweet_text,
+            "response_text": self.response_text
+        }
+        if self.sentiment:
+            details["sentiment"] = self.sentiment
+        if self.extras:
+            details.update(self.extras)
+        return details
+
+    @property
+    def processed_at_iso(self):
+        """Fecha de procesamiento en formato ISO, tal como se almacenó"""
+        if self.extras and "processed_at" in self.extras:
+            return self.extras["processed_at"]
+        if self.processed_at is None:
+            return None
+        return from_epoch(self.processed_at).isoformat()
+
+    @property
+    def sort_key(self):
+        """Clave de orden cronológico (los registros sin fecha van primero)"""
+        return (MISSING_TIMESTAMP if self.processed_at is None else self.processed_at, self.tweet_id)
+
+    @property
+    def status(self):
+        """
+        Estado del tweet: "posted" si la respuesta se publicó, "generated" si
+        se generó sin publicarse e "ignored" si no se generó respuesta.
+        """
+        if self.responded:
+            return "posted"
+        if self.response_text:
+            return "generated"
+        return "ignored"
+
+    def hour_key(self):
+        """Clave del contador por hora (YYYY-MM-DDTHH) o None si no tiene fecha"""
+        if self.processed_at is None:
+            return None
+        return from_epoch(self.processed_at).strftime("%Y-%m-%dT%H")
+
+    def day_key(self):
+        """Clave del contador por día (YYYY-MM-DD) o None si no tiene fecha"""
+        if self.processed_at is None:
+            return None
+        return from_epoch(self.processed_at).strftime("%Y-%m-%d")
+
+    def __eq__(self, other):
+        if not isinstance(other, ProcessedTweet):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __lt__(self, other):
+        return self.sort_key < other.sort_key
+
+    def __repr__(self):
+        return f"ProcessedTweet(tweet_id={self.tweet_id}, processed_at={self.processed_at_iso!r}, status={self.status!r})"
+
+
+def record_matches(details, since=None, until=None, responded=None):
+    """
+    Indica si un registro (formato almacenado) cumple los filtros de iter_records().
+
+    Args:
+        details: Diccionario con los detalles del tweet
+        since: Fecha ISO mínima de procesamiento (opcional)
+        until: Fecha ISO máxima de procesamiento, excluida (opcional)
+        responded: Si no es None, valor requerido del indicador "responded"
+    """
+    processed_at = details.get("processed_at") or ""
+    if since and processed_at < since:
+        return False
+    if until and processed_at >= until:
+        return False
+    if responded is not None and bool(details.get("responded")) != responded:
+        return False
+    return True
+
+
+def project_record(tweet_id, details, fields=None):
+    """
+    Normaliza un registro (formato almacenado) y se queda con los campos pedidos.
+
+    Args:
+        tweet_id: ID del tweet
+        details: Diccionario con los detalles del tweet
+        fields: Campos a incluir (None para todos)
+
+    Returns:
+        dict: Detalles del tweet con su ID en "id"
+    """
+    details = ProcessedTweet.from_dict(tweet_id, details).to_dict()
+    if fields is not None:
+        details = {field: details.get(field) for field in fields}
+    return {"id": str(tweet_id), **details}
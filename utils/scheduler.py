@@ -0,0 +1,144 @@
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+logger = logging.getLogger("crypto_bot.scheduler")
+
+
+class AdaptiveScheduler:
+    """
+    Planificador del bucle principal: ciclos de búsqueda con intervalo
+    adaptativo y tareas periódicas o diarias.
+
+    El intervalo entre ciclos se ajusta según cuántos tweets nuevos trajeron
+    los últimos `history` ciclos, medidos en páginas completas de `page_size`
+    tweets: si de media llenan al menos una página, o si el último dejó
+    páginas sin leer, el intervalo se acorta (`speedup`); si no traen nada,
+    se alarga (`backoff`). Siempre queda entre `min_interval` y `max_interval`.
+
+    Si el límite de la API no permite un ciclo completo antes de la hora
+    prevista, el siguiente ciclo se retrasa hasta su restablecimiento. Entre
+    ciclos el bucle duerme hasta el siguiente plazo (ciclo o tarea), sin
+    despertarse cada segundo.
+    """
+
+    def __init__(self, interval=15 * 60, min_interval=2 * 60, max_interval=60 * 60, page_size=100,
+                 history=3, speedup=0.5, backoff=1.5, clock=time.time, sleep=time.sleep):
+        """
+        Args:
+            interval: Segundos entre ciclos al arrancar
+            min_interval: Segundos mínimos entre ciclos
+            max_interval: Segundos máximos entre ciclos
+            page_size: Tweets de una página de búsqueda completa
+            history: Ciclos recientes que se tienen en cuenta
+            speedup: Factor del intervalo cuando los ciclos llenan páginas (menor que 1)
+            backoff: Factor del intervalo cuando los ciclos no traen tweets (mayor que 1)
+            clock: Función que devuelve la hora actual en segundos
+            sleep: Función para esperar (útil en pruebas)
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = self._clamp(interval)
+        self.page_size = page_size
+        self.speedup = speedup
+        self.backoff = backoff
+        self._clock = clock
+        self._sleep = sleep
+        # Páginas llenadas por los ciclos recientes
+        self._fills = deque(maxlen=history)
+        # [hora de la próxima ejecución, periodo en segundos u hora "HH:MM", tarea]
+        self._jobs = []
+
+    def _clamp(self, interval):
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def every(self, seconds, job):
+        """Ejecuta `job` cada `seconds` segundos"""
+        self._jobs.append([self._clock() + seconds, seconds, job])
+
+    def daily(self, at, job):
+        """Ejecuta `job` todos los días a la hora local `at` ("HH:MM")"""
+        self._jobs.append([self._next_daily(at), at, job])
+
+    def _next_daily(self, at):
+        hour, minute = (int(part) for part in at.split(":"))
+        now = datetime.fromtimestamp(self._clock())
+        run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        return run_at.timestamp()
+
+    def run_pending(self):
+        """
+        Ejecuta las tareas cuya hora ha llegado.
+
+        Returns:
+            float: Hora de la próxima tarea (None si no hay tareas)
+        """
+        for entry in self._jobs:
+            run_at, period, job = entry
+            if self._clock() < run_at:
+                continue
+            try:
+                job()
+            except Exception as e:
+                logger.error(f"❌ Error en tarea programada {getattr(job, '__name__', job)}: {e}")
+            entry[0] = self._next_daily(period) if isinstance(period, str) else self._clock() + period
+        return min((entry[0] for entry in self._jobs), default=None)
+
+    def adapt(self, result):
+        """
+        Ajusta el intervalo con el resultado de un ciclo.
+
+        Args:
+            result: {"fetched": tweets nuevos, "saturated": si quedaron páginas sin
+                leer} o None si el ciclo no llegó a buscar (el intervalo no cambia)
+
+        Returns:
+            str: Motivo del intervalo elegido, para el log
+        """
+        if result is None:
+            return "ciclo sin búsqueda"
+        self._fills.append(result["fetched"] / self.page_size)
+        average = sum(self._fills) / len(self._fills)
+        previous = self.interval
+        if result.get("saturated") or average >= 1:
+            self.interval = self._clamp(self.interval * self.speedup)
+            reason = "quedaron páginas sin leer" if result.get("saturated") else f"{average:.1f} páginas por ciclo"
+        elif not any(self._fills):
+            self.interval = self._clamp(self.interval * self.backoff)
+            reason = "sin tweets nuevos"
+        else:
+            return f"{average:.1f} páginas por ciclo"
+        if self.interval == previous:
+            reason += ", en el límite"
+        return reason
+
+    def run(self, poll, ready_in=lambda: 0.0):
+        """
+        Bucle principal: ejecuta un ciclo, decide cuándo toca el siguiente y
+        duerme hasta entonces atendiendo las tareas programadas.
+
+        Args:
+            poll: Función que ejecuta un ciclo y devuelve su resultado (ver adapt)
+            ready_in: Función que devuelve los segundos hasta que se pueda hacer
+                un ciclo completo (límites de la API, circuitos abiertos)
+        """
+        while True:
+            reason = self.adapt(poll())
+            delay = self.interval
+            wait = ready_in()
+            if wait > delay:
+                # Un ciclo antes no podría completarse: esperar al restablecimiento
+                delay = wait + 1
+                reason += f"; alineado con el restablecimiento del límite en {wait / 60:.1f} min"
+            next_poll = self._clock() + delay
+            logger.info(f"⏱️ Próximo ciclo en {delay / 60:.1f} min (intervalo {self.interval / 60:.1f} min: {reason})")
+            while True:
+                next_job = self.run_pending()
+                now = self._clock()
+                if now >= next_poll:
+                    break
+                deadline = next_poll if next_job is None else min(next_poll, next_job)
+                self._sleep(max(0.0, deadline - now))
@@ -0,0 +1,211 @@
+import os
+import io
+import gzip
+import lzma
+import json
+import logging
+import tempfile
+from datetime import date, datetime, timedelta
+from utils import stats as stats_engine
+
+logger = logging.getLogger("crypto_bot.database")
+
+# Formatos de compresión soportados para los segmentos archivados
+SEGMENT_FORMATS = {
+    "gzip": (gzip, ".jsonl.gz"),
+    "lzma": (lzma, ".jsonl.xz")
+}
+
+# Segmento para registros sin fecha de procesamiento
+UNDATED_KEY = "sin-fecha"
+
+
+def period_start(day, period="day"):
+    """Primer día del periodo (día o semana ISO) que contiene la fecha"""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def segment_key(processed_at, period="day"):
+    """
+    Clave del segmento al que pertenece un registro.
+
+    Args:
+        processed_at: Fecha ISO de procesamiento del registro
+        period: "day" (YYYY-MM-DD) o "week" (YYYY-Www, semana ISO)
+    """
+    if not processed_at:
+        return UNDATED_KEY
+    if period == "week":
+        year, week, _ = datetime.fromisoformat(processed_at).isocalendar()
+        return f"{year}-W{week:02d}"
+    return processed_at[:10]
+
+
+def segment_start(key):
+    """Primer día del periodo que cubre un segmento (None si no tiene fecha)"""
+    if key == UNDATED_KEY:
+        return None
+    if "-W" in key:
+        year, week = key.split("-W")
+        return date.fromisocalendar(int(year), int(week), 1)
+    return date.fromisoformat(key)
+
+
+def segment_end(key):
+    """Primer día posterior al periodo que cubre un segmento (None si no tiene fecha)"""
+    start = segment_start(key)
+    if start is None:
+        return None
+    return start + timedelta(days=7 if "-W" in key else 1)
+
+
+def segment_path(directory, prefix, key, fmt="gzip"):
+    """Ruta del archivo de un segmento"""
+    return os.path.join(directory, f"{prefix}-{key}{SEGMENT_FORMATS[fmt][1]}")
+
+
+def list_segments(directory, prefix):
+    """
+    Lista los segmentos archivados ordenados cronológicamente.
+
+    Returns:
+        list: Tuplas (clave, ruta)
+    """
+    if not os.path.isdir(directory):
+        return []
+    segments = []
+    for name in os.listdir(directory):
+        if not name.startswith(prefix + "-"):
+            continue
+        for _, suffix in SEGMENT_FORMATS.values():
+            if name.endswith(suffix):
+                segments.append((name[len(prefix) + 1:-len(suffix)], os.path.join(directory, name)))
+    # Los segmentos sin fecha van primero
+    segments.sort(key=lambda segment: (segment[0] != UNDATED_KEY, segment[0]))
+    return segments
+
+
+def _compressor(path):
+    for module, suffix in SEGMENT_FORMATS.values():
+        if path.endswith(suffix):
+            return module
+    raise ValueError(f"Formato de segmento desconocido: {path}")
+
+
+def write_segment(path, records, fsync=False):
+    """
+    Agrega registros a un segmento comprimido de forma atómica.
+    Si el segmento ya existe, el nuevo bloque se concatena como un miembro
+    adicional (gzip y xz admiten flujos concatenados).
+
+    Args:
+        path: Ruta del segmento
+        records: Lista de tuplas (tweet_id, registro)
+        fsync: Si es True, fuerza os.fsync antes de reemplazar el archivo
+    """
+    lines = "".join(
+        json.dumps({"id": tweet_id, **record}, separators=(",", ":")) + "\n"
+        for tweet_id, record in records
+    )
+    block = _compressor(path).compress(lines.encode("utf-8"))
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if os.path.exists(path):
+                with open(path, 'rb') as existing:
+                    f.write(existing.read())
+            f.write(block)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def iter_segment(path):
+    """
+    Recorre un segmento en streaming, sin descomprimirlo entero en memoria.
+
+    Yields:
+        tuple: (tweet_id, registro)
+    """
+    seen = set()
+    try:
+        with _compressor(path).open(path, 'rb') as raw:
+            for line in io.TextIOWrapper(raw, encoding="utf-8"):
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                tweet_id = record.pop("id")
+                # Una compactación interrumpida puede haber archivado dos veces el mismo registro
+                if tweet_id in seen:
+                    continue
+                seen.add(tweet_id)
+                yield tweet_id, record
+    except (EOFError, lzma.LZMAError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+        logger.warning(f"⚠️ Segmento {path} truncado o dañado: {e}")
+
+
+def iter_segments(directory, prefix, since=None, until=None):
+    """
+    Recorre en streaming los registros archivados del intervalo [since, until),
+    saltando sin abrirlos los segmentos que quedan fuera de él.
+
+    Args:
+        directory: Directorio de los segmentos
+        prefix: Prefijo de los archivos de segmento
+        since: Fecha ISO mínima de procesamiento (opcional)
+        until: Fecha ISO máxima de procesamiento, excluida (opcional)
+
+    Yields:
+        tuple: (tweet_id, registro)
+    """
+    for key, path in list_segments(directory, prefix):
+        start = segment_start(key)
+        if start is None:
+            if since or until:
+                continue
+        elif (since and segment_end(key).isoformat() <= since) or (until and start.isoformat() >= until):
+            continue
+
+        for tweet_id, record in iter_segment(path):
+            processed_at = record.get("processed_at") or ""
+            if since and processed_at < since:
+                continue
+            if until and processed_at >= until:
+                continue
+            yield tweet_id, record
+
+
+def expired_segments(directory, prefix, retention_days, today=None):
+    """
+    Segmentos cuyo periodo terminó hace más de `retention_days` días.
+
+    Returns:
+        list: Tuplas (clave, ruta)
+    """
+    cutoff = (today or date.today()) - timedelta(days=retention_days)
+    return [
+        (key, path) for key, path in list_segments(directory, prefix)
+        if key != UNDATED_KEY and segment_end(key) <= cutoff
+    ]
+
+
+def expired_deltas(path):
+    """
+    Contadores que aportaban los registros de un segmento que se va a eliminar,
+    para que verify() pueda seguir cuadrando las estadísticas sin ellos.
+    Incluye los contadores por hora: los almacenados solo se podan cuando
+    llega una hora más reciente, así que pueden seguir ahí.
+    """
+    for _, record in iter_segment(path):
+        yield from stats_engine.record_deltas(record)
@@ -0,0 +1,137 @@
+import re
+from utils.lru_cache import TTLCache
+
+_URL = re.compile(r"https?://\S+")
+_MENTION = re.compile(r"@\w+")
+_LEADING_MENTIONS = re.compile(r"^(?:\s*@\w+)+")
+_CASHTAG = re.compile(r"\$[A-Za-z][A-Za-z0-9_]*")
+
+# Acortadores de enlaces habituales en el spam (t.co no cuenta: X acorta todos los enlaces)
+SHORTENERS = frozenset({
+    "bit.ly", "tinyurl.com", "goo.gl", "ow.ly", "is.gd", "buff.ly", "cutt.ly",
+    "shorturl.at", "rebrand.ly", "t.ly", "tiny.cc", "linktr.ee"
+})
+
+# Expresiones típicas de plantillas de spam y estafas
+SPAM_LEXICON = (
+    "check it out", "link in pin", "invited users", "presale", "airdrop", "giveaway",
+    "dm me", "for nothing", "signals", "100x", "1000x", "guaranteed", "free crypto",
+    "recover", "recovery", "stolen funds", "limited time", "don't miss", "join now",
+    "click the link", "whitelist", "claim your"
+)
+
+# Peso de cada característica en la puntuación de spam
+WEIGHTS = {
+    "mentions": 0.08,         # por mención fuera del inicio de respuesta (máximo 10)
+    "urls": 0.1,              # por enlace (máximo 3)
+    "shortened": 0.25,        # por enlace acortado (máximo 2)
+    "cashtag_density": 1.0,   # cashtags por palabra
+    "lexicon": 0.25,          # por expresión de spam (máximo 3)
+    "author": 0.5             # proporción de tweets del autor que el prefiltro ya descartó
+}
+
+# Tweets del autor que hay que haber visto para tener en cuenta su historial
+MIN_AUTHOR_HISTORY = 3
+
+
+class SpamFilter:
+    """
+    Prefiltro local de spam, previo a cualquier llamada a OpenAI.
+
+    Puntúa cada tweet con características baratas (menciones, enlaces y
+    enlaces acortados, densidad de cashtags, expresiones de spam conocidas e
+    historial del autor) y descarta los que superan `threshold`. El umbral
+    por defecto es alto: solo se descartan los casos claros y el resto sigue
+    pasando por la evaluación de relevancia.
+
+    El historial de autores es una caché {ID de autor: [vistos, descartados]}
+    que el llamante persiste (ver TwitterService). Solo cuentan como
+    descartados los tweets que descartó el propio prefiltro: un autor legítimo
+    cuyos tweets no son relevantes no acumula historial de spam.
+    """
+
+    def __init__(self, threshold=0.8, history_size=50000, history_ttl=30 * 24 * 3600):
+        """
+        Args:
+            threshold: Puntuación a partir de la que un tweet se descarta
+            history_size: Autores como máximo en el historial
+            history_ttl: Segundos que se conserva el historial de un autor
+        """
+        self.threshold = threshold
+        self.author_history = TTLCache(maxsize=history_size, ttl=history_ttl)
+
+    def score_page(self, tweets):
+        """
+        Puntúa una página de tweets. Las características se calculan por
+        columnas para toda la página y se combinan con WEIGHTS.
+
+        Args:
+            tweets: Tweets (con text, author_id y, opcionalmente, entities)
+
+        Returns:
+            list: (puntuación, motivos) de cada tweet, en el mismo orden
+        """
+        texts = [tweet.text or "" for tweet in tweets]
+        urls = [_tweet_urls(tweet, text) for tweet, text in zip(tweets, texts)]
+        columns = {
+            # Las menciones iniciales de una respuesta no cuentan
+            "mentions": [min(len(_MENTION.findall(_LEADING_MENTIONS.sub("", text))), 10) for text in texts],
+            "urls": [min(len(tweet_urls), 3) for tweet_urls in urls],
+            "shortened": [
+                min(sum(_domain(url) in SHORTENERS for url in tweet_urls), 2)
+                for tweet_urls in urls
+            ],
+            "cashtag_density": [
+                len(_CASHTAG.findall(text)) / max(len(text.split()), 1) for text in texts
+            ],
+            "lexicon": [
+                min(sum(phrase in lowered for phrase in SPAM_LEXICON), 3)
+                for lowered in (text.lower() for text in texts)
+            ],
+            "author": [self._author_spam_ratio(tweet.author_id) for tweet in tweets]
+        }
+
+        results = []
+        for row in zip(*columns.values()):
+            features = dict(zip(columns, row))
+            contributions = {name: WEIGHTS[name] * value for name, value in features.items() if value}
+            reasons = [f"{name}={features[name]:.2g}" for name in sorted(contributions, key=contributions.get, reverse=True)]
+            results.append((min(sum(contributions.values()), 1.0), reasons))
+        return results
+
+    def is_spam(self, score):
+        return score >= self.threshold
+
+    def _author_spam_ratio(self, author_id):
+        history = self.author_history.get(str(author_id))
+        if not history or history[0] < MIN_AUTHOR_HISTORY:
+            return 0.0
+        return history[1] / history[0]
+
+    def record(self, author_id, spam):
+        """
+        Registra un tweet del autor en su historial.
+
+        Args:
+            author_id: ID del autor
+            spam: Si el prefiltro descartó el tweet
+
+        Returns:
+            tuple: (clave, (historial, hora de caducidad)), para persistirlo
+        """
+        key = str(author_id)
+        seen, rejected = self.author_history.get(key) or (0, 0)
+        history = [seen + 1, rejected + int(bool(spam))]
+        return key, (history, self.author_history.set(key, history))
+
+
+def _tweet_urls(tweet, text):
+    """URLs del tweet: las expandidas de entities si están disponibles o las del texto"""
+    entities = getattr(tweet, "entities", None) or {}
+    urls = [url.get("expanded_url") or url.get("url", "") for url in entities.get("urls", [])]
+    return urls or _URL.findall(text)
+
+
+def _domain(url):
+    host = url.split("://", 1)[-1].split("/", 1)[0].lower()
+    return host[4:] if host.startswith("www.") else host
@@ -0,0 +1,902 @@
+import os
+import json
+import struct
+import sqlite3
+import logging
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+from datetime import date, datetime, timedelta
+from utils import segments
+from utils import stats as stats_engine
+from utils.id_index import IdIndex
+from utils.records import record_matches, project_record
+
+logger = logging.getLogger("crypto_bot.database")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed_tweets (
+    tweet_id INTEGER PRIMARY KEY,
+    processed_at TEXT NOT NULL,
+    responded INTEGER NOT NULL DEFAULT 0,
+    author_username TEXT,
+    tweet_text TEXT,
+    response_text TEXT,
+    sentiment TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_processed_tweets_processed_at ON processed_tweets (processed_at);
+CREATE INDEX IF NOT EXISTS idx_processed_tweets_author ON processed_tweets (author_username);
+
+CREATE TABLE IF NOT EXISTS stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rate_limit_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    wait_seconds INTEGER NOT NULL,
+    endpoint TEXT
+);
+
+CREATE TABLE IF NOT EXISTS archived_ids (
+    tweet_id INTEGER PRIMARY KEY
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS expired_stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS expired_segments (
+    key TEXT PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS cache (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (name, key)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columnas con los detalles de cada tweet (todas salvo tweet_id)
+RECORD_COLUMNS = ("processed_at", "responded", "author_username", "tweet_text", "response_text", "sentiment")
+
+# Filas que iter_records() lee en cada consulta
+ITER_PAGE_SIZE = 500
+
+# Número de eventos de rate limit que se conservan (igual que el backend JSON)
+RATE_LIMIT_HISTORY_SIZE = 10
+
+# Versión del formato de la tabla stats (2: contadores detallados de utils.stats)
+STATS_VERSION = "2"
+
+
+class SQLiteDatabase:
+    """
+    Backend SQLite con la misma interfaz que Database.
+    Cada operación es una consulta indexada, por lo que el coste por tweet
+    no crece con el tamaño del historial.
+
+    La tabla stats guarda los contadores de utils.stats aplanados (por
+    ejemplo "by_day/2025-02-27"), actualizados en la misma transacción que
+    cada registro.
+
+    archive() mueve las filas anteriores a los últimos `hot_days` días a los
+    mismos segmentos comprimidos que usa Database (utils.segments) y deja
+    solo su ID en archived_ids.
+
+    La base de datos usa el modo WAL: el escritor (el bot) y los lectores
+    (`read_only=True`, como el dashboard) trabajan a la vez, cada lectura ve
+    una instantánea confirmada y los lectores nunca bloquean al escritor.
+    Un segundo escritor espera hasta `busy_timeout` segundos a que termine
+    la transacción en curso.
+    """
+
+    def __init__(self, db_file="data/processed_tweets.db", hot_days=7, retention_days=None,
+                 archive_format="gzip", segment_period="day", read_only=False, busy_timeout=30.0):
+        """
+        Inicializa la base de datos SQLite.
+
+        Args:
+            db_file: Ruta al archivo SQLite que almacenará los tweets procesados
+            hot_days: Días que las filas permanecen en la tabla antes de archivarse
+                (None para no archivar nunca)
+            retention_days: Días que se conservan los segmentos archivados tras el
+                fin de su periodo (None para conservarlos siempre)
+            archive_format: Compresión de los segmentos ("gzip" o "lzma")
+            segment_period: Periodo de cada segmento ("day" o "week")
+            read_only: Si es True, abre una conexión de solo lectura
+            busy_timeout: Segundos que se espera a que otro proceso libere la base de datos
+        """
+        if archive_format not in segments.SEGMENT_FORMATS:
+            raise ValueError(f"❌ ERROR: Formato de archivo desconocido: {archive_format}")
+        self.db_file = db_file
+        self.archive_dir = os.path.join(os.path.dirname(db_file), "archive")
+        self.segment_prefix = os.path.splitext(os.path.basename(db_file))[0]
+        self.hot_days = hot_days
+        self.retention_days = retention_days
+        self.archive_format = archive_format
+        self.segment_period = segment_period
+        self.read_only = read_only
+        self._lock = threading.RLock()
+        self._group_depth = 0
+        if read_only:
+            uri = "file:" + pathname2url(os.path.abspath(db_file)) + "?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, timeout=busy_timeout, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            return
+
+        self._ensure_data_dir()
+        self._conn = sqlite3.connect(db_file, timeout=busy_timeout, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # WAL: los lectores de otros procesos no bloquean al escritor ni ven escrituras a medias
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_db()
+
+    def _ensure_data_dir(self):
+        """Asegura que existe el directorio de datos"""
+        os.makedirs(os.path.dirname(self.db_file) or ".", exist_ok=True)
+
+    def _init_db(self):
+        """Crea las tablas e índices si no existen"""
+        with self._lock, self._transaction():
+            self._conn.executescript(SCHEMA)
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO stats (key, value) VALUES (?, 0)",
+                [(key,) for key in ("total_processed", "total_responded") + stats_engine.STATUSES]
+            )
+
+        # Calcular una única vez los contadores detallados en bases anteriores a ellos
+        with self._lock:
+            stats_version = self._get_meta("stats_version")
+        if stats_version != STATS_VERSION:
+            self.rebuild()
+
+    def _row_to_details(self, row):
+        """Convierte una fila de processed_tweets al formato de diccionario del backend JSON"""
+        details = {
+            "processed_at": row["processed_at"],
+            "responded": bool(row["responded"]),
+            "author_username": row["author_username"],
+            "tweet_text": row["tweet_text"],
+            "response_text": row["response_text"]
+        }
+        if row["sentiment"]:
+            details["sentiment"] = json.loads(row["sentiment"])
+        return details
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _apply_stat_deltas(self, deltas):
+        """Aplica incrementos de utils.stats sobre la tabla stats (dentro de la transacción en curso)"""
+        keys = []
+        for path, delta in deltas:
+            key = "/".join(path)
+            keys.append(key)
+            self._conn.execute(
+                "INSERT INTO stats (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + excluded.value",
+                (key, delta)
+            )
+            if path[0] == "by_hour" and delta > 0:
+                self._prune_hours(path[1])
+
+        # Los contadores de los mapas que llegan a cero se eliminan
+        placeholders = ",".join("?" * len(keys))
+        self._conn.execute(
+            f"DELETE FROM stats WHERE key IN ({placeholders}) AND value <= 0 AND instr(key, '/') > 0", keys
+        )
+
+    def _prune_hours(self, newest_hour, table="stats"):
+        """Elimina los contadores por hora fuera de la ventana de retención (de stats o expired_stats)"""
+        try:
+            newest = datetime.strptime(newest_hour, "%Y-%m-%dT%H")
+        except ValueError:
+            return
+        cutoff = (newest - timedelta(hours=stats_engine.HOURLY_RETENTION_HOURS)).strftime("%Y-%m-%dT%H")
+        self._conn.execute(
+            f"DELETE FROM {table} WHERE key >= 'by_hour/' AND key < ?", ("by_hour/" + cutoff,)
+        )
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Transacción de una operación. Dentro de un grupo de escrituras
+        (_write_group) se usa un savepoint, de modo que una operación fallida
+        se deshace sin afectar al resto del grupo, que se confirma al cerrarlo.
+        """
+        if not self._group_depth:
+            with self._conn:
+                yield
+            return
+
+        self._conn.execute("SAVEPOINT operation")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK TO operation")
+            self._conn.execute("RELEASE operation")
+            raise
+        self._conn.execute("RELEASE operation")
+
+    @contextmanager
+    def batch(self):
+        """
+        Bloque de escrituras, por compatibilidad con Database.batch().
+
+        A diferencia del backend JSON, cada operación del bloque se confirma
+        al momento: el bot envuelve en un lote todo el ciclo, con esperas a X
+        y a OpenAI entre escritura y escritura, y una transacción abierta
+        durante el ciclo impediría escribir a los demás procesos. Con WAL y
+        synchronous=NORMAL confirmar no fuerza escrituras a disco, así que
+        apenas cuesta. Las escrituras seguidas que deben confirmarse juntas
+        van en _write_group (mark_tweets_processed_bulk).
+
+        Uso:
+            with db.batch():
+                db.mark_tweet_processed(...)
+                db.record_rate_limit(...)
+        """
+        yield self
+
+    @contextmanager
+    def _write_group(self):
+        """
+        Agrupa las escrituras del bloque en una única transacción. Solo debe
+        envolver escrituras seguidas, sin esperas: mientras está abierta ningún
+        otro proceso puede escribir.
+
+        Si el bloque termina con una excepción, lo ya registrado se confirma
+        igualmente: un tweet respondido no debe volver a procesarse.
+        """
+        with self._lock:
+            if not self._group_depth and not self._conn.in_transaction:
+                self._conn.execute("BEGIN")
+            self._group_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._group_depth -= 1
+                if not self._group_depth:
+                    self._conn.commit()
+
+    def flush(self):
+        """Cada operación se confirma al momento; se mantiene por compatibilidad con Database"""
+
+    def flush_if_due(self):
+        """Cada operación se confirma al momento; se mantiene por compatibilidad con Database"""
+
+    def refresh(self):
+        """
+        Cada consulta ya ve la última transacción confirmada; se mantiene por
+        compatibilidad con Database.
+
+        Returns:
+            bool: Siempre False
+        """
+        return False
+
+    def close(self):
+        """Cierra la conexión con la base de datos"""
+        with self._lock:
+            self._conn.close()
+
+    def is_empty(self):
+        """Indica si la base de datos todavía no contiene tweets"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM processed_tweets LIMIT 1").fetchone()
+        return row is None
+
+    def is_tweet_processed(self, tweet_id):
+        """
+        Verifica si un tweet ya ha sido procesado.
+
+        Args:
+            tweet_id: ID del tweet a verificar
+
+        Returns:
+            bool: True si ya fue procesado, False en caso contrario
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM processed_tweets WHERE tweet_id = ? "
+                "UNION ALL SELECT 1 FROM archived_ids WHERE tweet_id = ?",
+                (int(tweet_id), int(tweet_id))
+            ).fetchone()
+        return row is not None
+
+    def filter_unprocessed(self, tweet_ids):
+        """
+        Filtra en una sola pasada los IDs que todavía no han sido procesados.
+
+        Args:
+            tweet_ids: Lista de IDs de tweets (por ejemplo, una página de búsqueda)
+
+        Returns:
+            list: IDs no procesados, en el orden original y sin repetidos
+        """
+        tweet_ids = list(tweet_ids)
+        keys = list({int(tweet_id) for tweet_id in tweet_ids})
+        processed = set()
+        with self._lock:
+            # Consultar en bloques para no superar el límite de parámetros de SQLite
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT tweet_id FROM processed_tweets WHERE tweet_id IN ({placeholders}) "
+                    f"UNION ALL SELECT tweet_id FROM archived_ids WHERE tweet_id IN ({placeholders})",
+                    chunk + chunk
+                ).fetchall()
+                processed.update(row["tweet_id"] for row in rows)
+
+        seen = set()
+        unprocessed = []
+        for tweet_id in tweet_ids:
+            key = int(tweet_id)
+            if key not in processed and key not in seen:
+                seen.add(key)
+                unprocessed.append(tweet_id)
+        return unprocessed
+
+    def mark_tweet_processed(self, tweet_id, responded=False, tweet_text=None, response_text=None, author_username=None, sentiment_data=None):
+        """
+        Marca un tweet como procesado y almacena su contenido y respuesta.
+
+        Args:
+            tweet_id: ID del tweet procesado
+            responded: Si se respondió o no al tweet
+            tweet_text: El texto original del tweet
+            response_text: La respuesta generada para el tweet
+            author_username: Nombre de usuario del autor del tweet
+            sentiment_data: Datos de análisis de sentimiento (opcional)
+        """
+        with self._lock, self._transaction():
+            previous = self._conn.execute(
+                "SELECT * FROM processed_tweets WHERE tweet_id = ?", (int(tweet_id),)
+            ).fetchone()
+            processed_at = datetime.now().isoformat()
+
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO processed_tweets
+                    (tweet_id, processed_at, responded, author_username, tweet_text, response_text, sentiment)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    int(tweet_id),
+                    processed_at,
+                    int(bool(responded)),
+                    author_username,
+                    tweet_text,
+                    response_text,
+                    json.dumps(sentiment_data) if sentiment_data else None
+                )
+            )
+
+            # Actualizar estadísticas en la misma transacción, restando la versión anterior si existía
+            deltas = stats_engine.record_deltas({
+                "processed_at": processed_at,
+                "responded": responded,
+                "author_username": author_username,
+                "response_text": response_text
+            })
+            if previous is not None:
+                deltas = stats_engine.record_deltas(self._row_to_details(previous), -1) + deltas
+            self._apply_stat_deltas(deltas)
+
+        logger.info(f"✅ Tweet {tweet_id} de @{author_username} guardado en la base de datos")
+
+    def mark_tweets_processed_bulk(self, records):
+        """
+        Marca varios tweets como procesados con una sola confirmación.
+
+        Args:
+            records: Lista de diccionarios con los argumentos de mark_tweet_processed
+        """
+        with self._write_group():
+            for record in records:
+                self.mark_tweet_processed(**record)
+
+    def get_cache_entries(self, name):
+        """
+        Obtiene las entradas vigentes de una caché persistida (por ejemplo,
+        la de nombres de usuario de TwitterService).
+
+        Args:
+            name: Nombre de la caché
+
+        Returns:
+            dict: {clave: (valor, hora de caducidad en segundos desde la época)}
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value, expires_at FROM cache WHERE name = ? AND expires_at > ?",
+                (name, time.time())
+            ).fetchall()
+        return {row["key"]: (json.loads(row["value"]), row["expires_at"]) for row in rows}
+
+    def put_cache_entries(self, name, entries):
+        """
+        Guarda entradas en una caché persistida. Las caducadas se eliminan al archivar.
+
+        Args:
+            name: Nombre de la caché
+            entries: Diccionario {clave: (valor, hora de caducidad)}
+        """
+        if not entries:
+            return
+        with self._lock, self._transaction():
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (name, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                [(name, str(key), json.dumps(value), expires_at) for key, (value, expires_at) in entries.items()]
+            )
+
+    def get_state(self, key, default=None):
+        """
+        Obtiene un valor de estado persistido (por ejemplo, el último tweet
+        leído de cada búsqueda).
+
+        Args:
+            key: Clave del valor
+            default: Valor si la clave no existe
+        """
+        with self._lock:
+            value = self._get_meta(f"state:{key}")
+        return default if value is None else json.loads(value)
+
+    def set_state(self, key, value):
+        """
+        Guarda un valor de estado persistido.
+
+        Args:
+            key: Clave del valor
+            value: Valor serializable en JSON
+        """
+        with self._lock, self._transaction():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (f"state:{key}", json.dumps(value))
+            )
+
+    def record_rate_limit(self, wait_seconds, endpoint=None):
+        """
+        Registra información sobre un rate limit encontrado.
+
+        Args:
+            wait_seconds: Tiempo de espera en segundos
+            endpoint: Endpoint de la API que generó el rate limit (opcional)
+        """
+        with self._lock, self._transaction():
+            self._conn.execute(
+                "INSERT INTO rate_limit_history (timestamp, wait_seconds, endpoint) VALUES (?, ?, ?)",
+                (datetime.now().isoformat(), wait_seconds, endpoint)
+            )
+            # Mantener historial limitado a los últimos eventos
+            self._conn.execute(
+                """
+                DELETE FROM rate_limit_history WHERE id NOT IN (
+                    SELECT id FROM rate_limit_history ORDER BY id DESC LIMIT ?
+                )
+                """,
+                (RATE_LIMIT_HISTORY_SIZE,)
+            )
+            self._apply_stat_deltas(stats_engine.rate_limit_deltas(endpoint))
+        logger.info(f"📊 Rate limit registrado: {wait_seconds} segundos")
+
+    def get_rate_limit_info(self):
+        """
+        Obtiene información sobre los rate limits.
+
+        Returns:
+            dict: Información de rate limits
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT timestamp, wait_seconds, endpoint FROM rate_limit_history ORDER BY id"
+            ).fetchall()
+
+        history = [dict(row) for row in rows]
+        if not history:
+            return {"last_encounter": None, "wait_seconds": 0, "history": []}
+        return {
+            "last_encounter": history[-1]["timestamp"],
+            "wait_seconds": history[-1]["wait_seconds"],
+            "history": history
+        }
+
+    def get_tweet_details(self, tweet_id):
+        """
+        Obtiene los detalles de un tweet procesado.
+
+        Args:
+            tweet_id: ID del tweet
+
+        Returns:
+            dict: Detalles del tweet o None si no existe
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM processed_tweets WHERE tweet_id = ?", (int(tweet_id),)
+            ).fetchone()
+        return self._row_to_details(row) if row else None
+
+    def get_stats(self):
+        """
+        Obtiene estadísticas de tweets procesados: totales, desglose por estado
+        (ignored/generated/posted), contadores por hora y por día y rate limits
+        por endpoint. Los contadores por autor se consultan con get_author_stats.
+
+        Returns:
+            dict: Estadísticas actuales
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM stats WHERE key < 'by_author/' OR key >= 'by_author0'"
+            ).fetchall()
+        stats = stats_engine.unflatten((row["key"], row["value"]) for row in rows)
+        del stats["by_author"]
+        return stats
+
+    def get_author_stats(self, author_username):
+        """
+        Obtiene los contadores de un autor.
+
+        Args:
+            author_username: Nombre de usuario del autor
+
+        Returns:
+            dict: Contadores por estado ("processed", "ignored", "generated", "posted")
+        """
+        prefix = f"by_author/{author_username}/"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM stats WHERE key >= ? AND key < ?", (prefix, prefix[:-1] + "0")
+            ).fetchall()
+        return {row["key"][len(prefix):]: row["value"] for row in rows}
+
+    def _iter_stored_records(self):
+        """Recorre los registros con un cursor, sin cargarlos todos en memoria"""
+        for row in self._conn.execute("SELECT * FROM processed_tweets"):
+            yield self._row_to_details(row)
+
+    def _compute_stats(self):
+        """Recalcula las estadísticas a partir de los registros archivados, los de la tabla y los caducados"""
+        records = itertools.chain(
+            (record for _, record in segments.iter_segments(self.archive_dir, self.segment_prefix)),
+            self._iter_stored_records()
+        )
+        computed = stats_engine.compute_stats(records)
+        rows = self._conn.execute("SELECT key, value FROM expired_stats").fetchall()
+        stats_engine.merge_stats(computed, stats_engine.unflatten((row["key"], row["value"]) for row in rows))
+        return computed
+
+    def verify(self):
+        """
+        Recalcula las estadísticas recorriendo los registros y las compara
+        con las almacenadas.
+
+        Returns:
+            dict: {clave: (valor almacenado, valor calculado)} para cada diferencia
+        """
+        with self._lock:
+            computed = self._compute_stats()
+            rows = self._conn.execute("SELECT key, value FROM stats").fetchall()
+        stored = stats_engine.unflatten((row["key"], row["value"]) for row in rows)
+        return stats_engine.diff_stats(stored, computed)
+
+    def rebuild(self):
+        """
+        Reemplaza las estadísticas almacenadas por las recalculadas a partir
+        de los registros. Los contadores de rate limits se conservan.
+
+        Returns:
+            dict: Diferencias corregidas, con el mismo formato que verify()
+        """
+        with self._lock, self._transaction():
+            computed = self._compute_stats()
+            rows = self._conn.execute("SELECT key, value FROM stats").fetchall()
+            differences = stats_engine.diff_stats(
+                stats_engine.unflatten((row["key"], row["value"]) for row in rows), computed
+            )
+            del computed["rate_limits_by_endpoint"]
+
+            self._conn.execute("DELETE FROM stats WHERE key < 'rate_limits_by_endpoint/' OR key >= 'rate_limits_by_endpoint0'")
+            self._conn.executemany(
+                "INSERT INTO stats (key, value) VALUES (?, ?)", stats_engine.flatten(computed)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('stats_version', ?)", (STATS_VERSION,)
+            )
+        if differences:
+            logger.info(f"📊 Estadísticas reconstruidas ({len(differences)} contadores corregidos)")
+        return differences
+
+    def get_last_processed_tweets(self, limit=10, before=None):
+        """
+        Obtiene los últimos tweets procesados usando el índice de processed_at.
+        Solo consulta las filas calientes; las archivadas se recorren con
+        iter_archived().
+
+        Args:
+            limit: Número máximo de tweets a retornar
+            before: Cursor opcional (processed_at del último tweet de la página
+                anterior) para obtener tweets más antiguos
+
+        Returns:
+            list: Lista de los últimos tweets procesados con sus detalles
+        """
+        with self._lock:
+            if before is None:
+                rows = self._conn.execute(
+                    "SELECT * FROM processed_tweets ORDER BY processed_at DESC LIMIT ?", (limit,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM processed_tweets WHERE processed_at < ? ORDER BY processed_at DESC LIMIT ?",
+                    (before, limit)
+                ).fetchall()
+        return [{"id": str(row["tweet_id"]), **self._row_to_details(row)} for row in rows]
+
+    def archive(self):
+        """
+        Mueve a segmentos comprimidos las filas anteriores a la ventana caliente
+        y elimina los segmentos que superan la retención. Los segmentos se
+        escriben antes de borrar las filas: si el proceso cae entre ambos pasos,
+        se vuelven a archivar (iter_segment descarta los duplicados).
+
+        Returns:
+            int: Número de tweets archivados
+        """
+        archived = 0
+        if self.hot_days is not None:
+            cutoff = segments.period_start(date.today() - timedelta(days=self.hot_days), self.segment_period)
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT * FROM processed_tweets WHERE processed_at < ? ORDER BY processed_at",
+                    (cutoff.isoformat(),)
+                ).fetchall()
+
+                groups = {}
+                for row in rows:
+                    key = segments.segment_key(row["processed_at"], self.segment_period)
+                    groups.setdefault(key, []).append((str(row["tweet_id"]), self._row_to_details(row)))
+                for key, records in groups.items():
+                    path = segments.segment_path(self.archive_dir, self.segment_prefix, key, self.archive_format)
+                    segments.write_segment(path, records)
+
+                # Los IDs se conservan para que los tweets archivados no se reprocesen
+                ids = [(row["tweet_id"],) for row in rows]
+                with self._transaction():
+                    self._conn.executemany("INSERT OR IGNORE INTO archived_ids (tweet_id) VALUES (?)", ids)
+                    self._conn.executemany("DELETE FROM processed_tweets WHERE tweet_id = ?", ids)
+            archived = len(rows)
+            if archived:
+                logger.info(f"📦 Archivados {archived} tweets en {len(groups)} segmentos comprimidos")
+
+        if self.retention_days is not None:
+            self._expire_segments()
+
+        # Eliminar las entradas caducadas de las cachés persistidas
+        with self._lock, self._transaction():
+            self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        return archived
+
+    def _expire_segments(self):
+        """
+        Elimina los segmentos que superan la retención, registrando antes sus
+        contadores en expired_stats para que verify() siga cuadrando sin ellos.
+        """
+        expired = segments.expired_segments(self.archive_dir, self.segment_prefix, self.retention_days)
+        with self._lock:
+            for key, path in expired:
+                # Un segmento ya contabilizado puede seguir en disco si el proceso cayó antes de borrarlo
+                if self._conn.execute("SELECT 1 FROM expired_segments WHERE key = ?", (key,)).fetchone() is None:
+                    with self._transaction():
+                        for path_keys, delta in segments.expired_deltas(path):
+                            self._conn.execute(
+                                "INSERT INTO expired_stats (key, value) VALUES (?, ?) "
+                                "ON CONFLICT (key) DO UPDATE SET value = value + excluded.value",
+                                ("/".join(path_keys), delta)
+                            )
+                        self._conn.execute("INSERT INTO expired_segments (key) VALUES (?)", (key,))
+                        # Como en stats, solo se conserva la ventana de horas más reciente
+                        newest = self._conn.execute(
+                            "SELECT MAX(key) AS key FROM expired_stats WHERE key >= 'by_hour/' AND key < 'by_hour0'"
+                        ).fetchone()["key"]
+                        if newest:
+                            self._prune_hours(newest.split("/", 1)[1], table="expired_stats")
+                os.remove(path)
+        if expired:
+            logger.info(f"🗑️ Eliminados {len(expired)} segmentos archivados fuera de la retención")
+
+    def iter_records(self, fields=None, since=None, until=None, responded=None):
+        """
+        Recorre los tweets procesados en streaming: primero los archivados y
+        después los de la tabla, por páginas ordenadas por processed_at. Los
+        filtros y los campos pedidos se trasladan a la consulta SQL.
+
+        Args:
+            fields: Campos a incluir en cada tweet (None para todos)
+            since: Fecha ISO mínima de procesamiento (opcional)
+            until: Fecha ISO máxima de procesamiento, excluida (opcional)
+            responded: Si no es None, solo los tweets con ese valor de "responded"
+
+        Yields:
+            dict: Detalles del tweet, con su ID en "id"
+        """
+        for tweet_id, details in segments.iter_segments(self.archive_dir, self.segment_prefix, since, until):
+            if record_matches(details, since, until, responded):
+                yield project_record(tweet_id, details, fields)
+
+        columns = [column for column in RECORD_COLUMNS if fields is None or column in fields]
+        if "processed_at" not in columns:
+            columns.insert(0, "processed_at")
+        conditions, params = [], []
+        if since:
+            conditions.append("processed_at >= ?")
+            params.append(since)
+        if until:
+            conditions.append("processed_at < ?")
+            params.append(until)
+        if responded is not None:
+            conditions.append("responded = ?")
+            params.append(int(responded))
+
+        # Paginación por clave (processed_at, tweet_id): cada página es una búsqueda en el índice
+        last = None
+        while True:
+            page_conditions = list(conditions)
+            page_params = list(params)
+            if last is not None:
+                page_conditions.append("(processed_at > ? OR (processed_at = ? AND tweet_id > ?))")
+                page_params += [last[0], last[0], last[1]]
+            where = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT tweet_id, {', '.join(columns)} FROM processed_tweets {where} "
+                    f"ORDER BY processed_at, tweet_id LIMIT ?",
+                    page_params + [ITER_PAGE_SIZE]
+                ).fetchall()
+            if not rows:
+                return
+
+            for row in rows:
+                details = {column: row[column] for column in columns}
+                if "responded" in details:
+                    details["responded"] = bool(details["responded"])
+                if details.get("sentiment"):
+                    details["sentiment"] = json.loads(details["sentiment"])
+                if fields is not None:
+                    details = {field: details.get(field) for field in fields}
+                yield {"id": str(row["tweet_id"]), **details}
+            last = (rows[-1]["processed_at"], rows[-1]["tweet_id"])
+
+    def iter_archived(self, since=None, until=None):
+        """
+        Recorre en streaming los tweets archivados, segmento a segmento.
+
+        Args:
+            since: Fecha ISO mínima de procesamiento (opcional)
+            until: Fecha ISO máxima de procesamiento, excluida (opcional)
+
+        Yields:
+            dict: Detalles del tweet, con su ID en "id"
+        """
+        for tweet_id, record in segments.iter_segments(self.archive_dir, self.segment_prefix, since, until):
+            yield {"id": tweet_id, **record}
+
+    def import_json(self, json_file):
+        """
+        Importa de una sola vez el contenido de una base de datos JSON.
+        Si el archivo ya fue importado no se vuelve a procesar.
+
+        Args:
+            json_file: Ruta al archivo JSON del backend anterior
+
+        Returns:
+            int: Número de tweets importados
+        """
+        source = os.path.abspath(json_file)
+        with self._lock:
+            if self._get_meta("json_imported_from") == source:
+                logger.info(f"⏭️ {json_file} ya fue importado anteriormente.")
+                return 0
+
+        # Leer la instantánea junto con la cola del journal, como un lector más,
+        # para no perder las últimas escrituras ni chocar con un bot en marcha
+        from utils.database import Database
+        data = Database(json_file, read_only=True).export()
+
+        rows = []
+        for tweet_id, details in data.get("processed_tweets", {}).items():
+            sentiment = details.get("sentiment")
+            rows.append((
+                int(tweet_id),
+                details.get("processed_at") or datetime.now().isoformat(),
+                int(bool(details.get("responded", False))),
+                # Los registros antiguos usan "author" en lugar de "author_username"
+                details.get("author_username", details.get("author")),
+                details.get("tweet_text"),
+                details.get("response_text"),
+                json.dumps(sentiment) if sentiment else None
+            ))
+
+        history = data.get("rate_limits", {}).get("history", [])
+
+        # Los IDs archivados por el backend JSON solo están en su índice de IDs
+        hot_ids = {row[0] for row in rows}
+        archived_ids = [(tweet_id,) for tweet_id in self._read_json_id_index(json_file) if tweet_id not in hot_ids]
+        expired_stats = stats_engine.flatten(data.get("expired_stats", {}))
+        # rebuild() conserva los contadores de rate limits, así que se copian tal cual
+        rate_limit_stats = stats_engine.flatten(
+            {"rate_limits_by_endpoint": data.get("stats", {}).get("rate_limits_by_endpoint", {})}
+        )
+
+        with self._lock, self._transaction():
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO processed_tweets
+                    (tweet_id, processed_at, responded, author_username, tweet_text, response_text, sentiment)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+            self._conn.executemany(
+                "INSERT INTO rate_limit_history (timestamp, wait_seconds, endpoint) VALUES (?, ?, ?)",
+                [(h.get("timestamp"), h.get("wait_seconds", 0), h.get("endpoint")) for h in history[-RATE_LIMIT_HISTORY_SIZE:]]
+            )
+            self._conn.executemany("INSERT OR IGNORE INTO archived_ids (tweet_id) VALUES (?)", archived_ids)
+            self._conn.executemany(
+                "INSERT INTO expired_stats (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + excluded.value",
+                expired_stats
+            )
+            self._conn.executemany(
+                "INSERT INTO stats (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + excluded.value",
+                rate_limit_stats
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO expired_segments (key) VALUES (?)",
+                [(key,) for key in data.get("expired_segments", [])]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported_from', ?)", (source,)
+            )
+
+        # Recalcular los contadores a partir de las filas para no arrastrar desajustes
+        self.rebuild()
+        logger.info(f"✅ Importados {len(rows)} tweets desde {json_file}")
+        return len(rows)
+
+    def _read_json_id_index(self, json_file):
+        """
+        Lee los IDs del índice persistido por el backend JSON (que incluye los
+        archivados) o, si no existe, los de sus segmentos archivados.
+
+        Returns:
+            iterable: IDs enteros
+        """
+        ids_file = os.path.splitext(json_file)[0] + ".ids"
+        try:
+            with open(ids_file, 'rb') as f:
+                index, _ = IdIndex.from_bytes(f.read())
+            return index
+        except (OSError, ValueError, struct.error):
+            archive_dir = os.path.join(os.path.dirname(json_file), "archive")
+            prefix = os.path.splitext(os.path.basename(json_file))[0]
+            return (int(tweet_id) for tweet_id, _ in segments.iter_segments(archive_dir, prefix))
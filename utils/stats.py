@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta
+from utils.records import ProcessedTweet
+
+# Estados posibles de un tweet procesado:
+#   ignored:   no se generó respuesta (relevancia baja o error)
+#   generated: se generó una respuesta pero no se publicó
+#   posted:    la respuesta se publicó en X
+STATUSES = ("ignored", "generated", "posted")
+
+# Horas que se conservan en los contadores por hora
+HOURLY_RETENTION_HOURS = 7 * 24
+
+# Contadores que se derivan de los registros de tweets (los de rate limits
+# no se pueden recalcular porque el historial de eventos está acotado)
+RECORD_KEYS = ("total_processed", "total_responded") + STATUSES + ("by_hour", "by_day", "by_author")
+
+
+def empty_stats():
+    """Estructura vacía de estadísticas"""
+    return {
+        "total_processed": 0,
+        "total_responded": 0,
+        "ignored": 0,
+        "generated": 0,
+        "posted": 0,
+        "by_hour": {},
+        "by_day": {},
+        "by_author": {},
+        "rate_limits_by_endpoint": {}
+    }
+
+
+def record_status(record):
+    """
+    Clasifica un registro de tweet procesado (ProcessedTweet o diccionario
+    en el formato almacenado).
+
+    Un tweet cuenta como "respondido" (total_responded) si tiene una respuesta
+    generada, se haya publicado o no.
+    """
+    if not isinstance(record, ProcessedTweet):
+        record = ProcessedTweet.from_dict(0, record)
+    return record.status
+
+
+def record_deltas(record, sign=1):
+    """
+    Calcula los incrementos que un registro aporta a las estadísticas.
+
+    Args:
+        record: Registro del tweet procesado (ProcessedTweet o diccionario
+            en el formato almacenado)
+        sign: 1 para sumar el registro, -1 para restarlo (al reemplazarlo)
+
+    Returns:
+        list: Tuplas (ruta, incremento), donde la ruta es una tupla de claves
+    """
+    if not isinstance(record, ProcessedTweet):
+        record = ProcessedTweet.from_dict(0, record)
+    status = record.status
+    author = record.author_username
+
+    paths = [("total_processed",), (status,)]
+    if status != "ignored":
+        paths.append(("total_responded",))
+    if record.processed_at is not None:
+        paths.append(("by_hour", record.hour_key()))
+        paths.append(("by_day", record.day_key()))
+    if author:
+        paths.append(("by_author", author, "processed"))
+        paths.append(("by_author", author, status))
+    return [(path, sign) for path in paths]
+
+
+def rate_limit_deltas(endpoint):
+    """Incrementos que aporta un evento de rate limit"""
+    return [(("rate_limits_by_endpoint", endpoint or "desconocido"), 1)]
+
+
+def _prune_hours(by_hour, newest_hour):
+    """Elimina los contadores por hora que quedan fuera de la ventana de retención"""
+    try:
+        newest = datetime.strptime(newest_hour, "%Y-%m-%dT%H")
+    except ValueError:
+        return
+    cutoff = (newest - timedelta(hours=HOURLY_RETENTION_HOURS)).strftime("%Y-%m-%dT%H")
+    for hour in [hour for hour in by_hour if hour < cutoff]:
+        del by_hour[hour]
+
+
+def apply_deltas(stats, deltas):
+    """
+    Aplica incrementos sobre la estructura anidada de estadísticas.
+    Los contadores que llegan a cero se eliminan de los mapas.
+    """
+    for path, delta in deltas:
+        node = stats
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        leaf = path[-1]
+
+        created = leaf not in node
+        if created:
+            # Un decremento sobre un contador ya podado no debe dejarlo negativo
+            if delta < 0 and len(path) > 1:
+                continue
+            node[leaf] = 0
+        node[leaf] += delta
+
+        if len(path) > 1 and node[leaf] <= 0:
+            del node[leaf]
+            if len(path) > 2 and not node:
+                del stats[path[0]][path[1]]
+        elif created and path[0] == "by_hour":
+            _prune_hours(node, max(node))
+
+
+def compute_stats(records, rate_limits_by_endpoint=None):
+    """
+    Recalcula las estadísticas recorriendo los registros uno a uno.
+
+    Args:
+        records: Iterable de registros de tweets procesados
+        rate_limits_by_endpoint: Contadores de rate limits a conservar
+
+    Returns:
+        dict: Estadísticas calculadas
+    """
+    stats = empty_stats()
+    for record in records:
+        apply_deltas(stats, record_deltas(record))
+    stats["rate_limits_by_endpoint"] = dict(rate_limits_by_endpoint or {})
+    return stats
+
+
+def diff_stats(stored, computed):
+    """
+    Compara los contadores derivados de registros.
+
+    Returns:
+        dict: {clave: (valor almacenado, valor calculado)} para cada diferencia
+    """
+    differences = {}
+    for key in RECORD_KEYS:
+        stored_value = stored.get(key, {} if isinstance(computed[key], dict) else 0)
+        if stored_value != computed[key]:
+            differences[key] = (stored_value, computed[key])
+    return differences
+
+
+def merge_stats(stats, other):
+    """Suma sobre `stats` los contadores derivados de registros de otra estructura"""
+    record_counters = {key: other[key] for key in RECORD_KEYS if key in other}
+    apply_deltas(stats, [(tuple(path.split("/")), value) for path, value in flatten(record_counters)])
+
+
+def flatten(stats, prefix=()):
+    """Convierte la estructura anidada en pares (ruta separada por '/', valor)"""
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from flatten(value, prefix + (key,))
+        else:
+            yield "/".join(prefix + (key,)), value
+
+
+def unflatten(rows):
+    """Reconstruye la estructura anidada a partir de pares (ruta, valor)"""
+    stats = empty_stats()
+    for path, value in rows:
+        keys = path.split("/")
+        node = stats
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+        node[keys[-1]] = value
+    return stats
@@ -0,0 +1,30 @@
+import re
+import hashlib
+
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_MENTION = re.compile(r"@\w+")
+_CASHTAG = re.compile(r"\$[A-Za-z][A-Za-z0-9_]*")
+
+
+def normalize_tweet(text):
+    """
+    Normaliza el texto de un tweet para comparar contenidos: elimina menciones,
+    enlaces y cashtags, pasa a minúsculas y une los espacios. Dos tweets de
+    plantilla que solo cambian en esos elementos quedan iguales.
+    """
+    text = _URL.sub(" ", text)
+    text = _MENTION.sub(" ", text)
+    text = _CASHTAG.sub(" ", text)
+    return " ".join(text.lower().split())
+
+
+def text_key(text, *parts):
+    """
+    Clave compacta de un texto normalizado (y de otros valores que deban
+    distinguir la entrada), para usarla en cachés persistidas.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(normalize_tweet(text).encode("utf-8"))
+    for part in parts:
+        digest.update(b"\x00" + str(part).encode("utf-8"))
+    return digest.hexdigest()
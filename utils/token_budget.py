@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger("crypto_bot.token_budget")
+
+# Nombre de la caché persistida con el consumo por hora
+USAGE_CACHE = "llm_usage"
+
+# Precio en dólares por cada 1000 tokens (entrada, salida) de cada familia de
+# modelos; un modelo se asocia al prefijo más largo que coincida. Los modelos
+# sin precio cuentan tokens pero no coste
+PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-32k": (0.06, 0.12),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015)
+}
+
+# Estados del presupuesto: sin restricciones, cerca del límite (se usa el
+# modelo de respaldo y se responde a menos tweets) y agotado (se aplaza el trabajo)
+NORMAL = "normal"
+DOWNGRADE = "downgrade"
+EXHAUSTED = "exhausted"
+
+
+class BudgetExceeded(Exception):
+    """El presupuesto de tokens del ciclo o del día está agotado"""
+
+    def __init__(self, scope, used, limit):
+        super().__init__(f"Presupuesto de tokens {scope} agotado ({used}/{limit})")
+        self.scope = scope
+        self.used = used
+        self.limit = limit
+
+
+def model_cost(model, prompt_tokens, completion_tokens):
+    """Coste en dólares de una llamada según PRICES (0 si el modelo no tiene precio)"""
+    prefixes = [prefix for prefix in PRICES if model.startswith(prefix)]
+    if not prefixes:
+        return 0.0
+    prompt_price, completion_price = PRICES[max(prefixes, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+def _empty_counters():
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "estimated": 0, "cost": 0.0}
+
+
+def _add(counters, prompt_tokens, completion_tokens, cost, estimated):
+    counters["calls"] += 1
+    counters["prompt_tokens"] += prompt_tokens
+    counters["completion_tokens"] += completion_tokens
+    counters["estimated"] += int(estimated)
+    counters["cost"] += cost
+
+
+def _copy_usage(usage):
+    return {group: {key: dict(counters) for key, counters in usage[group].items()} for group in ("by_type", "by_model")}
+
+
+def _total_tokens(counters_by_key):
+    return sum(c["prompt_tokens"] + c["completion_tokens"] for c in counters_by_key.values())
+
+
+class TokenBudget:
+    """
+    Contabilidad de tokens y coste de las llamadas a OpenAI, con presupuesto
+    por ciclo y por día.
+
+    El consumo se agrega por ciclo (entre start_cycle y end_cycle) y por
+    hora, desglosado por tipo de llamada y por modelo. El de cada hora se
+    persiste en la base de datos (caché USAGE_CACHE, que conserva `retention`
+    segundos) para analizar tendencias y para que el presupuesto diario
+    sobreviva a un reinicio.
+
+    A partir de `downgrade_at` (fracción del presupuesto) el estado pasa a
+    DOWNGRADE y, al alcanzarlo, a EXHAUSTED; qué hacer en cada estado lo
+    deciden OpenAIService y TwitterService.
+    """
+
+    def __init__(self, cycle_tokens=None, daily_tokens=None, downgrade_at=0.8, db=None,
+                 retention=30 * 24 * 3600, clock=time.time):
+        """
+        Args:
+            cycle_tokens: Tokens como máximo por ciclo (None para no limitarlos)
+            daily_tokens: Tokens como máximo por día (None para no limitarlos)
+            downgrade_at: Fracción del presupuesto a partir de la que el estado es DOWNGRADE
+            db: Base de datos donde persistir el consumo por hora (opcional)
+            retention: Segundos que se conserva el consumo de cada hora
+            clock: Función que devuelve la hora actual en segundos
+        """
+        self.cycle_tokens = cycle_tokens
+        self.daily_tokens = daily_tokens
+        self.downgrade_at = downgrade_at
+        self.db = db
+        self.retention = retention
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cycle = {}
+        # {hora (YYYY-MM-DDTHH): {"by_type": {...}, "by_model": {...}}}
+        self._hours = {}
+        self._dirty_hours = set()
+        if db is not None:
+            self._hours = {hour: value for hour, (value, _) in db.get_cache_entries(USAGE_CACHE).items()}
+
+    def _hour_key(self, timestamp):
+        return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%dT%H")
+
+    def record(self, call_type, model, prompt_tokens, completion_tokens, estimated=False):
+        """
+        Registra el consumo de una llamada.
+
+        Args:
+            call_type: Tipo de llamada (relevancia, respuesta, etc.)
+            model: Modelo utilizado
+            prompt_tokens: Tokens de entrada
+            completion_tokens: Tokens de salida
+            estimated: Si los tokens son una estimación local (la API no los informó)
+        """
+        cost = model_cost(model, prompt_tokens, completion_tokens)
+        hour = self._hour_key(self._clock())
+        with self._lock:
+            _add(self._cycle.setdefault(call_type, _empty_counters()),
+                 prompt_tokens, completion_tokens, cost, estimated)
+            usage = self._hours.setdefault(hour, {"by_type": {}, "by_model": {}})
+            _add(usage["by_type"].setdefault(call_type, _empty_counters()),
+                 prompt_tokens, completion_tokens, cost, estimated)
+            _add(usage["by_model"].setdefault(model, _empty_counters()),
+                 prompt_tokens, completion_tokens, cost, estimated)
+            self._dirty_hours.add(hour)
+
+    def cycle_used(self):
+        """Tokens consumidos en el ciclo actual"""
+        with self._lock:
+            return _total_tokens(self._cycle)
+
+    def daily_used(self):
+        """Tokens consumidos hoy"""
+        day = self._hour_key(self._clock())[:10]
+        with self._lock:
+            return sum(
+                _total_tokens(usage["by_type"]) for hour, usage in self._hours.items() if hour.startswith(day)
+            )
+
+    def _usage(self):
+        """(ámbito, tokens consumidos, presupuesto) de cada presupuesto configurado"""
+        limits = []
+        if self.cycle_tokens is not None:
+            limits.append(("del ciclo", self.cycle_used(), self.cycle_tokens))
+        if self.daily_tokens is not None:
+            limits.append(("diario", self.daily_used(), self.daily_tokens))
+        return limits
+
+    def status(self):
+        """Estado del presupuesto: NORMAL, DOWNGRADE o EXHAUSTED"""
+        status = NORMAL
+        for _, used, limit in self._usage():
+            if used >= limit:
+                return EXHAUSTED
+            if used >= limit * self.downgrade_at:
+                status = DOWNGRADE
+        return status
+
+    def check(self):
+        """
+        Comprueba que quede presupuesto.
+
+        Raises:
+            BudgetExceeded: Si el presupuesto del ciclo o el diario está agotado
+        """
+        for scope, used, limit in self._usage():
+            if used >= limit:
+                raise BudgetExceeded(scope, used, limit)
+
+    def start_cycle(self):
+        """Empieza un ciclo: el consumo del ciclo vuelve a cero"""
+        with self._lock:
+            self._cycle = {}
+
+    def end_cycle(self):
+        """
+        Termina un ciclo: registra su consumo en el log y persiste el consumo por hora.
+
+        Returns:
+            dict: Consumo del ciclo por tipo de llamada
+        """
+        with self._lock:
+            cycle = self._cycle
+            self._cycle = {}
+        if cycle:
+            tokens = _total_tokens(cycle)
+            cost = sum(counters["cost"] for counters in cycle.values())
+            logger.info(f"🪙 Consumo del ciclo: {tokens} tokens (${cost:.4f}): " + ", ".join(
+                f"{call_type} {counters['calls']} llamadas / {counters['prompt_tokens']}+{counters['completion_tokens']} tokens"
+                for call_type, counters in sorted(cycle.items())
+            ))
+        self.flush()
+        return cycle
+
+    def flush(self):
+        """Persiste el consumo de las horas modificadas y olvida las que ya no se conservan"""
+        now = self._clock()
+        oldest = self._hour_key(now - self.retention)
+        with self._lock:
+            for hour in [hour for hour in self._hours if hour < oldest]:
+                del self._hours[hour]
+            entries = {}
+            for hour in self._dirty_hours:
+                if hour in self._hours:
+                    start = datetime.strptime(hour, "%Y-%m-%dT%H")
+                    expires_at = (start + timedelta(seconds=self.retention)).timestamp()
+                    # Copia: la base de datos no debe ver los cambios posteriores
+                    entries[hour] = (_copy_usage(self._hours[hour]), expires_at)
+            self._dirty_hours = set()
+        if self.db is not None and entries:
+            self.db.put_cache_entries(USAGE_CACHE, entries)
+
+    def hourly_usage(self):
+        """
+        Consumo por hora conservado.
+
+        Returns:
+            dict: {hora (YYYY-MM-DDTHH): {"by_type": {...}, "by_model": {...}}}
+        """
+        with self._lock:
+            return {hour: _copy_usage(usage) for hour, usage in sorted(self._hours.items())}